@@ -0,0 +1,472 @@
+"""End-to-end load benchmark of the API against local mock backends.
+
+Starts the mock Groq server (benchmarks/mock_groq.py) and the app from
+com.mhire.app.main with the stub SadTalker (benchmarks/fake_sadtalker), all writing
+into a temporary directory, then drives /audio/transcribe, /audio/speak and
+/video/generate (wait=true) at the requested concurrency. For each scenario it
+reports throughput, p50/p95/p99 latency, event-loop lag and per-process RSS as JSON.
+
+Event-loop lag is measured from outside: a probe requests the trivial health check
+every --probe-interval seconds and the lag is its latency above the idle baseline.
+A blocked event loop delays the probe on whichever worker it lands on.
+
+Usage:
+    python -m benchmarks.e2e_benchmark [--workers 2] [--concurrency 8] [--requests 100]
+        [--scenarios transcribe speak generate] [--output results.json] [--compare baseline.json]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import shutil
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+import zlib
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKE_SADTALKER = os.path.join(ROOT, "benchmarks", "fake_sadtalker")
+SILERO_ASSETS = os.path.join(ROOT, "com", "mhire", "app", "services", "audio_service", "audio_assets")
+API_PREFIX = "/api/v1"
+MB = 1024 * 1024
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def percentile(values, fraction: float) -> float:
+    """Nearest-rank percentile of an unsorted list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))]
+
+
+def latency_summary(values) -> dict:
+    return {
+        "p50_ms": round(percentile(values, 0.50) * 1000, 1),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 1),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1) if values else 0.0,
+    }
+
+
+def make_wav(seconds: float, sample_rate: int = 16000) -> bytes:
+    """Noise-free test tone as 16-bit PCM WAV"""
+    import math
+    samples = int(seconds * sample_rate)
+    pcm = b"".join(struct.pack("<h", int(8000 * math.sin(2 * math.pi * 220 * i / sample_rate))) for i in range(samples))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def make_png(size: int = 256) -> bytes:
+    """Solid grey RGB PNG built with zlib"""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    rows = b"".join(b"\x00" + b"\x80" * (size * 3) for _ in range(size))
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+
+def process_tree(root_pid: int) -> list:
+    """root_pid and all of its descendants, from /proc"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    pids, pending = [], [root_pid]
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending.extend(children.get(pid, []))
+    return pids
+
+
+def read_rss(pid: int):
+    """(rss_bytes, short command line) of a process, or None once it has exited"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            cmdline = f.read().replace(b"\x00", b" ").decode(errors="replace").strip()
+    except (OSError, StopIteration):
+        return None
+    return rss, cmdline[:120]
+
+
+class RssSampler:
+    """Tracks peak and latest RSS of every process in the server's tree"""
+
+    def __init__(self, root_pid: int, interval: float = 0.5):
+        self.root_pid = root_pid
+        self.interval = interval
+        self.processes = {}
+
+    def reset(self):
+        self.processes = {}
+
+    def sample(self):
+        for pid in process_tree(self.root_pid):
+            reading = read_rss(pid)
+            if reading is None:
+                continue
+            rss, cmdline = reading
+            entry = self.processes.setdefault(pid, {"cmdline": cmdline, "peak": 0, "last": 0})
+            entry["peak"] = max(entry["peak"], rss)
+            entry["last"] = rss
+
+    async def run(self):
+        while True:
+            await asyncio.to_thread(self.sample)
+            await asyncio.sleep(self.interval)
+
+    def report(self) -> list:
+        return [
+            {
+                "pid": pid,
+                "role": "master" if pid == self.root_pid else ("sadtalker" if "inference.py" in entry["cmdline"] else "worker"),
+                "rss_peak_mb": round(entry["peak"] / MB, 1),
+                "rss_last_mb": round(entry["last"] / MB, 1),
+            }
+            for pid, entry in sorted(self.processes.items())
+        ]
+
+
+class LagProbe:
+    """Measures health-check latency above the idle baseline while load is applied"""
+
+    def __init__(self, base_url: str, interval: float):
+        self.base_url = base_url
+        self.interval = interval
+        self.baseline = 0.0
+        self.samples = []
+
+    async def calibrate(self, client: httpx.AsyncClient, rounds: int = 20):
+        timings = []
+        # The first requests open connections to each worker
+        for _ in range(5):
+            await client.get(self.base_url + "/")
+        for _ in range(rounds):
+            start_time = time.perf_counter()
+            await client.get(self.base_url + "/")
+            timings.append(time.perf_counter() - start_time)
+            await asyncio.sleep(0.01)
+        self.baseline = percentile(timings, 0.50)
+
+    async def run(self, client: httpx.AsyncClient):
+        while True:
+            start_time = time.perf_counter()
+            try:
+                await client.get(self.base_url + "/")
+                self.samples.append(max(0.0, time.perf_counter() - start_time - self.baseline))
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(self.interval)
+
+    def report(self) -> dict:
+        summary = latency_summary(self.samples)
+        return {
+            "baseline_ms": round(self.baseline * 1000, 2),
+            "samples": len(self.samples),
+            "p50_ms": summary["p50_ms"],
+            "p99_ms": summary["p99_ms"],
+            "max_ms": summary["max_ms"],
+        }
+
+
+async def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{' '.join(process.args)} exited with code {process.returncode}")
+            try:
+                await client.get(url, timeout=1.0)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def start_mock_groq(args, port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "benchmarks.mock_groq",
+            "--port", str(port),
+            "--latency-ms", str(args.groq_latency_ms),
+            "--jitter-ms", str(args.groq_jitter_ms),
+            "--speech-kb", str(args.speech_kb),
+        ],
+        cwd=ROOT
+    )
+
+
+def start_app(args, port: int, groq_port: int, work_dir: str) -> subprocess.Popen:
+    audio_assets = os.path.join(work_dir, "audio_assets")
+    os.makedirs(audio_assets, exist_ok=True)
+    for name in ("silero_encoder_v5.onnx", "silero_decoder_v5.onnx"):
+        source = os.path.join(SILERO_ASSETS, name)
+        if os.path.exists(source):
+            shutil.copy(source, audio_assets)
+
+    env = dict(
+        os.environ,
+        GROQ_API_KEY="benchmark",
+        GROQ_BASE_URL=f"http://127.0.0.1:{groq_port}",
+        SADTALKER_PATH=FAKE_SADTALKER,
+        SADTALKER_PYTHON=sys.executable,
+        SADTALKER_BACKEND="subprocess",
+        FAKE_SADTALKER_SECONDS=str(args.render_seconds),
+        FAKE_SADTALKER_VIDEO_KB=str(args.video_kb),
+        RENDER_WORKERS=str(args.render_workers),
+        RENDER_QUEUE_MAX_SIZE=str(max(32, args.concurrency * 2)),
+        AUDIO_ASSETS_PATH=audio_assets,
+        TTS_CACHE_PATH=os.path.join(work_dir, "tts_cache"),
+        VIDEO_ASSETS_PATH=os.path.join(work_dir, "video_assets"),
+        RENDER_JOBS_PATH=os.path.join(work_dir, "render_jobs"),
+        AVATAR_CACHE_PATH=os.path.join(work_dir, "avatar_cache"),
+    )
+    if args.server == "gunicorn":
+        command = [
+            "gunicorn", "com.mhire.app.main:app",
+            "-c", "gunicorn_config.py",
+            "--workers", str(args.workers),
+            "--bind", f"127.0.0.1:{port}",
+        ]
+    else:
+        command = [
+            sys.executable, "-m", "uvicorn", "com.mhire.app.main:app",
+            "--host", "127.0.0.1",
+            "--port", str(port),
+            "--workers", str(args.workers),
+            "--log-level", "warning",
+        ]
+    return subprocess.Popen(command, cwd=ROOT, env=env)
+
+
+def build_scenarios(args, base_url: str, work_dir: str, avatar_id: str) -> dict:
+    wav = make_wav(args.audio_seconds)
+    driven_audio = os.path.join(work_dir, "driven.wav")
+    with open(driven_audio, "wb") as f:
+        f.write(wav)
+
+    def transcribe(client: httpx.AsyncClient, index: int):
+        return client.post(
+            f"{base_url}{API_PREFIX}/audio/transcribe",
+            files={"file": ("sample.wav", wav, "audio/wav")},
+            data={"use_groq": "true"}
+        )
+
+    def speak(client: httpx.AsyncClient, index: int):
+        # Unique text per request unless cache hits are being measured
+        suffix = "" if args.tts_cache_hits else f" Request number {index}."
+        return client.post(
+            f"{base_url}{API_PREFIX}/audio/speak",
+            data={"text": args.tts_text + suffix, "voice": "alloy"}
+        )
+
+    def generate(client: httpx.AsyncClient, index: int):
+        return client.post(
+            f"{base_url}{API_PREFIX}/video/generate",
+            data={"audio_path": driven_audio, "avatar_id": avatar_id, "wait": "true", "quality": args.quality}
+        )
+
+    return {"transcribe": transcribe, "speak": speak, "generate": generate}
+
+
+async def run_scenario(name: str, send, args, rss: RssSampler, probe: LagProbe) -> dict:
+    total = args.video_requests if name == "generate" else args.requests
+    latencies, errors, statuses = [], 0, {}
+    first_error = None
+    counter = iter(range(total))
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        async def user():
+            nonlocal errors, first_error
+            for index in counter:
+                start_time = time.perf_counter()
+                try:
+                    response = await send(client, index)
+                    status = response.status_code
+                    # The API reports failures in the body with HTTP 200
+                    body = response.json()
+                    failed = status != 200 or body.get("message") != "Success"
+                    if failed and first_error is None:
+                        first_error = body.get("error", body.get("detail"))
+                except (httpx.HTTPError, ValueError) as e:
+                    status, failed = type(e).__name__, True
+                    first_error = first_error or str(e)
+                latencies.append(time.perf_counter() - start_time)
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                errors += failed
+
+        rss.reset()
+        probe.samples = []
+        start_time = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - start_time
+
+    return {
+        "scenario": name,
+        "requests": total,
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "statuses": statuses,
+        "first_error": first_error,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "latency": latency_summary(latencies),
+        "event_loop_lag": probe.report(),
+        "processes": rss.report(),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(results: dict, baseline: dict) -> list:
+    """Relative change of the headline numbers against a previous run"""
+    previous = {scenario["scenario"]: scenario for scenario in baseline["scenarios"]}
+    changes = []
+    for scenario in results["scenarios"]:
+        before = previous.get(scenario["scenario"])
+        if before is None:
+            continue
+
+        def delta(new, old):
+            return round((new - old) / old * 100, 1) if old else None
+
+        changes.append({
+            "scenario": scenario["scenario"],
+            "throughput_pct": delta(scenario["throughput_rps"], before["throughput_rps"]),
+            "p95_pct": delta(scenario["latency"]["p95_ms"], before["latency"]["p95_ms"]),
+            "p99_pct": delta(scenario["latency"]["p99_ms"], before["latency"]["p99_ms"]),
+            "loop_lag_p99_pct": delta(scenario["event_loop_lag"]["p99_ms"], before["event_loop_lag"]["p99_ms"]),
+        })
+    return changes
+
+
+async def main(args) -> dict:
+    groq_port, app_port = free_port(), free_port()
+    base_url = f"http://127.0.0.1:{app_port}"
+
+    with tempfile.TemporaryDirectory(prefix="e2e_benchmark_") as work_dir:
+        mock = start_mock_groq(args, groq_port)
+        app = start_app(args, app_port, groq_port, work_dir)
+        background = []
+        try:
+            await wait_until_up(f"http://127.0.0.1:{groq_port}/stats", mock)
+            await wait_until_up(base_url + "/", app)
+            # Let every worker finish its lifespan startup before measuring
+            await asyncio.sleep(args.settle)
+
+            async with httpx.AsyncClient(timeout=args.timeout) as client:
+                response = await client.post(
+                    f"{base_url}{API_PREFIX}/video/avatars",
+                    files={"image": ("avatar.png", make_png(), "image/png")}
+                )
+                avatar_id = response.json()["data"]["avatar_id"]
+
+                rss = RssSampler(app.pid)
+                probe = LagProbe(base_url, args.probe_interval)
+                await probe.calibrate(client)
+                background = [asyncio.ensure_future(rss.run()), asyncio.ensure_future(probe.run(client))]
+
+                scenarios = build_scenarios(args, base_url, work_dir, avatar_id)
+                results = []
+                for name in args.scenarios:
+                    result = await run_scenario(name, scenarios[name], args, rss, probe)
+                    print(json.dumps({k: result[k] for k in ("scenario", "throughput_rps", "latency", "errors")}), file=sys.stderr)
+                    results.append(result)
+        finally:
+            for task in background:
+                task.cancel()
+            await asyncio.gather(*background, return_exceptions=True)
+            for process in (app, mock):
+                process.terminate()
+            for process in (app, mock):
+                try:
+                    process.wait(timeout=15)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+
+    return {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "config": {
+            key: value for key, value in vars(args).items() if key not in ("output", "compare")
+        },
+        "scenarios": results,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=["transcribe", "speak", "generate"], default=["transcribe", "speak", "generate"])
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="uvicorn")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="requests per audio scenario")
+    parser.add_argument("--video-requests", type=int, default=8, help="requests for the generate scenario")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--settle", type=float, default=1.0, help="seconds to wait after startup")
+    parser.add_argument("--probe-interval", type=float, default=0.1)
+    parser.add_argument("--groq-latency-ms", type=float, default=150)
+    parser.add_argument("--groq-jitter-ms", type=float, default=50)
+    parser.add_argument("--speech-kb", type=int, default=64)
+    parser.add_argument("--audio-seconds", type=float, default=5.0)
+    parser.add_argument("--tts-text", default="Hello, thanks for joining the call today.")
+    parser.add_argument("--tts-cache-hits", action="store_true", help="repeat the same text so /speak hits the TTS cache")
+    parser.add_argument("--render-seconds", type=float, default=2.0)
+    parser.add_argument("--render-workers", type=int, default=1)
+    parser.add_argument("--quality", choices=["realtime", "balanced", "high"], default="high")
+    parser.add_argument("--video-kb", type=int, default=512)
+    parser.add_argument("--output", help="write results to this file instead of stdout")
+    parser.add_argument("--compare", help="previous results file to compare against")
+    args = parser.parse_args()
+
+    results = asyncio.run(main(args))
+    if args.compare:
+        with open(args.compare) as f:
+            results["comparison"] = compare(results, json.load(f))
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
@@ -0,0 +1,66 @@
+"""Stub of SadTalker's inference.py for benchmarks.
+
+Accepts the same command line as the real script, prints tqdm-style progress for
+each pipeline stage, sleeps for the configured render time and writes a dummy
+video of the configured size. Use it with SADTALKER_PATH=benchmarks/fake_sadtalker
+and SADTALKER_BACKEND=subprocess.
+
+Environment:
+    FAKE_SADTALKER_SECONDS   total render time (default 2.0)
+    FAKE_SADTALKER_VIDEO_KB  size of the written video (default 512)
+"""
+import argparse
+import os
+import sys
+import time
+
+# Stage names and their share of the render time, in SadTalker's order
+STAGES = [
+    ("landmark Det:", 0.10),
+    ("3DMM Extraction In Video:", 0.10),
+    ("audio2exp:", 0.10),
+    ("Face Renderer:", 0.50),
+    ("Face Enhancer:", 0.20),
+]
+STEPS = 10
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--driven_audio", required=True)
+    parser.add_argument("--source_image", required=True)
+    parser.add_argument("--result_dir", required=True)
+    parser.add_argument("--output_video_name", default="result.mp4")
+    parser.add_argument("--enhancer", default=None)
+    parser.add_argument("--still", action="store_true")
+    args, _ = parser.parse_known_args()
+
+    for path in (args.driven_audio, args.source_image):
+        if not os.path.exists(path):
+            print(f"No such file: {path}")
+            return 1
+
+    render_seconds = float(os.getenv("FAKE_SADTALKER_SECONDS", "2.0"))
+    video_kb = int(os.getenv("FAKE_SADTALKER_VIDEO_KB", "512"))
+
+    for name, share in STAGES:
+        if name == "Face Enhancer:" and not args.enhancer:
+            continue
+        for step in range(STEPS + 1):
+            percent = step * 100 // STEPS
+            bar = "#" * step + " " * (STEPS - step)
+            sys.stdout.write(f"\r{name}  {percent}%|{bar}| {step}/{STEPS}")
+            sys.stdout.flush()
+            if step < STEPS:
+                time.sleep(render_seconds * share / STEPS)
+        sys.stdout.write("\n")
+
+    os.makedirs(args.result_dir, exist_ok=True)
+    with open(os.path.join(args.result_dir, args.output_video_name), "wb") as f:
+        f.write(os.urandom(video_kb * 1024))
+    print(f"The generated video is named: {args.output_video_name}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
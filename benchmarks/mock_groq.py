@@ -0,0 +1,72 @@
+"""Local stand-in for the Groq transcription and speech endpoints.
+
+Responses are delayed by a configurable latency (plus uniform jitter) and speech
+payloads have a configurable size, so the app can be load-tested without network
+access or API quota. Point the app at it with GROQ_BASE_URL=http://127.0.0.1:<port>.
+
+Usage:
+    python -m benchmarks.mock_groq [--port 8900] [--latency-ms 150] [--jitter-ms 50] [--speech-kb 64]
+"""
+import argparse
+import asyncio
+import os
+import random
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CHUNK_SIZE = 16 * 1024
+
+
+def create_app(latency_ms: float, jitter_ms: float, speech_kb: int) -> FastAPI:
+    app = FastAPI(title="Mock Groq")
+    # Random bytes served in chunks; clients only care about the size
+    speech_payload = os.urandom(speech_kb * 1024)
+    stats = {"transcriptions": 0, "speech": 0, "bytes_received": 0}
+
+    async def delay():
+        await asyncio.sleep(max(0.0, latency_ms + random.uniform(-jitter_ms, jitter_ms)) / 1000)
+
+    @app.post("/audio/transcriptions")
+    async def transcriptions(request: Request):
+        # Drain the multipart body without parsing it, as an upstream would
+        async for chunk in request.stream():
+            stats["bytes_received"] += len(chunk)
+        await delay()
+        stats["transcriptions"] += 1
+        return JSONResponse({"text": "This is a mock transcription."})
+
+    @app.post("/audio/speech")
+    async def speech(request: Request):
+        await request.json()
+        await delay()
+        stats["speech"] += 1
+
+        async def body():
+            for offset in range(0, len(speech_payload), CHUNK_SIZE):
+                yield speech_payload[offset:offset + CHUNK_SIZE]
+
+        return StreamingResponse(body(), media_type="audio/mpeg")
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=150)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--speech-kb", type=int, default=64)
+    args = parser.parse_args()
+    uvicorn.run(
+        create_app(args.latency_ms, args.jitter_ms, args.speech_kb),
+        host=args.host,
+        port=args.port,
+        log_level="warning"
+    )
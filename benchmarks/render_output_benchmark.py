@@ -0,0 +1,167 @@
+"""Disk I/O and latency benchmark for the render output stage.
+
+Compares how SadTalker's AnimateFromCoeff.generate turns rendered frames into an MP4
+with the in-memory pipeline of the inference server (``FrameEncoder``), for the same
+synthetic 256x256 face frames pasted back into a larger source image:
+
+- sadtalker: encode the crop video, mux the audio into it, decode it again to paste
+  every frame back, encode that as MPEG-4 Part 2 (OpenCV's MP4V writer) and mux the
+  audio once more. Every intermediate file is written to the result directory.
+- pipe: paste in memory and pipe the frames into one libx264 + AAC encoder.
+
+Each run reports the wall time from the first frame to the finished MP4, the bytes
+written to the result directory (intermediate files included) and the output size.
+
+Usage:
+    python -m benchmarks.render_output_benchmark [--audio speech.wav] [--seconds 10] [--result-dir DIR] [--repeat 3]
+"""
+import argparse
+import io
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import wave
+
+import numpy as np
+
+from com.mhire.app.services.video_service.inference_server import FPS, FrameEncoder
+
+FACE_SIZE = 256
+# Source image size and where the face crop goes, as paste_pic would place it
+FULL_SIZE = (720, 960)
+PASTE_BOX = (352, 160, 608, 416)
+
+
+def synthetic_frames(count: int) -> np.ndarray:
+    """Face-sized frames with a moving gradient and noise, so the encoders have work to do"""
+    rng = np.random.default_rng(0)
+    y, x = np.mgrid[0:FACE_SIZE, 0:FACE_SIZE]
+    frames = np.empty((count, FACE_SIZE, FACE_SIZE, 3), np.uint8)
+    for index in range(count):
+        mouth = 20 + 15 * np.sin(index / 3)
+        base = (x + y + index * 4) % 256
+        frames[index, ..., 0] = base
+        frames[index, ..., 1] = np.where((y - 180) ** 2 + ((x - 128) * 0.5) ** 2 < mouth ** 2, 40, 200 - base // 2)
+        frames[index, ..., 2] = rng.integers(0, 24, (FACE_SIZE, FACE_SIZE), dtype=np.uint8) + 120
+    return frames
+
+
+def tone_wav(seconds: float) -> bytes:
+    t = np.arange(int(seconds * 16000)) / 16000
+    pcm = (0.3 * np.sin(2 * np.pi * 180 * t) * np.abs(np.sin(2 * np.pi * 3 * t)) * 32767).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(16000)
+        wav_file.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def paste(background: np.ndarray, face: np.ndarray) -> np.ndarray:
+    x1, y1, x2, y2 = PASTE_BOX
+    frame = background.copy()
+    frame[y1:y2, x1:x2] = face
+    return frame
+
+
+def ffmpeg(*args, stdin=None):
+    return subprocess.Popen(["ffmpeg", "-v", "error", "-y", *args], stdin=stdin, stdout=subprocess.PIPE)
+
+
+def encode_raw(frames, width: int, height: int, path: str, *codec):
+    process = ffmpeg("-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(FPS),
+                     "-i", "pipe:0", *codec, path, stdin=subprocess.PIPE)
+    for frame in frames:
+        process.stdin.write(np.ascontiguousarray(frame).data)
+    process.stdin.close()
+    assert process.wait() == 0
+
+
+def mux(video_path: str, audio_path: str, path: str):
+    assert ffmpeg("-i", video_path, "-i", audio_path, "-vcodec", "copy", path).wait() == 0
+
+
+def run_sadtalker(frames, background, audio_path: str, result_dir: str) -> str:
+    """The file-based path of AnimateFromCoeff.generate with preprocess=full"""
+    crop_path = os.path.join(result_dir, "temp_clip.mp4")
+    # imageio.mimsave: libx264 with x264's defaults
+    encode_raw(frames, FACE_SIZE, FACE_SIZE, crop_path, "-c:v", "libx264", "-pix_fmt", "yuv420p")
+    # The audio is cut to the frame count and exported as a WAV next to the video
+    trimmed_audio = os.path.join(result_dir, "clip.wav")
+    assert ffmpeg("-i", audio_path, "-t", str(len(frames) / FPS), "-ar", "16000", trimmed_audio).wait() == 0
+    mux(crop_path, trimmed_audio, os.path.join(result_dir, "clip.mp4"))
+
+    # paste_pic reads the crop video back frame by frame
+    height, width = background.shape[:2]
+    decoder = ffmpeg("-i", crop_path, "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1")
+    decoded = []
+    while True:
+        raw = decoder.stdout.read(FACE_SIZE * FACE_SIZE * 3)
+        if len(raw) < FACE_SIZE * FACE_SIZE * 3:
+            break
+        decoded.append(paste(background, np.frombuffer(raw, np.uint8).reshape(FACE_SIZE, FACE_SIZE, 3)))
+    decoder.wait()
+    pasted_path = os.path.join(result_dir, "pasted.mp4")
+    # cv2.VideoWriter with the MP4V fourcc
+    encode_raw(decoded, width, height, pasted_path, "-c:v", "mpeg4")
+    output_path = os.path.join(result_dir, "clip_full.mp4")
+    mux(pasted_path, trimmed_audio, output_path)
+    return output_path
+
+
+def run_pipe(frames, background, audio_path: str, result_dir: str) -> str:
+    output_path = os.path.join(result_dir, "clip_full.mp4")
+    with FrameEncoder(output_path, audio_path) as encoder:
+        for face in frames:
+            encoder.write(paste(background, face))
+    return output_path
+
+
+def measure(name: str, runner, frames, background, audio_path: str, result_root: str):
+    result_dir = tempfile.mkdtemp(prefix=f"{name}_", dir=result_root)
+    try:
+        start_time = time.perf_counter()
+        output_path = runner(frames, background, audio_path, result_dir)
+        elapsed = time.perf_counter() - start_time
+        # Nothing is deleted before this point, so every intermediate file is still there to count
+        sizes = [os.path.getsize(os.path.join(result_dir, file_name)) for file_name in os.listdir(result_dir)]
+        return {
+            "path": name, "frames": len(frames), "ms": round(elapsed * 1000, 1),
+            "bytes_written": sum(sizes), "files_written": len(sizes), "output_bytes": os.path.getsize(output_path)
+        }
+    finally:
+        shutil.rmtree(result_dir, ignore_errors=True)
+
+
+def main(audio: str, seconds: float, result_root: str, repeat: int):
+    work_dir = tempfile.mkdtemp(prefix="render_output_")
+    try:
+        audio_path = audio
+        if not audio_path:
+            audio_path = os.path.join(work_dir, "speech.wav")
+            with open(audio_path, "wb") as f:
+                f.write(tone_wav(seconds))
+        with wave.open(audio_path) as wav_file:
+            seconds = wav_file.getnframes() / wav_file.getframerate()
+        frames = synthetic_frames(int(seconds * FPS))
+        background = np.full(FULL_SIZE + (3,), 90, np.uint8)
+
+        for _ in range(repeat):
+            for name, runner in (("sadtalker", run_sadtalker), ("pipe", run_pipe)):
+                print(json.dumps(measure(name, runner, frames, background, audio_path, result_root or work_dir)))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", default=None, help="16-bit WAV driving audio (default: a synthetic tone)")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--result-dir", default=None, help="Where outputs are written, e.g. the shared volume")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    main(args.audio, args.seconds, args.result_dir, args.repeat)
@@ -0,0 +1,135 @@
+"""Bytes and latency benchmark for the audio transcoding stage.
+
+For each input, the transcription upload is measured as it was (the raw upload) and
+re-encoded as 16 kHz mono WAV, FLAC and Opus, as AudioService does before calling
+Groq: encoded size, encoding time, and the time to post the multipart body over an
+uplink of the given bandwidth. The upstream is an in-process httpx transport that
+drains the body at that rate. TTS output formats are measured the same way, as
+stored bytes and transcoding time from the input audio.
+
+Without --inputs, a 30 s 44.1 kHz stereo 16-bit WAV of synthetic voiced speech with
+pauses stands in for a browser recording.
+
+Usage:
+    python -m benchmarks.transcode_benchmark [--inputs a.wav b.webm] [--uplink-mbit 20] [--repeat 3]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+import wave
+
+import httpx
+import numpy as np
+
+from com.mhire.app.common.audio_utils import decode_audio, encode_audio, transcode_audio
+from com.mhire.app.common.multipart import build_multipart_stream
+
+# Formats AudioService can send to Groq, with the bitrate used for lossy ones
+STT_FORMATS = [("wav", None), ("flac", None), ("opus", "24k")]
+TTS_FORMATS = [("wav", None), ("flac", None), ("mp3", "48k"), ("opus", "32k")]
+
+
+class ThrottledTransport(httpx.AsyncBaseTransport):
+    """Consumes request bodies at a fixed bandwidth, like a constrained uplink"""
+
+    def __init__(self, bits_per_second: float):
+        self.bits_per_second = bits_per_second
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        received = 0
+        async for chunk in request.stream:
+            received += len(chunk)
+            await asyncio.sleep(len(chunk) * 8 / self.bits_per_second)
+        return httpx.Response(200, json={"text": "", "received": received})
+
+
+def synthetic_recording(seconds: float = 30.0, sample_rate: int = 44100) -> bytes:
+    """Voiced harmonics with a wandering pitch, syllable-rate envelope, breath noise and pauses"""
+    rng = np.random.default_rng(0)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    pitch = 140 + 30 * np.sin(2 * np.pi * 0.7 * t)
+    phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+    voice = sum(np.sin(k * phase) / k for k in range(1, 12))
+    envelope = np.clip(np.sin(2 * np.pi * 3.5 * t), 0, None) * (np.sin(2 * np.pi * 0.15 * t) > -0.3)
+    mono = 0.25 * voice * envelope + 0.003 * rng.standard_normal(len(t))
+    stereo = np.stack([mono, 0.9 * mono], axis=1)
+    pcm = (np.clip(stereo, -1, 1) * 32767).astype("<i2")
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav_file:
+        wav_file.setnchannels(2)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+async def upload(payload: bytes, filename: str, bits_per_second: float) -> float:
+    headers, body = await build_multipart_stream({"model": "whisper"}, "file", payload, filename, "application/octet-stream")
+    async with httpx.AsyncClient(transport=ThrottledTransport(bits_per_second), base_url="http://mock") as client:
+        start_time = time.perf_counter()
+        response = await client.post("/audio/transcriptions", headers=headers, content=body())
+        elapsed = time.perf_counter() - start_time
+    assert response.json()["received"] >= len(payload)
+    return elapsed
+
+
+def timed(function, *args, repeat: int):
+    """Best-of-repeat wall time of a blocking call, with its result"""
+    best, result = None, None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+async def measure_stt(name: str, raw: bytes, bits_per_second: float, repeat: int):
+    baseline_ms = round(await upload(raw, name, bits_per_second) * 1000, 1)
+    print(json.dumps({
+        "path": "stt", "input": name, "format": "original", "bytes": len(raw),
+        "encode_ms": 0.0, "upload_ms": baseline_ms, "total_ms": baseline_ms
+    }))
+
+    audio, decode_seconds = timed(decode_audio, raw, repeat=repeat)
+    for audio_format, bitrate in STT_FORMATS:
+        payload, encode_seconds = timed(encode_audio, audio, audio_format, bitrate, repeat=repeat)
+        upload_ms = round(await upload(payload, f"speech.{audio_format}", bits_per_second) * 1000, 1)
+        total_ms = round((decode_seconds + encode_seconds) * 1000 + upload_ms, 1)
+        print(json.dumps({
+            "path": "stt", "input": name, "format": audio_format, "bitrate": bitrate, "bytes": len(payload),
+            "bytes_saved": round(1 - len(payload) / len(raw), 3),
+            "encode_ms": round((decode_seconds + encode_seconds) * 1000, 1), "upload_ms": upload_ms,
+            "total_ms": total_ms, "ms_saved": round(baseline_ms - total_ms, 1)
+        }))
+
+
+def measure_tts(name: str, raw: bytes, repeat: int):
+    for audio_format, bitrate in TTS_FORMATS:
+        payload, seconds = timed(transcode_audio, raw, audio_format, bitrate, repeat=repeat)
+        print(json.dumps({
+            "path": "tts", "input": name, "format": audio_format, "bitrate": bitrate, "bytes": len(payload),
+            "bytes_saved": round(1 - len(payload) / len(raw), 3), "transcode_ms": round(seconds * 1000, 1)
+        }))
+
+
+async def main(inputs, uplink_mbit: float, repeat: int):
+    samples = [(os.path.basename(path), open(path, "rb").read()) for path in inputs]
+    if not samples:
+        samples = [("synthetic_44k_stereo.wav", synthetic_recording())]
+    for name, raw in samples:
+        await measure_stt(name, raw, uplink_mbit * 1e6, repeat)
+        measure_tts(name, raw, repeat)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inputs", nargs="*", default=[])
+    parser.add_argument("--uplink-mbit", type=float, default=20.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.inputs, args.uplink_mbit, args.repeat))
@@ -0,0 +1,100 @@
+"""Memory/throughput benchmark for the transcription upload path.
+
+Compares the previous path (read the whole upload, write a temp WAV, reopen it and
+post it as multipart) with the streamed path (spooled upload piped straight into the
+outbound multipart body) for 1-25 MB uploads. The upstream is an in-process httpx
+transport that drains the request body chunk by chunk without keeping it, so only the
+client side is measured.
+
+Usage:
+    python -m benchmarks.upload_benchmark [--sizes 1 5 10 25] [--repeat 3]
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+
+import httpx
+from fastapi import UploadFile
+from starlette.datastructures import Headers
+
+from com.mhire.app.common.multipart import build_multipart_stream
+
+MB = 1024 * 1024
+
+
+class DrainTransport(httpx.AsyncBaseTransport):
+    """Consumes request bodies incrementally (httpx.MockTransport would buffer them)"""
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        received = 0
+        async for chunk in request.stream:
+            received += len(chunk)
+        return httpx.Response(200, json={"text": "", "received": received})
+
+
+def _make_upload(size: int) -> UploadFile:
+    # Same spooling behaviour as Starlette's multipart parser (rolls to disk above 1 MB)
+    spooled = tempfile.SpooledTemporaryFile(max_size=MB)
+    spooled.write(os.urandom(size))
+    spooled.seek(0)
+    return UploadFile(file=spooled, size=size, filename="sample.wav", headers=Headers({"content-type": "audio/wav"}))
+
+
+async def legacy_upload(client: httpx.AsyncClient, upload: UploadFile, temp_dir: str):
+    audio_file = await upload.read()
+    temp_audio_path = os.path.join(temp_dir, "request.wav")
+    with open(temp_audio_path, 'wb') as f:
+        f.write(audio_file)
+    with open(temp_audio_path, 'rb') as audio_stream:
+        response = await client.post("/audio/transcriptions", files={'file': audio_stream}, data={"model": "whisper"})
+    os.remove(temp_audio_path)
+    return response
+
+
+async def streamed_upload(client: httpx.AsyncClient, upload: UploadFile, temp_dir: str):
+    headers, body = await build_multipart_stream({"model": "whisper"}, "file", upload, upload.filename, upload.content_type)
+    return await client.post("/audio/transcriptions", headers=headers, content=body())
+
+
+async def measure(path, size: int, repeat: int):
+    results = []
+    async with httpx.AsyncClient(transport=DrainTransport(), base_url="http://mock") as client:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for _ in range(repeat):
+                upload = _make_upload(size)
+                tracemalloc.start()
+                start_time = time.perf_counter()
+                response = await path(client, upload, temp_dir)
+                elapsed = time.perf_counter() - start_time
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                await upload.close()
+                assert response.json()["received"] >= size
+                results.append((elapsed, peak))
+
+    best_time = min(elapsed for elapsed, _ in results)
+    return {
+        "path": path.__name__,
+        "size_mb": size / MB,
+        "best_ms": round(best_time * 1000, 2),
+        "throughput_mb_s": round(size / MB / best_time, 1),
+        "peak_alloc_mb": round(max(peak for _, peak in results) / MB, 2),
+    }
+
+
+async def main(sizes, repeat: int):
+    for size_mb in sizes:
+        for path in (legacy_upload, streamed_upload):
+            print(json.dumps(await measure(path, int(size_mb * MB), repeat)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 5, 10, 25])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.repeat))
@@ -0,0 +1,381 @@
+import os
+import math
+import time
+import fcntl
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from contextlib import asynccontextmanager, nullcontext
+from typing import Any, AsyncContextManager, AsyncIterator, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from starlette.requests import HTTPConnection
+
+from com.mhire.app.config.config import Config
+from com.mhire.app.common.telemetry import ADMISSION_REJECTIONS, observe_stage
+
+# Waiters re-check free slots with backoff between these bounds
+POLL_MIN_INTERVAL = 0.05
+POLL_MAX_INTERVAL = 0.25
+
+# Buckets idle for this many refill periods are full again and can be dropped
+BUCKET_PRUNE_PERIODS = 4
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+# (file descriptor, lock file path) of a held slot
+Slot = Tuple[int, str]
+
+class AdmissionRejected(HTTPException):
+    """Request turned away before doing any work: 429 for the client, 503 for the server"""
+
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(
+            status_code=status_code,
+            detail=detail,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))}
+        )
+
+class SlotPool:
+    """Counting semaphore shared by every process on the host, built on ``flock``.
+
+    Slot i is ``<directory>/<name>.<i>.lock`` and is held while its exclusive lock is
+    held; the kernel drops the lock if the holder dies, so crashed workers never leak
+    capacity. Pools created per client remove their files on release, so only
+    clients with requests in flight leave files behind.
+    """
+
+    def __init__(self, directory: str, name: str, size: int, remove_on_release: bool = False):
+        self.directory = directory
+        self.name = name
+        self.size = size
+        self.remove_on_release = remove_on_release
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, index: int) -> str:
+        return os.path.join(self.directory, f"{self.name}.{index}.lock")
+
+    def try_acquire(self) -> Optional[Slot]:
+        for index in range(self.size):
+            path = self._path(index)
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            # The previous holder may have removed the file after we opened it
+            try:
+                if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                    return fd, path
+            except FileNotFoundError:
+                pass
+            os.close(fd)
+        return None
+
+    async def acquire(self, timeout: Optional[float] = None, should_stop: Optional[Callable[[], bool]] = None) -> Optional[Slot]:
+        """Wait for a free slot; None once timeout passes or should_stop() returns True"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        interval = POLL_MIN_INTERVAL
+        while True:
+            slot = self.try_acquire()
+            if slot is not None:
+                return slot
+            if should_stop is not None and should_stop():
+                return None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                interval = min(interval, remaining)
+            await asyncio.sleep(interval)
+            interval = min(interval * 2, POLL_MAX_INTERVAL)
+
+    def release(self, slot: Slot):
+        fd, path = slot
+        if self.remove_on_release:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+    def in_use(self) -> int:
+        """Slots currently held by any process"""
+        held = 0
+        for index in range(self.size):
+            try:
+                fd = os.open(self._path(index), os.O_RDONLY)
+            except FileNotFoundError:
+                continue
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                held += 1
+            finally:
+                # Closing drops the probe's own lock
+                os.close(fd)
+        return held
+
+class TokenBuckets:
+    """Token buckets in a SQLite file, so every worker draws from the same budget"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._takes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            # Lazily, like the connection itself, so no connection outlives a fork
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """Take cost tokens from the bucket; returns 0 on success, else seconds until they are available"""
+        now = time.time()
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+            connection.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now)
+            )
+
+            self._takes += 1
+            if self._takes % 1000 == 0:
+                connection.execute(
+                    "DELETE FROM buckets WHERE updated < ?",
+                    (now - BUCKET_PRUNE_PERIODS * burst / rate,)
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return wait
+
+    def refund(self, key: str, rate: float, burst: float, cost: float = 1.0):
+        """Return tokens taken for work that was refused afterwards; the next take caps the bucket at burst"""
+        self.take(key, rate, burst, -cost)
+
+class AdmissionPolicy:
+    """Limits for one router; a limit of 0 disables it"""
+
+    def __init__(
+        self,
+        concurrency: int,
+        client_concurrency: int,
+        rate: float,
+        burst: float,
+        queue_size: int,
+        queue_timeout: float
+    ):
+        self.concurrency = concurrency
+        self.client_concurrency = client_concurrency
+        self.rate = rate
+        self.burst = burst
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+
+    @classmethod
+    def from_config(cls, config: Config, name: str) -> "AdmissionPolicy":
+        return cls(
+            concurrency=getattr(config, f"admission_{name}_concurrency"),
+            client_concurrency=getattr(config, f"admission_{name}_client_concurrency"),
+            rate=getattr(config, f"admission_{name}_rate"),
+            burst=getattr(config, f"admission_{name}_burst"),
+            queue_size=getattr(config, f"admission_{name}_queue_size"),
+            queue_timeout=getattr(config, f"admission_{name}_queue_timeout")
+        )
+
+class AdmissionController:
+    """Admission for one router, shared by all workers on the host.
+
+    A request is checked, cheapest first, against the client's token bucket and
+    concurrency (429 when exceeded), then takes one of ``concurrency`` global slots.
+    When all are busy it joins a wait queue of ``queue_size`` places for at most
+    ``queue_timeout`` seconds; a full queue or an expired wait is a 503. Waiters
+    poll for free slots, so admission from the queue is not strictly FIFO.
+    """
+
+    def __init__(self, name: str, policy: AdmissionPolicy, state_dir: str, buckets: TokenBuckets):
+        self.name = name
+        self.policy = policy
+        self.state_dir = state_dir
+        self.buckets = buckets
+        self.slots = SlotPool(state_dir, f"{name}_slot", policy.concurrency)
+        self.queue = SlotPool(state_dir, f"{name}_queue", policy.queue_size)
+        self.client_dir = os.path.join(state_dir, f"{name}_clients")
+        self._stats = {"admitted": 0, "queued": 0, "rejected": 0}
+
+    def _reject(self, status_code: int, reason: str, detail: str, retry_after: float):
+        self._stats["rejected"] += 1
+        ADMISSION_REJECTIONS.labels(self.name, reason).inc()
+        raise AdmissionRejected(status_code, detail, retry_after)
+
+    def _client_pool(self, client: str) -> SlotPool:
+        digest = hashlib.sha256(client.encode()).hexdigest()[:32]
+        return SlotPool(self.client_dir, digest, self.policy.client_concurrency, remove_on_release=True)
+
+    async def _take_slot(self) -> Optional[Slot]:
+        if self.policy.concurrency <= 0:
+            return None
+        slot = self.slots.try_acquire()
+        if slot is not None:
+            return slot
+
+        place = self.queue.try_acquire() if self.policy.queue_size > 0 else None
+        if place is None:
+            self._reject(503, "queue_full", f"Server busy: {self.name} queue is full", self.policy.queue_timeout)
+        self._stats["queued"] += 1
+        start = time.monotonic()
+        try:
+            slot = await self.slots.acquire(self.policy.queue_timeout)
+        finally:
+            self.queue.release(place)
+        observe_stage("admission.wait", time.monotonic() - start, router=self.name)
+        if slot is None:
+            self._reject(
+                503, "queue_timeout",
+                f"Server busy: no {self.name} capacity within {self.policy.queue_timeout:g}s",
+                self.policy.queue_timeout
+            )
+        return slot
+
+    @asynccontextmanager
+    async def admit(self, client: str) -> AsyncIterator[None]:
+        """Hold admission for the duration of the block, or raise AdmissionRejected.
+
+        The rate token is taken after the client's slot and given back when the global
+        limit refuses the request, so rejected requests do not use up the client's budget.
+        """
+        client_pool = self._client_pool(client) if self.policy.client_concurrency > 0 else None
+        client_slot = client_pool.try_acquire() if client_pool is not None else None
+        if client_pool is not None and client_slot is None:
+            self._reject(
+                429, "client_concurrency",
+                f"Too many concurrent {self.name} requests from this client",
+                POLL_MAX_INTERVAL
+            )
+
+        try:
+            bucket = f"{self.name}:{client}"
+            if self.policy.rate > 0:
+                wait = await asyncio.to_thread(self.buckets.take, bucket, self.policy.rate, max(1.0, self.policy.burst))
+                if wait > 0:
+                    self._reject(429, "rate_limited", f"Rate limit exceeded for {self.name} requests", wait)
+
+            try:
+                slot = await self._take_slot()
+            except AdmissionRejected:
+                if self.policy.rate > 0:
+                    await asyncio.to_thread(self.buckets.refund, bucket, self.policy.rate, max(1.0, self.policy.burst))
+                raise
+            try:
+                self._stats["admitted"] += 1
+                yield
+            finally:
+                if slot is not None:
+                    self.slots.release(slot)
+        finally:
+            if client_slot is not None:
+                client_pool.release(client_slot)
+
+    async def take_turn(self, client: str, rate: float, burst: float):
+        """Charge one unit of work inside an admitted session to the client's turn bucket; 429 when it is empty"""
+        if rate <= 0:
+            return
+        wait = await asyncio.to_thread(self.buckets.take, f"{self.name}_turn:{client}", rate, max(1.0, burst))
+        if wait > 0:
+            self._reject(429, "turn_rate_limited", f"Too many {self.name} turns from this client", wait)
+
+    def stats(self) -> Dict[str, Any]:
+        """Policy, host-wide slot usage and this worker's counters"""
+        return {
+            "concurrency": self.policy.concurrency,
+            "in_use": self.slots.in_use() if self.policy.concurrency > 0 else None,
+            "client_concurrency": self.policy.client_concurrency,
+            "rate": self.policy.rate,
+            "burst": self.policy.burst,
+            "queue_size": self.policy.queue_size,
+            "queued_now": self.queue.in_use() if self.policy.queue_size > 0 else None,
+            "queue_timeout": self.policy.queue_timeout,
+            **self._stats
+        }
+
+class AdmissionManager:
+    """Admission controllers per router, created lazily from Config"""
+
+    def __init__(self):
+        self.config = Config()
+        self.enabled = self.config.admission_enabled
+        self.state_dir = self.config.admission_state_path
+        self._buckets: Optional[TokenBuckets] = None
+        self._controllers: Dict[str, AdmissionController] = {}
+
+    def controller(self, name: str) -> AdmissionController:
+        controller = self._controllers.get(name)
+        if controller is None:
+            if self._buckets is None:
+                self._buckets = TokenBuckets(os.path.join(self.state_dir, "buckets.sqlite3"))
+            controller = AdmissionController(
+                name, AdmissionPolicy.from_config(self.config, name), self.state_dir, self._buckets
+            )
+            self._controllers[name] = controller
+        return controller
+
+    def client_id(self, connection: HTTPConnection) -> str:
+        """Client address as seen by nginx, falling back to the socket peer"""
+        header = connection.headers.get(self.config.admission_client_header)
+        if header:
+            return header.split(",")[0].strip()
+        return connection.client.host if connection.client else "unknown"
+
+    def limit(self, name: str) -> Callable[[Request], AsyncIterator[None]]:
+        """Route dependency that admits each request under the named router's policy"""
+        controller = self.controller(name) if self.enabled else None
+
+        async def dependency(request: Request) -> AsyncIterator[None]:
+            if controller is None:
+                yield
+                return
+            async with controller.admit(self.client_id(request)):
+                yield
+        return dependency
+
+    def session(self, name: str, connection: HTTPConnection) -> AsyncContextManager[None]:
+        """Admission held for a long-lived connection, such as a websocket, under the named router's policy"""
+        if not self.enabled:
+            return nullcontext()
+        return self.controller(name).admit(self.client_id(connection))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "routers": {name: controller.stats() for name, controller in self._controllers.items()}
+        }
+
+# Create a singleton instance
+admission = AdmissionManager()
@@ -0,0 +1,322 @@
+import io
+import wave
+import struct
+import subprocess
+from math import gcd
+from typing import List, Optional
+
+import numpy as np
+
+# Sample rate expected by the Silero models and Whisper
+TARGET_SAMPLE_RATE = 16000
+
+# Encoded formats: ffmpeg muxer (also the file extension), ffmpeg encoder and media type.
+# Opus goes in an Ogg container, which Groq accepts as .ogg
+AUDIO_FORMATS = {
+    "wav": ("wav", "pcm_s16le", "audio/wav"),
+    "flac": ("flac", "flac", "audio/flac"),
+    "opus": ("ogg", "libopus", "audio/ogg"),
+    "mp3": ("mp3", "libmp3lame", "audio/mpeg"),
+}
+LOSSY_FORMATS = ("opus", "mp3")
+# libopus defaults to complexity 10, which encodes speech about four times slower than 5
+OPUS_COMPLEXITY = 5
+
+# Media types a client may list in Accept, and the format each one negotiates
+MEDIA_TYPE_FORMATS = {
+    "audio/wav": "wav",
+    "audio/x-wav": "wav",
+    "audio/wave": "wav",
+    "audio/flac": "flac",
+    "audio/x-flac": "flac",
+    "audio/ogg": "opus",
+    "audio/opus": "opus",
+    "audio/mpeg": "mp3",
+    "audio/mp3": "mp3",
+}
+
+def resample(audio: np.ndarray, orig_sr: int, target_sr: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Polyphase resampling of a mono float32 signal"""
+    if orig_sr == target_sr or audio.size == 0:
+        return audio.astype(np.float32, copy=False)
+    from scipy.signal import resample_poly
+    divisor = gcd(orig_sr, target_sr)
+    return resample_poly(audio, target_sr // divisor, orig_sr // divisor).astype(np.float32)
+
+def _decode_wav(audio_file: bytes):
+    """Decode PCM WAV with the standard library; returns (samples, sample_rate) or None"""
+    try:
+        with wave.open(io.BytesIO(audio_file), 'rb') as wav_file:
+            channels = wav_file.getnchannels()
+            sample_width = wav_file.getsampwidth()
+            sample_rate = wav_file.getframerate()
+            frames = wav_file.readframes(wav_file.getnframes())
+    except (wave.Error, EOFError):
+        return None
+
+    if sample_width == 1:
+        audio = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        audio = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768
+    elif sample_width == 4:
+        audio = np.frombuffer(frames, dtype='<i4').astype(np.float32) / 2147483648
+    else:
+        return None
+
+    # Downmix interleaved channels
+    if channels > 1:
+        audio = audio[:len(audio) - len(audio) % channels].reshape(-1, channels).mean(axis=1)
+    return audio, sample_rate
+
+def decode_audio(audio_file: bytes, target_sr: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+    """Decode any audio payload to mono float32 at target_sr.
+
+    PCM WAV is decoded in-process; other containers/codecs go through ffmpeg.
+    """
+    decoded = _decode_wav(audio_file)
+    if decoded is not None:
+        audio, sample_rate = decoded
+        return resample(audio, sample_rate, target_sr)
+
+    process = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", "pipe:0", "-f", "s16le", "-ac", "1", "-ar", str(target_sr), "pipe:1"],
+        input=audio_file,
+        capture_output=True
+    )
+    if process.returncode != 0:
+        raise ValueError(f"Could not decode audio: {process.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(process.stdout, dtype='<i2').astype(np.float32) / 32768
+
+def encode_wav(audio: np.ndarray, sample_rate: int = TARGET_SAMPLE_RATE) -> bytes:
+    """Encode a mono float32 signal as 16-bit PCM WAV"""
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype('<i2')
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+def sniff_format(payload: bytes) -> Optional[str]:
+    """Format of an encoded payload from its first bytes, or None if it is none of AUDIO_FORMATS"""
+    if payload[:4] == b"RIFF" and payload[8:12] == b"WAVE":
+        return "wav"
+    if payload[:4] == b"fLaC":
+        return "flac"
+    if payload[:4] == b"OggS" and b"OpusHead" in payload[:64]:
+        return "opus"
+    if payload[:3] == b"ID3" or (len(payload) > 1 and payload[0] == 0xFF and payload[1] & 0xE0 == 0xE0):
+        return "mp3"
+    return None
+
+def negotiate_format(requested: Optional[str], accept: Optional[str], default: str) -> str:
+    """The explicitly requested format, else the most preferred one listed in an Accept header, else default"""
+    if requested:
+        if requested not in AUDIO_FORMATS:
+            raise ValueError(f"Unsupported audio format: {requested} (expected one of {', '.join(AUDIO_FORMATS)})")
+        return requested
+    best, best_quality = default, 0.0
+    for entry in (accept or "").split(","):
+        media_type, *parameters = [part.strip() for part in entry.split(";")]
+        quality = 1.0
+        for parameter in parameters:
+            if parameter.startswith("q="):
+                try:
+                    quality = float(parameter[2:])
+                except ValueError:
+                    quality = 0.0
+        audio_format = MEDIA_TYPE_FORMATS.get(media_type.lower())
+        if audio_format is not None and quality > best_quality:
+            best, best_quality = audio_format, quality
+    return best
+
+def _encoder_args(audio_format: str, bitrate: Optional[str]) -> List[str]:
+    muxer, encoder, _ = AUDIO_FORMATS[audio_format]
+    args = ["-c:a", encoder]
+    if bitrate and audio_format in LOSSY_FORMATS:
+        args += ["-b:a", bitrate]
+    if audio_format == "opus":
+        args += ["-compression_level", str(OPUS_COMPLEXITY)]
+    return args + ["-f", muxer, "pipe:1"]
+
+def _run_encoder(args: List[str], payload: bytes) -> bytes:
+    process = subprocess.run(["ffmpeg", "-v", "error", *args], input=payload, capture_output=True)
+    if process.returncode != 0:
+        raise ValueError(f"Could not encode audio: {process.stderr.decode(errors='replace').strip()}")
+    return process.stdout
+
+def encode_audio(
+    audio: np.ndarray,
+    audio_format: str,
+    bitrate: Optional[str] = None,
+    sample_rate: int = TARGET_SAMPLE_RATE
+) -> bytes:
+    """Encode a mono float32 signal in one of AUDIO_FORMATS; bitrate applies to the lossy ones.
+
+    WAV is written in-process, everything else goes through ffmpeg.
+    """
+    if audio_format == "wav":
+        return encode_wav(audio, sample_rate)
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767).astype('<i2')
+    return _run_encoder(
+        ["-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0", *_encoder_args(audio_format, bitrate)],
+        pcm.tobytes()
+    )
+
+def transcode_audio(
+    payload: bytes,
+    audio_format: str,
+    bitrate: Optional[str] = None,
+    sample_rate: Optional[int] = None
+) -> bytes:
+    """Re-encode any audio payload as mono audio_format, keeping its sample rate unless one is given"""
+    args = ["-i", "pipe:0", "-ac", "1"]
+    if sample_rate:
+        args += ["-ar", str(sample_rate)]
+    if audio_format == "wav":
+        args += ["-bitexact"]
+    encoded = _run_encoder(args + _encoder_args(audio_format, bitrate), payload)
+    return _fill_wav_sizes(encoded) if audio_format == "wav" else encoded
+
+def _fill_wav_sizes(payload: bytes) -> bytes:
+    """ffmpeg cannot seek back into a pipe, so it leaves the RIFF and data sizes at 0xFFFFFFFF"""
+    data_offset = payload.find(b"data", 12)
+    if not payload.startswith(b"RIFF") or data_offset < 0:
+        return payload
+    patched = bytearray(payload)
+    struct.pack_into("<I", patched, 4, len(payload) - 8)
+    struct.pack_into("<I", patched, data_offset + 4, len(payload) - data_offset - 8)
+    return bytes(patched)
+
+def split_at_pauses(
+    audio: np.ndarray,
+    sample_rate: int = TARGET_SAMPLE_RATE,
+    target_seconds: float = 3.0,
+    max_seconds: float = 6.0
+) -> list:
+    """Split a signal into chunks of roughly target_seconds, cutting at the quietest point.
+
+    Each cut is placed at the lowest-energy 20 ms frame between target_seconds and
+    max_seconds after the previous cut, smoothed over 200 ms so that single quiet
+    frames inside words are not chosen. Returns a list of (start, end) sample offsets.
+    """
+    frame = sample_rate // 50
+    frames = len(audio) // frame
+    if frames == 0 or len(audio) <= max_seconds * sample_rate:
+        return [(0, len(audio))]
+
+    energy = np.sqrt(np.mean(audio[:frames * frame].reshape(frames, frame) ** 2, axis=1))
+    energy = np.convolve(energy, np.ones(10) / 10, mode="same")
+
+    target_frames, max_frames = int(target_seconds * 50), int(max_seconds * 50)
+    cuts, start = [], 0
+    while frames - start > max_frames:
+        window = energy[start + target_frames:start + max_frames]
+        cut = start + target_frames + int(np.argmin(window))
+        cuts.append(cut * frame)
+        start = cut
+
+    bounds = [0] + cuts + [len(audio)]
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def trim_silence(
+    audio: np.ndarray,
+    sample_rate: int = TARGET_SAMPLE_RATE,
+    threshold_db: float = -40.0,
+    pad: float = 0.1
+) -> tuple:
+    """(start, end) sample offsets of the audible part, ignoring leading and trailing silence.
+
+    A 20 ms frame is audible when its RMS is within threshold_db of the loudest frame;
+    pad seconds are kept on both sides. Returns (0, 0) for a silent signal.
+    """
+    frame = sample_rate // 50
+    frames = len(audio) // frame
+    if frames == 0:
+        return 0, 0
+
+    rms = np.sqrt(np.mean(audio[:frames * frame].reshape(frames, frame) ** 2, axis=1))
+    peak = rms.max()
+    if peak <= 1e-4:
+        return 0, 0
+
+    audible = np.flatnonzero(rms >= peak * 10 ** (threshold_db / 20))
+    padding = int(pad * sample_rate)
+    start = max(0, audible[0] * frame - padding)
+    end = min(len(audio), (audible[-1] + 1) * frame + padding)
+    return int(start), int(end)
+
+def plan_speech_regions(
+    segments: list,
+    total_samples: int,
+    sample_rate: int = TARGET_SAMPLE_RATE,
+    min_pause: float = 1.0,
+    pad: float = 0.1,
+    align: int = 1
+) -> list:
+    """Merge speech segments into the regions worth keeping, as (start, end) sample offsets.
+
+    segments are (start, end) seconds, e.g. from Silero VAD. Segments less than
+    min_pause seconds apart share a region, so short pauses between words stay in.
+    Regions are padded by pad seconds and snapped outwards to multiples of align
+    samples, so with align set to one video frame every region and every gap
+    between them lasts a whole number of frames.
+    """
+    if not segments:
+        return []
+    bounds = np.asarray(segments, dtype=np.float64) * sample_rate
+
+    # A region ends wherever the next segment starts at least min_pause later
+    breaks = np.flatnonzero(bounds[1:, 0] - bounds[:-1, 1] >= min_pause * sample_rate) + 1
+    starts = bounds[np.concatenate([[0], breaks]), 0] - pad * sample_rate
+    ends = bounds[np.concatenate([breaks - 1, [len(bounds) - 1]]), 1] + pad * sample_rate
+
+    starts = np.clip(np.floor(starts / align) * align, 0, total_samples).astype(np.int64)
+    ends = np.clip(np.ceil(ends / align) * align, 0, total_samples).astype(np.int64)
+    # Padding and snapping must not make neighbours overlap
+    starts[1:] = np.maximum(starts[1:], ends[:-1])
+    return [(int(start), int(end)) for start, end in zip(starts, ends) if end > start]
+
+def condense(audio: np.ndarray, regions: list, gap: int = 0) -> np.ndarray:
+    """The regions of a signal back to back, with gap samples of silence between them"""
+    if not regions:
+        return np.zeros(0, dtype=np.float32)
+    silence = np.zeros(gap, dtype=audio.dtype)
+    parts = []
+    for index, (start, end) in enumerate(regions):
+        if index and gap:
+            parts.append(silence)
+        parts.append(audio[start:end])
+    return np.concatenate(parts)
+
+def to_original_time(times, regions: list, sample_rate: int = TARGET_SAMPLE_RATE, gap: int = 0) -> np.ndarray:
+    """Map times in seconds on a condensed signal back onto the signal it was cut from.
+
+    Times that fall into the silence inserted between two regions map to the end
+    of the earlier region.
+    """
+    times = np.asarray(times, dtype=np.float64)
+    if not regions:
+        return times
+    bounds = np.asarray(regions, dtype=np.float64) / sample_rate
+    lengths = bounds[:, 1] - bounds[:, 0]
+    condensed_starts = np.concatenate([[0.0], np.cumsum(lengths[:-1] + gap / sample_rate)])
+    index = np.clip(np.searchsorted(condensed_starts, times, side="right") - 1, 0, len(bounds) - 1)
+    return bounds[index, 0] + np.clip(times - condensed_starts[index], 0.0, lengths[index])
+
+def join_clips(clips: list, align: int = 1, gap: int = 0) -> tuple:
+    """Concatenate signals into one, each followed by gap samples of silence and padded to a multiple of align.
+
+    Returns the joined signal and each clip's (start, end) sample offsets in it; a
+    clip's span includes its trailing silence, so the spans tile the whole signal.
+    """
+    parts, spans, offset = [], [], 0
+    for clip in clips:
+        length = -(-(len(clip) + gap) // align) * align
+        part = np.zeros(length, dtype=np.float32)
+        part[:len(clip)] = clip
+        parts.append(part)
+        spans.append((offset, offset + length))
+        offset += length
+    return (np.concatenate(parts) if parts else np.zeros(0, dtype=np.float32)), spans
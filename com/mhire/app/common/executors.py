@@ -0,0 +1,54 @@
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from com.mhire.app.config.config import Config
+
+T = TypeVar("T")
+
+class Executors:
+    """Sized thread pools for blocking work in a worker.
+
+    ``io`` runs file system calls and other short blocking calls. It is installed as
+    the event loop's default executor, so ``asyncio.to_thread`` uses it as well.
+    ``cpu`` runs decoding, silence detection and model inference, kept apart so a
+    burst of CPU work cannot starve file I/O.
+    """
+
+    def __init__(self):
+        self.config = Config()
+        self._io: Optional[ThreadPoolExecutor] = None
+        self._cpu: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def io(self) -> ThreadPoolExecutor:
+        if self._io is None:
+            self._io = ThreadPoolExecutor(max_workers=self.config.io_threads, thread_name_prefix="io")
+        return self._io
+
+    @property
+    def cpu(self) -> ThreadPoolExecutor:
+        if self._cpu is None:
+            self._cpu = ThreadPoolExecutor(max_workers=self.config.cpu_threads, thread_name_prefix="cpu")
+        return self._cpu
+
+    def install(self, loop: asyncio.AbstractEventLoop):
+        """Make the I/O pool the loop's default executor; called from the app lifespan"""
+        loop.set_default_executor(self.io)
+
+    async def run_cpu(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run a CPU-bound call on the CPU pool, keeping the caller's context like to_thread"""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+        return await loop.run_in_executor(self.cpu, call)
+
+    def shutdown(self):
+        # The I/O pool is the loop's default executor and is shut down with the loop
+        if self._cpu is not None:
+            self._cpu.shutdown(wait=False, cancel_futures=True)
+            self._cpu = None
+
+# Create a singleton instance
+executors = Executors()
@@ -0,0 +1,26 @@
+import asyncio
+from typing import List, Optional
+
+async def run_ffmpeg(args: List[str], cwd: Optional[str] = None):
+    """Run ffmpeg without blocking the event loop; raises RuntimeError with its stderr on failure"""
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-v", "error", "-y", *args,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd
+    )
+    _, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+
+async def probe_duration(path: str) -> float:
+    """Container duration in seconds, via ffprobe"""
+    process = await asyncio.create_subprocess_exec(
+        "ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", path,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
+    if process.returncode != 0:
+        raise RuntimeError(f"ffprobe failed: {stderr.decode(errors='replace').strip()}")
+    return float(stdout.decode().strip())
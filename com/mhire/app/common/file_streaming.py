@@ -0,0 +1,137 @@
+import os
+import asyncio
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+
+# Read size when a worker serves file bytes itself
+FILE_CHUNK_SIZE = 256 * 1024
+
+def file_validators(stat: os.stat_result) -> Tuple[str, str]:
+    """ETag and Last-Modified of a file, in the same form nginx produces for static files"""
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    return etag, formatdate(stat.st_mtime, usegmt=True)
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # Weak comparison, as required for If-None-Match
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def _not_modified_since(header: str, mtime: float) -> bool:
+    try:
+        return int(mtime) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+def is_not_modified(request: Request, etag: str, mtime: float) -> bool:
+    """Conditional GET: If-None-Match takes precedence over If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    return if_modified_since is not None and _not_modified_since(if_modified_since, mtime)
+
+def parse_range(request: Request, size: int, etag: str, last_modified: str) -> Optional[Tuple[int, int]]:
+    """Inclusive byte range requested by the client, or None to send the whole file.
+
+    Only single ranges are honoured; multi-range requests get the full body, which
+    RFC 9110 permits. Raises 416 for ranges that lie outside the file.
+    """
+    header = request.headers.get("range")
+    if not header or not header.startswith("bytes="):
+        return None
+
+    # A stale If-Range means the client's partial copy is outdated: send everything
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range not in (etag, last_modified):
+        return None
+
+    spec = header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+    start_text, _, end_text = spec.partition("-")
+    try:
+        if start_text:
+            start = int(start_text)
+            end = int(end_text) if end_text else size - 1
+        else:
+            # Suffix range: the last N bytes
+            start, end = max(0, size - int(end_text)), size - 1
+    except ValueError:
+        return None
+
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, min(end, size - 1)
+
+async def iter_file_range(path: str, start: int, end: int, chunk_size: int = FILE_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yield bytes start..end (inclusive) of a file; reads run in the thread pool"""
+    fd = await asyncio.to_thread(os.open, path, os.O_RDONLY)
+    try:
+        offset = start
+        while offset <= end:
+            chunk = await asyncio.to_thread(os.pread, fd, min(chunk_size, end - offset + 1), offset)
+            if not chunk:
+                break
+            offset += len(chunk)
+            yield chunk
+    finally:
+        os.close(fd)
+
+async def iter_file(path: str, chunk_size: int = FILE_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yield a whole file; reads run in the thread pool"""
+    stat = await asyncio.to_thread(os.stat, path)
+    async for chunk in iter_file_range(path, 0, stat.st_size - 1, chunk_size):
+        yield chunk
+
+async def serve_file(
+    request: Request,
+    path: str,
+    media_type: str,
+    accel_path: Optional[str] = None,
+    chunk_size: int = FILE_CHUNK_SIZE
+) -> Response:
+    """Serve a file with Range, ETag/Last-Modified and conditional GET support.
+
+    With accel_path set, the response only carries X-Accel-Redirect and nginx sends
+    the bytes itself (sendfile, ranges, validators), so no worker is held while a
+    client downloads or seeks. Without it the worker copies every chunk (no
+    zero-copy), which is meant for running without nginx, not for production.
+    """
+    if accel_path is not None:
+        return Response(headers={"X-Accel-Redirect": accel_path}, media_type=media_type)
+
+    stat = await asyncio.to_thread(os.stat, path)
+    etag, last_modified = file_validators(stat)
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": last_modified
+    }
+
+    if is_not_modified(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    byte_range = parse_range(request, stat.st_size, etag, last_modified)
+    status_code = 200
+    start, end = 0, stat.st_size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    if request.method == "HEAD" or stat.st_size == 0:
+        return Response(status_code=status_code, headers=headers, media_type=media_type)
+    return StreamingResponse(
+        iter_file_range(path, start, end, chunk_size),
+        status_code=status_code,
+        headers=headers,
+        media_type=media_type
+    )
@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Callable, Optional, Dict, Any
+
+import httpx
+
+from com.mhire.app.config.config import Config
+from com.mhire.app.common.telemetry import stage
+
+logger = logging.getLogger(__name__)
+
+# Upstream statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# Transport errors raised before the upstream could have acted on the request
+RETRYABLE_EXCEPTIONS = (
+    httpx.ConnectError,
+    httpx.ConnectTimeout,
+    httpx.PoolTimeout,
+    httpx.RemoteProtocolError,
+)
+
+
+class GroqHttpClient:
+    """Long-lived pooled HTTP client shared by every Groq call in a worker"""
+
+    def __init__(self):
+        self.config = Config()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._http2 = False
+        self._in_flight = 0
+        self._stats = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "total_latency_ms": 0.0,
+        }
+
+    def _http2_available(self) -> bool:
+        """HTTP/2 needs the optional h2 package (installed via httpx[http2])"""
+        if not self.config.http2_enabled:
+            return False
+        try:
+            import h2  # noqa: F401
+            return True
+        except ImportError:
+            logger.warning("HTTP/2 requested but the 'h2' package is missing, falling back to HTTP/1.1")
+            return False
+
+    def _build_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=self.config.http_max_connections,
+            max_keepalive_connections=self.config.http_max_keepalive_connections,
+            keepalive_expiry=self.config.http_keepalive_expiry,
+        )
+        timeout = httpx.Timeout(
+            connect=self.config.http_connect_timeout,
+            read=self.config.http_read_timeout,
+            write=self.config.http_write_timeout,
+            pool=self.config.http_pool_timeout,
+        )
+        headers = {}
+        if self.config.groq_api_key:
+            headers["Authorization"] = f"Bearer {self.config.groq_api_key}"
+
+        self._http2 = self._http2_available()
+        return httpx.AsyncClient(
+            base_url=self.config.groq_base_url,
+            headers=headers,
+            limits=limits,
+            timeout=timeout,
+            http2=self._http2,
+        )
+
+    async def start(self):
+        """Create the pooled client; called once per worker from the app lifespan"""
+        if self._client is None:
+            # Loading the CA bundle takes ~0.2 s, which would stall the loop during startup
+            self._client = await asyncio.to_thread(self._build_client)
+            logger.info(f"Started Groq HTTP client for {self.config.groq_base_url}")
+
+    async def close(self):
+        """Close pooled connections; called once per worker from the app lifespan"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("Closed Groq HTTP client")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        # Scripts and tests may call the services without running the app lifespan
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """Exponential backoff with jitter, honouring Retry-After when the upstream sends it"""
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), self.config.http_retry_backoff_max)
+                except ValueError:
+                    try:
+                        delay = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                        return min(max(delay, 0.0), self.config.http_retry_backoff_max)
+                    except (TypeError, ValueError):
+                        pass
+
+        delay = self.config.http_retry_backoff * (2 ** attempt)
+        delay = min(delay, self.config.http_retry_backoff_max)
+        return delay * (0.5 + random.random() / 2)
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        content_factory: Optional[Callable[[], AsyncIterator[bytes]]] = None,
+        **kwargs
+    ) -> httpx.Response:
+        """Send a request, retrying with backoff on 429/5xx and connection failures.
+
+        Streamed bodies can only be sent once, so they are passed as ``content_factory``
+        and a fresh stream is created for every attempt.
+        """
+        attempt = 0
+        while True:
+            start_time = time.time()
+            self._stats["requests"] += 1
+            self._in_flight += 1
+            if content_factory is not None:
+                kwargs["content"] = content_factory()
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except RETRYABLE_EXCEPTIONS as e:
+                if attempt >= self.config.http_max_retries:
+                    self._stats["failures"] += 1
+                    raise
+                delay = self._retry_delay(attempt)
+                logger.warning(f"Groq request {method} {url} failed ({e!r}), retrying in {delay:.2f}s")
+            except Exception:
+                self._stats["failures"] += 1
+                raise
+            else:
+                self._stats["total_latency_ms"] += (time.time() - start_time) * 1000
+                if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.config.http_max_retries:
+                    if response.status_code >= 400:
+                        self._stats["failures"] += 1
+                    return response
+                delay = self._retry_delay(attempt, response)
+                logger.warning(f"Groq request {method} {url} returned {response.status_code}, retrying in {delay:.2f}s")
+                await response.aclose()
+            finally:
+                self._in_flight -= 1
+
+            self._stats["retries"] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def stream(self, method: str, url: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """Open a streamed response; retries only happen before the first body byte is read"""
+        attempt = 0
+        while True:
+            start_time = time.time()
+            self._stats["requests"] += 1
+            self._in_flight += 1
+            response = None
+            try:
+                request = self.client.build_request(method, url, **kwargs)
+                response = await self.client.send(request, stream=True)
+            except RETRYABLE_EXCEPTIONS as e:
+                self._in_flight -= 1
+                if attempt >= self.config.http_max_retries:
+                    self._stats["failures"] += 1
+                    raise
+                delay = self._retry_delay(attempt)
+                logger.warning(f"Groq stream {method} {url} failed ({e!r}), retrying in {delay:.2f}s")
+            except Exception:
+                self._in_flight -= 1
+                self._stats["failures"] += 1
+                raise
+
+            if response is not None:
+                if response.status_code in RETRYABLE_STATUS_CODES and attempt < self.config.http_max_retries:
+                    self._in_flight -= 1
+                    delay = self._retry_delay(attempt, response)
+                    logger.warning(f"Groq stream {method} {url} returned {response.status_code}, retrying in {delay:.2f}s")
+                    await response.aclose()
+                else:
+                    if response.status_code >= 400:
+                        self._stats["failures"] += 1
+                    try:
+                        yield response
+                    finally:
+                        self._stats["total_latency_ms"] += (time.time() - start_time) * 1000
+                        self._in_flight -= 1
+                        await response.aclose()
+                    return
+
+            self._stats["retries"] += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        # Timed as one stage, retries included, since that is what the caller waits for
+        with stage("groq.request", path=url):
+            return await self.request("POST", url, **kwargs)
+
+    def _pool_stats(self) -> Dict[str, Any]:
+        """Inspect the underlying httpcore pool; its internals are not part of httpx's public API"""
+        pool_stats = {"connections": 0, "idle": 0, "active": 0, "http2": 0}
+        if self._client is None:
+            return pool_stats
+
+        transport = getattr(self._client, "_transport", None)
+        pool = getattr(transport, "_pool", None)
+        for connection in list(getattr(pool, "connections", []) or []):
+            pool_stats["connections"] += 1
+            try:
+                if connection.is_idle():
+                    pool_stats["idle"] += 1
+                else:
+                    pool_stats["active"] += 1
+                if "HTTP/2" in connection.info():
+                    pool_stats["http2"] += 1
+            except Exception:
+                continue
+        return pool_stats
+
+    def stats(self) -> Dict[str, Any]:
+        """Request counters and connection pool metrics for this worker"""
+        completed = self._stats["requests"] - self._in_flight
+        return {
+            "base_url": self.config.groq_base_url,
+            "started": self._client is not None,
+            "http2": self._http2,
+            "requests": self._stats["requests"],
+            "retries": self._stats["retries"],
+            "failures": self._stats["failures"],
+            "in_flight": self._in_flight,
+            "avg_latency_ms": round(self._stats["total_latency_ms"] / completed, 2) if completed > 0 else 0.0,
+            "limits": {
+                "max_connections": self.config.http_max_connections,
+                "max_keepalive_connections": self.config.http_max_keepalive_connections,
+                "keepalive_expiry": self.config.http_keepalive_expiry,
+            },
+            "pool": self._pool_stats(),
+        }
+
+
+# Create a singleton instance
+groq_client = GroqHttpClient()
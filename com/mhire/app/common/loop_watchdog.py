@@ -0,0 +1,81 @@
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from typing import Optional
+
+from com.mhire.app.common.telemetry import LOOP_LAG, LOOP_STALLS
+
+logger = logging.getLogger(__name__)
+
+# Frames of the blocked stack included in the warning
+STACK_DEPTH = 12
+
+class LoopWatchdog:
+    """Reports code that blocks the event loop.
+
+    A task on the loop records a heartbeat every ``interval`` seconds and the lag of
+    each wake-up. A watcher thread checks the heartbeat, and once the loop has been
+    unresponsive for ``threshold`` seconds it logs the loop thread's current stack,
+    which names the handler that is blocking. Stalls are counted in /metrics, so a
+    benchmark or test run can assert there were none.
+    """
+
+    def __init__(self, threshold: float, interval: float = 0.05):
+        self.threshold = threshold
+        self.interval = interval
+        self._beat = 0.0
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await asyncio.to_thread(self._thread.join)
+        self._thread = None
+
+    async def _heartbeat(self):
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(0.0, now - expected)
+            LOOP_LAG.observe(lag)
+            if lag >= self.threshold:
+                LOOP_STALLS.inc()
+                logger.warning(f"Event loop was blocked for {lag:.3f}s")
+
+    def _watch(self):
+        reported_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            blocked = time.monotonic() - beat - self.interval
+            # One stack per stall: the heartbeat moves on once the loop is free again
+            if blocked < self.threshold or beat == reported_beat:
+                continue
+            reported_beat = beat
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame, limit=STACK_DEPTH))
+            logger.warning(f"Event loop blocked for {blocked:.3f}s so far, in:\n{stack}")
+
@@ -0,0 +1,89 @@
+import os
+import uuid
+from typing import AsyncIterator, Callable, Dict, Tuple, Union
+
+from fastapi import UploadFile
+
+# Read size for streaming uploads into outbound requests
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+AudioSource = Union[bytes, UploadFile]
+
+def upload_size(source: AudioSource) -> int:
+    """Size of an in-memory payload or a spooled upload without reading it"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return len(source)
+    if getattr(source, "size", None) is not None:
+        return source.size
+    source.file.seek(0, os.SEEK_END)
+    size = source.file.tell()
+    source.file.seek(0)
+    return size
+
+async def read_all(source: AudioSource) -> bytes:
+    """The whole payload in memory, for decoding"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return bytes(source)
+    # Request uploads are Starlette's UploadFile, not the FastAPI subclass, so check for bytes instead
+    await source.seek(0)
+    return await source.read()
+
+async def iter_chunks(source: AudioSource, chunk_size: int = UPLOAD_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Yield a payload in chunks; uploads are read incrementally rather than loaded whole"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source)
+        for offset in range(0, len(view), chunk_size):
+            yield bytes(view[offset:offset + chunk_size])
+        return
+
+    await source.seek(0)
+    while True:
+        chunk = await source.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+def quote_disposition(value: str) -> str:
+    """Make a name or filename safe inside a quoted Content-Disposition parameter.
+
+    Encodes '"', CR and LF the way browsers do for form-data, so a client-supplied
+    filename cannot end the parameter or inject header lines.
+    """
+    return value.replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+async def build_multipart_stream(
+    fields: Dict[str, str],
+    file_field: str,
+    source: AudioSource,
+    filename: str,
+    content_type: str
+) -> Tuple[Dict[str, str], Callable[[], AsyncIterator[bytes]]]:
+    """Build a streaming multipart/form-data body.
+
+    Returns the request headers (with an exact Content-Length) and a factory that
+    produces a fresh body stream per call, so the request can be retried. Field names
+    and the filename are quoted with quote_disposition.
+    """
+    boundary = uuid.uuid4().hex
+    prefix = b"".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{quote_disposition(name)}"\r\n\r\n{value}\r\n'.encode()
+        for name, value in fields.items()
+    )
+    prefix += (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{quote_disposition(file_field)}"; filename="{quote_disposition(filename)}"\r\n'
+        f'Content-Type: {content_type}\r\n\r\n'
+    ).encode()
+    suffix = f'\r\n--{boundary}--\r\n'.encode()
+
+    headers = {
+        "Content-Type": f"multipart/form-data; boundary={boundary}",
+        "Content-Length": str(len(prefix) + upload_size(source) + len(suffix))
+    }
+
+    async def body() -> AsyncIterator[bytes]:
+        yield prefix
+        async for chunk in iter_chunks(source):
+            yield chunk
+        yield suffix
+
+    return headers, body
@@ -1,7 +1,7 @@
 import time
 
 class NetworkResponse:
-    def _init_(self, version=0.1):
+    def __init__(self, version=0.1):
         self.version = version
 
     def success_response(self, http_code, data, resource, start_time):
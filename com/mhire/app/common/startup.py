@@ -0,0 +1,79 @@
+import os
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from com.mhire.app.common.telemetry import stage
+
+logger = logging.getLogger(__name__)
+
+WarmUpStep = Tuple[str, Callable[[], Awaitable[Any]]]
+
+def process_uptime() -> Optional[float]:
+    """Seconds since this process was started (or forked), from /proc; None elsewhere"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22, counted after the parenthesised command name, which may contain spaces
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return round(uptime - start_ticks / os.sysconf("SC_CLK_TCK"), 3)
+
+class Startup:
+    """Startup phases of a worker and whether it is ready for traffic.
+
+    Liveness (``/``) only says the event loop answers. Readiness (``/ready``) also
+    needs the lifespan startup and the warm-up phase to have finished, so a load
+    balancer or orchestrator does not route requests to a worker that is still
+    loading models. A failed warm-up step is recorded and logged but does not keep
+    the worker out of rotation: the step's work then happens lazily on first use.
+    """
+
+    def __init__(self):
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self.ready = False
+        self.ready_after: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time one startup phase; also reported as the ``startup.<name>`` stage"""
+        start = time.perf_counter()
+        try:
+            with stage(f"startup.{name}"):
+                yield
+        except Exception as e:
+            self.phases[name] = {"seconds": round(time.perf_counter() - start, 3), "error": str(e)}
+            raise
+        self.phases[name] = {"seconds": round(time.perf_counter() - start, 3)}
+
+    async def warm_up(self, steps: List[WarmUpStep]):
+        """Run the warm-up steps in order, then mark the worker ready"""
+        for name, step in steps:
+            try:
+                with self.phase(name):
+                    await step()
+            except Exception:
+                logger.exception(f"Warm-up step {name} failed")
+        self.mark_ready()
+
+    def mark_ready(self):
+        self.ready = True
+        self.ready_after = process_uptime()
+        logger.info(f"Worker ready {self.ready_after}s after it started")
+
+    def mark_draining(self):
+        """Shutting down: report not ready so no new traffic is routed here"""
+        self.ready = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "ready_after": self.ready_after,
+            "phases": self.phases,
+        }
+
+# Create a singleton instance
+startup = Startup()
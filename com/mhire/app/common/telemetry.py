@@ -0,0 +1,197 @@
+import os
+import time
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from opentelemetry import trace
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+
+# Without an OpenTelemetry SDK configured (e.g. via opentelemetry-instrument) spans are no-ops
+tracer = trace.get_tracer("com.mhire.app")
+
+# Request ID of the work running in the current task, attached to every span it opens
+current_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("current_request_id", default=None)
+
+# Stages range from sub-millisecond file writes to multi-minute renders
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+HTTP_REQUESTS = Counter(
+    "avatar_http_requests_total",
+    "HTTP requests handled, by route template and status",
+    ["method", "route", "status"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "avatar_http_request_duration_seconds",
+    "Time from request start to the end of the response body",
+    ["method", "route"],
+    buckets=STAGE_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge(
+    "avatar_http_requests_in_flight",
+    "HTTP requests currently being handled",
+    multiprocess_mode="livesum"
+)
+STAGE_SECONDS = Histogram(
+    "avatar_stage_duration_seconds",
+    "Duration of one pipeline stage",
+    ["stage"],
+    buckets=STAGE_BUCKETS
+)
+STAGE_FAILURES = Counter(
+    "avatar_stage_failures_total",
+    "Pipeline stages that raised",
+    ["stage"]
+)
+STAGE_IN_FLIGHT = Gauge(
+    "avatar_stage_in_flight",
+    "Pipeline stages currently running",
+    ["stage"],
+    multiprocess_mode="livesum"
+)
+ADMISSION_REJECTIONS = Counter(
+    "avatar_admission_rejections_total",
+    "Requests turned away by admission control",
+    ["router", "reason"]
+)
+LOOP_LAG = Histogram(
+    "avatar_event_loop_lag_seconds",
+    "How late the event loop heartbeat woke up",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+LOOP_STALLS = Counter(
+    "avatar_event_loop_stalls_total",
+    "Times the event loop was blocked for longer than the watchdog threshold"
+)
+
+def bind_request_id(request_id: str):
+    """Tag the current task, and the span it is in, with a request ID"""
+    current_request_id.set(request_id)
+    trace.get_current_span().set_attribute("request_id", request_id)
+
+def _span_attributes(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    request_id = current_request_id.get()
+    if request_id is not None:
+        attributes.setdefault("request_id", request_id)
+    return {key: value for key, value in attributes.items() if value is not None}
+
+@contextmanager
+def stage(name: str, **attributes) -> Iterator[trace.Span]:
+    """Time a block as a pipeline stage: histogram, in-flight gauge and a span"""
+    in_flight = STAGE_IN_FLIGHT.labels(name)
+    in_flight.inc()
+    start = time.perf_counter()
+    try:
+        with tracer.start_as_current_span(name, attributes=_span_attributes(attributes)) as span:
+            yield span
+    except BaseException:
+        STAGE_FAILURES.labels(name).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(name).observe(time.perf_counter() - start)
+        in_flight.dec()
+
+def observe_stage(name: str, seconds: float, end_time: Optional[float] = None, **attributes):
+    """Record a stage that was timed elsewhere (a child process, the inference server)"""
+    STAGE_SECONDS.labels(name).observe(seconds)
+    end_time = end_time if end_time is not None else time.time()
+    span = tracer.start_span(
+        name,
+        attributes=_span_attributes(attributes),
+        start_time=int((end_time - seconds) * 1e9)
+    )
+    span.end(end_time=int(end_time * 1e9))
+
+class StageClock:
+    """Splits a stretch of time into consecutive stages reported as they start.
+
+    Used where only stage transitions are visible, such as SadTalker's progress
+    output; each stage lasts until the next one is entered.
+    """
+
+    def __init__(self, prefix: str, **attributes):
+        self.prefix = prefix
+        self.attributes = attributes
+        self.current: Optional[str] = None
+        self.started_at = 0.0
+
+    def enter(self, name: Optional[str]):
+        if name == self.current:
+            return
+        now = time.time()
+        if self.current is not None:
+            observe_stage(f"{self.prefix}.{self.current}", now - self.started_at, now, **self.attributes)
+        self.current, self.started_at = name, now
+
+    def finish(self):
+        self.enter(None)
+
+class MetricsMiddleware:
+    """ASGI middleware recording request counts, latency, in-flight requests and upload time.
+
+    Routes are labelled by their template (``/api/v1/video/stream/{video_id}``) so
+    label cardinality stays bounded. Each request also gets a server span.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = {"code": 500}
+        upload = {"started": None, "bytes": 0}
+
+        async def timed_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                # Upload read: first body chunk to the last one
+                if upload["started"] is None:
+                    upload["started"] = time.perf_counter()
+                upload["bytes"] += len(message.get("body", b""))
+                if not message.get("more_body", False) and upload["bytes"]:
+                    observe_stage("upload.read", time.perf_counter() - upload["started"], bytes=upload["bytes"])
+            return message
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        with tracer.start_as_current_span(
+            f"{scope['method']} {scope['path']}",
+            kind=trace.SpanKind.SERVER,
+            attributes={"http.method": scope["method"], "http.target": scope["path"]}
+        ) as span:
+            try:
+                await self.app(scope, timed_receive, timed_send)
+            finally:
+                HTTP_IN_FLIGHT.dec()
+                # Routing stores the matched route in the shared scope
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                span.update_name(f"{scope['method']} {route}")
+                span.set_attribute("http.route", route)
+                span.set_attribute("http.status_code", status["code"])
+                HTTP_REQUESTS.labels(scope["method"], route, str(status["code"])).inc()
+                HTTP_REQUEST_SECONDS.labels(scope["method"], route).observe(time.perf_counter() - start)
+
+def metrics_payload() -> Tuple[bytes, str]:
+    """Metrics in the Prometheus text format, merged across workers in multiprocess mode"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
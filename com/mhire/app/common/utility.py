@@ -9,17 +9,19 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-def generate_request_id(key):
+def generate_request_id(key=None):
     """
-    Generate a unique request ID based on the provided key
+    Generate a request ID; random unless a key is given
     
     Args:
-        key (str): A string key to generate the UUID from
+        key (str, optional): A string key to derive the UUID from. Without one the ID is
+            a random UUID, so requests arriving in the same clock tick never share an ID
         
     Returns:
         str: A formatted request ID
     """
-    request_id = f"REQ-{uuid.uuid5(uuid.NAMESPACE_DNS, key)}"
+    request_uuid = uuid.uuid4() if key is None else uuid.uuid5(uuid.NAMESPACE_DNS, key)
+    request_id = f"REQ-{request_uuid}"
     return request_id
 
 def ensure_directory_exists(directory_path):
@@ -41,6 +43,33 @@ def ensure_directory_exists(directory_path):
         logging.error(f"Failed to create directory {directory_path}: {str(e)}")
         return False
 
+def write_file(file_path, content):
+    """
+    Write bytes to a file, replacing it; blocking, so run it in a thread from async code
+    
+    Args:
+        file_path (str): Path to the file
+        content (bytes): Data to write
+    """
+    with open(file_path, 'wb') as f:
+        f.write(content)
+
+def remove_file(file_path):
+    """
+    Remove a file if it exists; blocking, so run it in a thread from async code
+    
+    Args:
+        file_path (str): Path to the file
+        
+    Returns:
+        bool: True if a file was removed
+    """
+    try:
+        os.remove(file_path)
+        return True
+    except FileNotFoundError:
+        return False
+
 def get_timestamp():
     """
     Get current timestamp in a formatted string
@@ -13,21 +13,209 @@ class Config:
             cls._instance.groq_api_key = os.getenv("GROQ_API_KEY", "")
             cls._instance.groq_tts_model = os.getenv("GROQ_TTS_MODEL", "mixtral-8x7b-32768")
             cls._instance.groq_stt_model = os.getenv("GROQ_STT_MODEL", "whisper-large-v3")
+            cls._instance.groq_base_url = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1")
+            
+            # Streaming text-to-speech configuration
+            cls._instance.tts_stream_prefetch = max(1, int(os.getenv("TTS_STREAM_PREFETCH", "2")))
+            cls._instance.tts_stream_chunk_size = int(os.getenv("TTS_STREAM_CHUNK_SIZE", "4096"))
+            cls._instance.tts_sentence_max_chars = int(os.getenv("TTS_SENTENCE_MAX_CHARS", "300"))
+            
+            # Text-to-speech output: format (mp3, opus, flac or wav) and bitrate for clients that do not negotiate one
+            cls._instance.tts_output_format = os.getenv("TTS_OUTPUT_FORMAT", "mp3")
+            cls._instance.tts_output_bitrate = os.getenv("TTS_OUTPUT_BITRATE", "48k")
+            # Requested from Groq; a lossless format means the speech is compressed only once
+            cls._instance.tts_upstream_format = os.getenv("TTS_UPSTREAM_FORMAT", "wav")
+            
+            # Real-time conversation pipeline configuration
+            cls._instance.conversation_stage_queue = int(os.getenv("CONVERSATION_STAGE_QUEUE", "4"))
+            cls._instance.conversation_outbound_queue = int(os.getenv("CONVERSATION_OUTBOUND_QUEUE", "64"))
+            cls._instance.conversation_partial_interval = float(os.getenv("CONVERSATION_PARTIAL_INTERVAL", "2"))
+            
+            # Text-to-speech cache configuration (shared on disk by all workers)
+            cls._instance.tts_cache_enabled = os.getenv("TTS_CACHE_ENABLED", "true").lower() == "true"
+            cls._instance.tts_cache_max_bytes = int(os.getenv("TTS_CACHE_MAX_BYTES", str(1024 ** 3)))
+            cls._instance.tts_cache_ttl = float(os.getenv("TTS_CACHE_TTL", str(7 * 24 * 3600)))
+            
+            # Shared HTTP client configuration (one pooled client per worker)
+            cls._instance.http2_enabled = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+            cls._instance.http_max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", "20"))
+            cls._instance.http_max_keepalive_connections = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "10"))
+            cls._instance.http_keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+            cls._instance.http_connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+            cls._instance.http_read_timeout = float(os.getenv("HTTP_READ_TIMEOUT", "60"))
+            cls._instance.http_write_timeout = float(os.getenv("HTTP_WRITE_TIMEOUT", "30"))
+            cls._instance.http_pool_timeout = float(os.getenv("HTTP_POOL_TIMEOUT", "5"))
+            cls._instance.http_max_retries = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+            cls._instance.http_retry_backoff = float(os.getenv("HTTP_RETRY_BACKOFF", "0.5"))
+            cls._instance.http_retry_backoff_max = float(os.getenv("HTTP_RETRY_BACKOFF_MAX", "8"))
             
             # SadTalker configuration
             cls._instance.sadtalker_path = os.getenv("SADTALKER_PATH", "./com/mhire/app/services/video_service/video_assets/SadTalker")
+            cls._instance.sadtalker_python = os.getenv("SADTALKER_PYTHON", "python")
+            
+            # "server" dispatches to the resident inference server, "subprocess" spawns inference.py per render
+            cls._instance.sadtalker_backend = os.getenv("SADTALKER_BACKEND", "server")
+            cls._instance.sadtalker_server_socket = os.getenv("SADTALKER_SERVER_SOCKET", "/tmp/sadtalker_inference.sock")
+            cls._instance.sadtalker_server_fallback = os.getenv("SADTALKER_SERVER_FALLBACK", "true").lower() == "true"
+            cls._instance.sadtalker_health_interval = float(os.getenv("SADTALKER_HEALTH_INTERVAL", "10"))
+            cls._instance.sadtalker_warmup_image = os.getenv("SADTALKER_WARMUP_IMAGE", os.path.join(cls._instance.sadtalker_path, "examples/source_image/art_0.png"))
+            cls._instance.sadtalker_warmup_audio = os.getenv("SADTALKER_WARMUP_AUDIO", os.path.join(cls._instance.sadtalker_path, "examples/driven_audio/bus_chinese.wav"))
+            
+            # Render output: frames are piped from memory into one x264 encoder; slower presets and higher CRF give smaller files
+            cls._instance.render_encoder_preset = os.getenv("RENDER_ENCODER_PRESET", "veryfast")
+            cls._instance.render_encoder_crf = int(os.getenv("RENDER_ENCODER_CRF", "23"))
+            cls._instance.render_audio_bitrate = os.getenv("RENDER_AUDIO_BITRATE", "96k")
+            # SadTalker's intermediate files go here instead of the shared video_assets volume (empty: system temp dir)
+            cls._instance.render_scratch_dir = os.getenv("RENDER_SCRATCH_DIR", "")
+            
+            # Video delivery: "accel" hands the transfer to nginx via X-Accel-Redirect (use it in production; the
+            # compose file does), "direct" reads the file in the worker chunk by chunk, for running without nginx
+            cls._instance.video_stream_mode = os.getenv("VIDEO_STREAM_MODE", "direct")
+            cls._instance.video_accel_prefix = os.getenv("VIDEO_ACCEL_PREFIX", "/protected-video-assets/")
+            cls._instance.video_stream_chunk_size = int(os.getenv("VIDEO_STREAM_CHUNK_SIZE", str(256 * 1024)))
+            
+            # Progressive output: audio is cut at pauses into clips of roughly this length, each published to HLS when rendered
+            cls._instance.progressive_segment_seconds = float(os.getenv("PROGRESSIVE_SEGMENT_SECONDS", "3"))
+            cls._instance.progressive_max_segment_seconds = float(os.getenv("PROGRESSIVE_MAX_SEGMENT_SECONDS", "6"))
+            
+            # Batch requests: speech for every text is synthesized concurrently, then all utterances share one render
+            cls._instance.batch_max_items = int(os.getenv("BATCH_MAX_ITEMS", "32"))
+            cls._instance.tts_batch_concurrency = int(os.getenv("TTS_BATCH_CONCURRENCY", "4"))
+            # Face renderer batch size for batch renders, and silence after each utterance so lips close before the cut
+            cls._instance.render_batch_size = int(os.getenv("RENDER_BATCH_SIZE", "8"))
+            cls._instance.render_batch_gap_seconds = float(os.getenv("RENDER_BATCH_GAP_SECONDS", "0.2"))
+            
+            # Render quality tiers: realtime, balanced or high; adaptive mode steps down under load
+            cls._instance.render_default_quality = os.getenv("RENDER_DEFAULT_QUALITY", "high")
+            cls._instance.render_adaptive_quality = os.getenv("RENDER_ADAPTIVE_QUALITY", "true").lower() == "true"
+            cls._instance.render_degrade_queue_depth = int(os.getenv("RENDER_DEGRADE_QUEUE_DEPTH", "4"))
+            cls._instance.render_degrade_latency = float(os.getenv("RENDER_DEGRADE_LATENCY", "120"))
+            cls._instance.render_latency_window = float(os.getenv("RENDER_LATENCY_WINDOW", "300"))
+            cls._instance.conversation_render_quality = os.getenv("CONVERSATION_RENDER_QUALITY", "realtime")
+            
+            # Idle compositing: only the audible part of a turn is rendered, silence is filled from a cached idle loop
+            cls._instance.idle_compositing = os.getenv("IDLE_COMPOSITING", "true").lower() == "true"
+            cls._instance.idle_loop_seconds = float(os.getenv("IDLE_LOOP_SECONDS", "3"))
+            cls._instance.silence_threshold_db = float(os.getenv("SILENCE_THRESHOLD_DB", "-40"))
+            cls._instance.silence_padding = float(os.getenv("SILENCE_PADDING", "0.1"))
+            cls._instance.min_speech_seconds = float(os.getenv("MIN_SPEECH_SECONDS", "0.2"))
+            
+            # Render job queue configuration (per worker)
+            cls._instance.render_workers = int(os.getenv("RENDER_WORKERS", "1"))
+            cls._instance.render_queue_max_size = int(os.getenv("RENDER_QUEUE_MAX_SIZE", "32"))
+            cls._instance.render_job_timeout = float(os.getenv("RENDER_JOB_TIMEOUT", "600"))
             
             # File paths configuration
             cls._instance.audio_assets_path = os.getenv("AUDIO_ASSETS_PATH", "./com/mhire/app/services/audio_service/audio_assets")
+            cls._instance.tts_cache_path = os.getenv("TTS_CACHE_PATH", os.path.join(cls._instance.audio_assets_path, "tts_cache"))
             cls._instance.video_assets_path = os.getenv("VIDEO_ASSETS_PATH", "./com/mhire/app/services/video_service/video_assets")
+            cls._instance.render_jobs_path = os.getenv("RENDER_JOBS_PATH", "./com/mhire/app/services/video_service/render_jobs")
+            # Driving audio written for queued renders (joined batches, trimmed speech); each job removes its own
+            cls._instance.render_inputs_path = os.getenv("RENDER_INPUTS_PATH", os.path.join(cls._instance.video_assets_path, "render_inputs"))
+            cls._instance.avatar_cache_path = os.getenv("AVATAR_CACHE_PATH", "./com/mhire/app/services/video_service/avatar_cache")
+            cls._instance.avatar_cache_max_bytes = int(os.getenv("AVATAR_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+            cls._instance.avatar_cache_max_entries = int(os.getenv("AVATAR_CACHE_MAX_ENTRIES", "500"))
+            
+            # Storage lifecycle: artifact index, per-directory quotas and TTLs (0 disables a limit)
+            cls._instance.storage_lifecycle_enabled = os.getenv("STORAGE_LIFECYCLE_ENABLED", "true").lower() == "true"
+            cls._instance.storage_index_path = os.getenv("STORAGE_INDEX_PATH", "./com/mhire/app/services/storage_service/storage_index/artifacts.sqlite3")
+            cls._instance.audio_assets_max_bytes = int(os.getenv("AUDIO_ASSETS_MAX_BYTES", str(5 * 1024 ** 3)))
+            cls._instance.audio_assets_ttl = float(os.getenv("AUDIO_ASSETS_TTL", str(7 * 24 * 3600)))
+            cls._instance.video_assets_max_bytes = int(os.getenv("VIDEO_ASSETS_MAX_BYTES", str(20 * 1024 ** 3)))
+            cls._instance.video_assets_ttl = float(os.getenv("VIDEO_ASSETS_TTL", str(7 * 24 * 3600)))
+            cls._instance.storage_sweep_interval = float(os.getenv("STORAGE_SWEEP_INTERVAL", "60"))
+            cls._instance.storage_reconcile_interval = float(os.getenv("STORAGE_RECONCILE_INTERVAL", "3600"))
+            # Recently used artifacts may still be rendering or streaming
+            cls._instance.storage_min_age = float(os.getenv("STORAGE_MIN_AGE", "600"))
+            cls._instance.storage_orphan_age = float(os.getenv("STORAGE_ORPHAN_AGE", "3600"))
             cls._instance.ui_assets_path = os.getenv("UI_ASSETS_PATH", "./com/mhire/app/ui/app_assets")
             
+            # Render dispatch: "local" renders in this worker, "remote" queues jobs for render worker nodes
+            cls._instance.render_dispatch = os.getenv("RENDER_DISPATCH", "local")
+            cls._instance.render_broker_path = os.getenv("RENDER_BROKER_PATH", os.path.join(cls._instance.render_jobs_path, "broker.sqlite3"))
+            cls._instance.render_broker_poll_interval = float(os.getenv("RENDER_BROKER_POLL_INTERVAL", "0.5"))
+            cls._instance.render_broker_retention = float(os.getenv("RENDER_BROKER_RETENTION", str(24 * 3600)))
+            # Shared by every node; on API nodes it is where nginx serves renders from
+            cls._instance.artifact_store_path = os.getenv("ARTIFACT_STORE_PATH", cls._instance.video_assets_path)
+            cls._instance.render_worker_id = os.getenv("RENDER_WORKER_ID", "")
+            cls._instance.render_worker_lease = float(os.getenv("RENDER_WORKER_LEASE", "30"))
+            cls._instance.render_worker_max_attempts = int(os.getenv("RENDER_WORKER_MAX_ATTEMPTS", "2"))
+            
+            # Idempotent renders: repeated submissions reuse the job that did the work
+            cls._instance.render_idempotency_path = os.getenv("RENDER_IDEMPOTENCY_PATH", os.path.join(cls._instance.render_jobs_path, "idempotency.sqlite3"))
+            cls._instance.render_idempotency_ttl = float(os.getenv("RENDER_IDEMPOTENCY_TTL", str(24 * 3600)))
+            # Also match identical audio, avatar and settings without an Idempotency-Key
+            cls._instance.render_dedupe = os.getenv("RENDER_DEDUPE", "false").lower() == "true"
+            
+            # Blocking work: thread pools per worker, and a watchdog for code that blocks the event loop
+            cls._instance.io_threads = int(os.getenv("IO_THREADS", "32"))
+            cls._instance.cpu_threads = int(os.getenv("CPU_THREADS", str(os.cpu_count() or 1)))
+            cls._instance.loop_watchdog_enabled = os.getenv("LOOP_WATCHDOG_ENABLED", "true").lower() == "true"
+            cls._instance.loop_lag_threshold = float(os.getenv("LOOP_LAG_THRESHOLD", "0.1"))
+            
+            # Startup: models are loaded and test-run before a worker reports ready on /ready
+            cls._instance.warmup_enabled = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+            
+            # Admission control: limits shared by all workers on the host (0 disables a limit)
+            cls._instance.admission_enabled = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+            cls._instance.admission_state_path = os.getenv("ADMISSION_STATE_PATH", "/tmp/avatar_admission")
+            # nginx overwrites X-Real-IP with the peer address, so clients cannot spoof it
+            cls._instance.admission_client_header = os.getenv("ADMISSION_CLIENT_HEADER", "X-Real-IP")
+            # Audio router: Groq-backed transcription and speech
+            cls._instance.admission_audio_concurrency = int(os.getenv("ADMISSION_AUDIO_CONCURRENCY", "32"))
+            cls._instance.admission_audio_client_concurrency = int(os.getenv("ADMISSION_AUDIO_CLIENT_CONCURRENCY", "4"))
+            cls._instance.admission_audio_rate = float(os.getenv("ADMISSION_AUDIO_RATE", "2"))
+            cls._instance.admission_audio_burst = float(os.getenv("ADMISSION_AUDIO_BURST", "10"))
+            cls._instance.admission_audio_queue_size = int(os.getenv("ADMISSION_AUDIO_QUEUE_SIZE", "64"))
+            cls._instance.admission_audio_queue_timeout = float(os.getenv("ADMISSION_AUDIO_QUEUE_TIMEOUT", "10"))
+            # Video router: render submissions
+            cls._instance.admission_video_concurrency = int(os.getenv("ADMISSION_VIDEO_CONCURRENCY", "8"))
+            cls._instance.admission_video_client_concurrency = int(os.getenv("ADMISSION_VIDEO_CLIENT_CONCURRENCY", "2"))
+            cls._instance.admission_video_rate = float(os.getenv("ADMISSION_VIDEO_RATE", "0.2"))
+            cls._instance.admission_video_burst = float(os.getenv("ADMISSION_VIDEO_BURST", "5"))
+            cls._instance.admission_video_queue_size = int(os.getenv("ADMISSION_VIDEO_QUEUE_SIZE", "16"))
+            cls._instance.admission_video_queue_timeout = float(os.getenv("ADMISSION_VIDEO_QUEUE_TIMEOUT", "30"))
+            # Conversation websocket: whole sessions, plus a token bucket per client for the turns in them
+            cls._instance.admission_conversation_concurrency = int(os.getenv("ADMISSION_CONVERSATION_CONCURRENCY", "16"))
+            cls._instance.admission_conversation_client_concurrency = int(os.getenv("ADMISSION_CONVERSATION_CLIENT_CONCURRENCY", "2"))
+            cls._instance.admission_conversation_rate = float(os.getenv("ADMISSION_CONVERSATION_RATE", "0.2"))
+            cls._instance.admission_conversation_burst = float(os.getenv("ADMISSION_CONVERSATION_BURST", "3"))
+            cls._instance.admission_conversation_queue_size = int(os.getenv("ADMISSION_CONVERSATION_QUEUE_SIZE", "8"))
+            cls._instance.admission_conversation_queue_timeout = float(os.getenv("ADMISSION_CONVERSATION_QUEUE_TIMEOUT", "10"))
+            cls._instance.admission_conversation_turn_rate = float(os.getenv("ADMISSION_CONVERSATION_TURN_RATE", "0.5"))
+            cls._instance.admission_conversation_turn_burst = float(os.getenv("ADMISSION_CONVERSATION_TURN_BURST", "5"))
+            # SadTalker renders running at once across all workers
+            cls._instance.render_global_concurrency = int(os.getenv("RENDER_GLOBAL_CONCURRENCY", "2"))
+            
             # API configuration
             cls._instance.api_version = os.getenv("API_VERSION", "v1")
             cls._instance.api_prefix = f"/api/{cls._instance.api_version}"
             
+            # Metrics and tracing: request and per-stage metrics on /metrics, spans via OpenTelemetry
+            cls._instance.metrics_enabled = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+            
             # Silero models (fallback)
             cls._instance.silero_encoder_path = os.path.join(cls._instance.audio_assets_path, "silero_encoder_v5.onnx")
             cls._instance.silero_decoder_path = os.path.join(cls._instance.audio_assets_path, "silero_decoder_v5.onnx")
+            # The bundled encoder/decoder pair is Silero VAD; local text output needs a Silero STT model + labels
+            cls._instance.silero_stt_model_path = os.getenv("SILERO_STT_MODEL_PATH", "")
+            cls._instance.silero_stt_labels_path = os.getenv("SILERO_STT_LABELS_PATH", "")
+            cls._instance.onnx_intra_op_threads = int(os.getenv("ONNX_INTRA_OP_THREADS", "1"))
+            cls._instance.onnx_inter_op_threads = int(os.getenv("ONNX_INTER_OP_THREADS", "1"))
+            cls._instance.silero_max_batch = int(os.getenv("SILERO_MAX_BATCH", "16"))
+            cls._instance.silero_batch_wait_ms = float(os.getenv("SILERO_BATCH_WAIT_MS", "10"))
+            
+            # Speech detection: Silero VAD cuts silence before STT and rendering; pauses shorter than VAD_MIN_PAUSE stay in
+            cls._instance.vad_threshold = float(os.getenv("VAD_THRESHOLD", "0.5"))
+            cls._instance.vad_min_pause = float(os.getenv("VAD_MIN_PAUSE", "1.0"))
+            cls._instance.stt_trim_silence = os.getenv("STT_TRIM_SILENCE", "true").lower() == "true"
+            # Silence left between speech regions sent to Groq, so Whisper still sees the sentence break
+            cls._instance.stt_pause_seconds = float(os.getenv("STT_PAUSE_SECONDS", "0.3"))
+            # Larger uploads are sent as they are rather than decoded in memory
+            cls._instance.stt_trim_max_bytes = int(os.getenv("STT_TRIM_MAX_BYTES", str(10 * 1024 * 1024)))
+            # Audio sent to Groq is 16 kHz mono in this format (wav, flac or opus); STT_TRANSCODE also covers untrimmed uploads
+            cls._instance.stt_upload_format = os.getenv("STT_UPLOAD_FORMAT", "flac")
+            cls._instance.stt_upload_bitrate = os.getenv("STT_UPLOAD_BITRATE", "24k")
+            cls._instance.stt_transcode = os.getenv("STT_TRANSCODE", "true").lower() == "true"
 
         return cls._instance
\ No newline at end of file
@@ -1,19 +1,70 @@
-from fastapi import FastAPI
+import time
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi import status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from fastapi.staticfiles import StaticFiles
 
 from com.mhire.app.config.config import Config
+from com.mhire.app.common.http_client import groq_client
+from com.mhire.app.common.telemetry import MetricsMiddleware, metrics_payload
+from com.mhire.app.common.admission import AdmissionRejected, admission
+from com.mhire.app.common.executors import executors
+from com.mhire.app.common.loop_watchdog import LoopWatchdog
+from com.mhire.app.common.startup import startup
+from com.mhire.app.common.network_responses import NetworkResponse, HTTPCode
 from com.mhire.app.services.audio_service.audio_router import router as audio_router
+from com.mhire.app.services.audio_service.audio_service import audio_service
 from com.mhire.app.services.video_service.video_router import router as video_router
+from com.mhire.app.services.video_service.video_service import video_service
+from com.mhire.app.services.conversation_service.conversation_router import router as conversation_router
+from com.mhire.app.services.storage_service.storage_router import router as storage_router
+from com.mhire.app.services.storage_service.storage_service import storage_service
 
 config = Config()
+network_response = NetworkResponse()
+loop_watchdog = LoopWatchdog(config.loop_lag_threshold)
+
+def warm_up_steps():
+    """Work done before the worker reports ready, instead of inside the first requests"""
+    if not config.warmup_enabled:
+        return []
+    return [("warmup.silero", audio_service.warm_up)]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    with startup.phase("lifespan"):
+        # Blocking calls go to sized pools; the watchdog reports anything that still blocks the loop
+        executors.install(asyncio.get_running_loop())
+        if config.loop_watchdog_enabled:
+            await loop_watchdog.start()
+        # One pooled Groq client per worker, reused by every request on its event loop
+        await groq_client.start()
+        await video_service.start()
+        # Background flushing of the artifact index, and quota sweeps in one elected worker
+        await storage_service.start()
+    # Warm up in the background: the worker is live at once and ready once this finishes
+    warm_up = asyncio.create_task(startup.warm_up(warm_up_steps()))
+    try:
+        yield
+    finally:
+        startup.mark_draining()
+        warm_up.cancel()
+        await asyncio.gather(warm_up, return_exceptions=True)
+        await storage_service.stop()
+        await video_service.stop()
+        await groq_client.close()
+        await loop_watchdog.stop()
+        executors.shutdown()
 
 app = FastAPI(
     title="AI-Based Live Video Conferencing",
     description="Live video conferencing system with AI-powered avatars",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -25,9 +76,30 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request counts, latency and in-flight requests, plus a server span per request
+if config.metrics_enabled:
+    app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    # Same envelope as the routers, with the status and Retry-After clients back off on
+    return JSONResponse(
+        status_code=exc.status_code,
+        headers=exc.headers,
+        content=network_response.error_response(
+            exc.status_code,
+            exc.status_code * 100,
+            exc.detail,
+            request.url.path.removeprefix(f"{config.api_prefix}/"),
+            time.time()
+        )
+    )
+
 # Register routers
 app.include_router(audio_router)
 app.include_router(video_router)
+app.include_router(conversation_router)
+app.include_router(storage_router)
 
 # Mount static directories for serving files
 app.mount("/audio-assets", StaticFiles(directory=config.audio_assets_path), name="audio-assets")
@@ -36,3 +108,28 @@ app.mount("/video-assets", StaticFiles(directory=config.video_assets_path), name
 @app.get("/", status_code=status.HTTP_200_OK, response_class=PlainTextResponse)
 async def health_check():
     return "AI-powered Live Video Conferencing system is running and healthy"
+
+@app.get("/ready")
+async def readiness_check():
+    """503 until lifespan startup and warm-up have finished, and again while shutting down"""
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if startup.ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=startup.stats()
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # Merging the per-worker files touches the disk, so keep it off the event loop
+    payload, content_type = await asyncio.to_thread(metrics_payload)
+    return Response(payload, media_type=content_type)
+
+@app.get(f"{config.api_prefix}/admission")
+async def admission_stats():
+    """Admission limits and host-wide slot usage per router"""
+    start_time = time.time()
+    return network_response.success_response(
+        HTTPCode.SUCCESS,
+        await asyncio.to_thread(admission.stats),
+        "admission",
+        start_time
+    )
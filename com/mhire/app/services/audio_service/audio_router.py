@@ -1,25 +1,44 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from typing import Optional
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
 import time
 
 from com.mhire.app.config.config import Config
 from com.mhire.app.services.audio_service.audio_service import audio_service
+from com.mhire.app.common.http_client import groq_client
+from com.mhire.app.common.audio_utils import negotiate_format
 from com.mhire.app.common.network_responses import NetworkResponse, HTTPCode
+from com.mhire.app.common.admission import admission
 
-router = APIRouter(prefix=f"{Config().api_prefix}/audio", tags=["audio"])
+config = Config()
+router = APIRouter(prefix=f"{config.api_prefix}/audio", tags=["audio"])
 network_response = NetworkResponse()
+# Groq-backed endpoints share the audio admission policy
+admitted = [Depends(admission.limit("audio"))]
 
-@router.post("/transcribe")
-async def transcribe_audio(file: UploadFile = File(...), use_groq: bool = Form(True)):
-    """Transcribe audio using Groq Whisper API or Silero fallback"""
+def _negotiate_format(requested: Optional[str], accept: Optional[str]) -> str:
+    # An unsupported format field is a client error; Accept never fails, it falls back to TTS_OUTPUT_FORMAT
+    try:
+        return negotiate_format(requested, accept, config.tts_output_format)
+    except ValueError as e:
+        raise HTTPException(status_code=HTTPCode.UNPROCESSABLE_ENTITY, detail=str(e))
+
+@router.post("/transcribe", dependencies=admitted)
+async def transcribe_audio(
+    file: UploadFile = File(...),
+    use_groq: bool = Form(True),
+    trim_silence: Optional[bool] = Form(None)
+):
+    """Transcribe audio using Groq Whisper API or Silero fallback
+
+    Silence is cut before the audio goes to Groq (trim_silence overrides STT_TRIM_SILENCE);
+    segment timestamps in the result refer to the uploaded audio.
+    """
     start_time = time.time()
     
     try:
-        # Read audio file content
-        audio_content = await file.read()
-        
-        # Call audio service to transcribe
-        result = await audio_service.transcribe_audio(audio_content, use_groq)
+        # Hand the spooled upload to the service, which streams it without buffering it whole
+        result = await audio_service.transcribe_audio(file, use_groq, trim_silence)
         
         return network_response.success_response(
             HTTPCode.SUCCESS,
@@ -27,6 +46,14 @@ async def transcribe_audio(file: UploadFile = File(...), use_groq: bool = Form(T
             "audio/transcribe",
             start_time
         )
+    except HTTPException as e:
+        return network_response.error_response(
+            e.status_code,
+            e.status_code * 100,
+            str(e.detail),
+            "audio/transcribe",
+            start_time
+        )
     except Exception as e:
         return network_response.error_response(
             HTTPCode.INTERNAL_SERVER_ERROR,
@@ -36,14 +63,25 @@ async def transcribe_audio(file: UploadFile = File(...), use_groq: bool = Form(T
             start_time
         )
 
-@router.post("/speak")
-async def text_to_speech(text: str = Form(...), voice: Optional[str] = Form("alloy")):
-    """Convert text to speech using Groq TTS API"""
+@router.post("/speak", dependencies=admitted)
+async def text_to_speech(
+    text: str = Form(...),
+    voice: Optional[str] = Form("alloy"),
+    format: Optional[str] = Form(None),
+    bitrate: Optional[str] = Form(None),
+    accept: Optional[str] = Header(None)
+):
+    """Convert text to speech using Groq TTS API
+
+    The output format is the format field (mp3, opus, flac or wav), else the preferred
+    audio type in the Accept header, else TTS_OUTPUT_FORMAT.
+    """
     start_time = time.time()
     
     try:
+        audio_format = _negotiate_format(format, accept)
         # Call audio service for text-to-speech
-        result = await audio_service.text_to_speech(text, voice)
+        result = await audio_service.text_to_speech(text, voice, audio_format, bitrate)
         
         return network_response.success_response(
             HTTPCode.SUCCESS,
@@ -51,6 +89,14 @@ async def text_to_speech(text: str = Form(...), voice: Optional[str] = Form("all
             "audio/speak",
             start_time
         )
+    except HTTPException as e:
+        return network_response.error_response(
+            e.status_code,
+            e.status_code * 100,
+            str(e.detail),
+            "audio/speak",
+            start_time
+        )
     except Exception as e:
         return network_response.error_response(
             HTTPCode.INTERNAL_SERVER_ERROR,
@@ -58,4 +104,91 @@ async def text_to_speech(text: str = Form(...), voice: Optional[str] = Form("all
             str(e),
             "audio/speak",
             start_time
-        )
\ No newline at end of file
+        )
+
+@router.post("/speak/batch", dependencies=admitted)
+async def text_to_speech_batch(
+    texts: List[str] = Form(...),
+    voice: Optional[str] = Form("alloy"),
+    format: Optional[str] = Form(None),
+    bitrate: Optional[str] = Form(None),
+    accept: Optional[str] = Header(None)
+):
+    """Convert several texts (repeated texts fields) to speech; returns one item per text, in order"""
+    start_time = time.time()
+    
+    try:
+        audio_format = _negotiate_format(format, accept)
+        result = await audio_service.text_to_speech_batch(texts, voice, audio_format, bitrate)
+        
+        return network_response.success_response(
+            HTTPCode.SUCCESS,
+            result,
+            "audio/speak/batch",
+            start_time
+        )
+    except HTTPException as e:
+        return network_response.error_response(
+            e.status_code,
+            e.status_code * 100,
+            str(e.detail),
+            "audio/speak/batch",
+            start_time
+        )
+    except Exception as e:
+        return network_response.error_response(
+            HTTPCode.INTERNAL_SERVER_ERROR,
+            50000,
+            str(e),
+            "audio/speak/batch",
+            start_time
+        )
+
+@router.post("/speak/stream", dependencies=admitted)
+async def text_to_speech_stream(
+    text: str = Form(...),
+    voice: Optional[str] = Form("alloy"),
+    save: bool = Form(False)
+):
+    """Stream synthesized speech as it arrives, sentence by sentence"""
+    start_time = time.time()
+    
+    try:
+        result = await audio_service.stream_text_to_speech(text, voice, save)
+    except Exception as e:
+        return network_response.error_response(
+            HTTPCode.INTERNAL_SERVER_ERROR,
+            50000,
+            str(e),
+            "audio/speak/stream",
+            start_time
+        )
+    
+    headers = {"X-Request-ID": result["request_id"], "X-Cache": "HIT" if result["cached"] else "MISS"}
+    if result["audio_path"]:
+        headers["X-Audio-Path"] = result["audio_path"]
+    return StreamingResponse(result["stream"], media_type="audio/mpeg", headers=headers)
+
+@router.get("/tts-cache")
+async def tts_cache_stats():
+    """Hit/miss statistics and disk usage of the TTS cache"""
+    start_time = time.time()
+    
+    return network_response.success_response(
+        HTTPCode.SUCCESS,
+        audio_service.tts_cache_stats(),
+        "audio/tts-cache",
+        start_time
+    )
+
+@router.get("/http-pool")
+async def http_pool_stats():
+    """Connection pool and retry metrics of this worker's shared Groq client"""
+    start_time = time.time()
+    
+    return network_response.success_response(
+        HTTPCode.SUCCESS,
+        groq_client.stats(),
+        "audio/http-pool",
+        start_time
+    )
@@ -1,13 +1,65 @@
 import os
+import re
 import time
-import httpx
+import asyncio
+import threading
 import numpy as np
-import onnxruntime as ort
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, AsyncIterator, Tuple
 from fastapi import HTTPException
 
 from com.mhire.app.config.config import Config
-from com.mhire.app.common.utility import generate_request_id
+from com.mhire.app.common.utility import generate_request_id, remove_file, write_file
+from com.mhire.app.common.executors import executors
+from com.mhire.app.common.file_streaming import iter_file
+from com.mhire.app.common.telemetry import bind_request_id, stage
+from com.mhire.app.common.http_client import groq_client
+from com.mhire.app.common.audio_utils import (
+    AUDIO_FORMATS,
+    LOSSY_FORMATS,
+    TARGET_SAMPLE_RATE,
+    condense,
+    decode_audio,
+    encode_audio,
+    encode_wav,
+    plan_speech_regions,
+    sniff_format,
+    to_original_time,
+    transcode_audio,
+    trim_silence
+)
+from com.mhire.app.common.multipart import AudioSource, build_multipart_stream, read_all, upload_size
+from com.mhire.app.services.audio_service.tts_cache import TTSCache
+from com.mhire.app.services.storage_service.storage_service import storage_service
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;:])\s+")
+CLAUSE_BOUNDARY = re.compile(r"(?<=[,])\s+|\s+")
+BITRATE_PATTERN = re.compile(r"\d{1,3}k")
+
+def split_into_sentences(text: str, max_chars: int = 300) -> List[str]:
+    """Split text into sentence-sized pieces for pipelined synthesis"""
+    sentences = []
+    for sentence in SENTENCE_BOUNDARY.split(text.strip()):
+        sentence = sentence.strip()
+        # Break overly long sentences on clause or word boundaries
+        while len(sentence) > max_chars:
+            cut = max(
+                (m.start() for m in CLAUSE_BOUNDARY.finditer(sentence, 0, max_chars)),
+                default=max_chars
+            )
+            cut = cut or max_chars
+            sentences.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            sentences.append(sentence)
+
+    # Merge fragments that are too short to be worth a request of their own
+    merged = []
+    for sentence in sentences:
+        if merged and len(merged[-1]) < 20 and len(merged[-1]) + len(sentence) < max_chars:
+            merged[-1] = f"{merged[-1]} {sentence}"
+        else:
+            merged.append(sentence)
+    return merged
 
 class AudioService:
     def __init__(self):
@@ -20,127 +72,535 @@ class AudioService:
         self.silero_encoder_path = self.config.silero_encoder_path
         self.silero_decoder_path = self.config.silero_decoder_path
         self.silero_initialized = False
+        self._silero_lock = threading.Lock()
         
         # Create audio assets directory if it doesn't exist
         os.makedirs(self.config.audio_assets_path, exist_ok=True)
+        
+        # Synthesized speech is cached on disk by (text, voice, model)
+        self.tts_cache = TTSCache(
+            self.config.tts_cache_path,
+            max_bytes=self.config.tts_cache_max_bytes,
+            ttl=self.config.tts_cache_ttl
+        ) if self.config.tts_cache_enabled else None
     
     def _initialize_silero(self):
         """Initialize Silero ONNX models for local fallback"""
+        # Imported here so workers that only ever call Groq never load onnxruntime
+        from com.mhire.app.services.audio_service.silero_models import SileroVad, SileroStt, create_session_options
+        
         try:
-            self.encoder_session = ort.InferenceSession(self.silero_encoder_path)
-            self.decoder_session = ort.InferenceSession(self.silero_decoder_path)
+            options = create_session_options(self.config.onnx_intra_op_threads, self.config.onnx_inter_op_threads)
+            max_wait = self.config.silero_batch_wait_ms / 1000
+            self.silero_vad = SileroVad(
+                self.silero_encoder_path,
+                self.silero_decoder_path,
+                options,
+                self.config.silero_max_batch,
+                max_wait
+            )
+            self.silero_stt = None
+            if self.config.silero_stt_model_path and self.config.silero_stt_labels_path:
+                self.silero_stt = SileroStt(
+                    self.config.silero_stt_model_path,
+                    self.config.silero_stt_labels_path,
+                    options,
+                    self.config.silero_max_batch,
+                    max_wait
+                )
             self.silero_initialized = True
             return True
         except Exception as e:
             print(f"Failed to initialize Silero models: {str(e)}")
             return False
     
-    async def transcribe_audio(self, audio_file: bytes, use_groq: bool = True) -> Dict[str, Any]:
+    def load_silero(self) -> bool:
+        """Initialize the Silero models once; blocking, so call it off the event loop"""
+        with self._silero_lock:
+            return self.silero_initialized or self._initialize_silero()
+    
+    def preload_models(self):
+        """Load the Silero sessions and test-run them on a second of silence.
+        
+        Called by the warm-up phase of every worker, and before forking by the
+        gunicorn master with ``GUNICORN_PRELOAD=true`` so workers share the loaded
+        models copy-on-write. The test run allocates ONNX Runtime's buffers and
+        checks that inherited sessions still work in the worker.
+        """
+        if not self.load_silero():
+            raise RuntimeError("Failed to initialize Silero models")
+        silence = np.zeros(TARGET_SAMPLE_RATE, dtype=np.float32)
+        self.silero_vad.run_batch([silence])
+        if self.silero_stt is not None:
+            self.silero_stt.run_batch([silence])
+    
+    async def warm_up(self):
+        await executors.run_cpu(self.preload_models)
+    
+    async def speech_regions(self, audio: np.ndarray, align: int = 1) -> List[Tuple[int, int]]:
+        """Regions of a 16 kHz signal worth transcribing or rendering, as sample offsets.
+        
+        Shared by STT and video rendering. Silero VAD finds the speech, and pauses
+        shorter than VAD_MIN_PAUSE stay inside a region. Without the Silero models the
+        audible span from the energy gate is the only region.
+        """
+        if await executors.run_cpu(self.load_silero):
+            with stage("audio.vad"):
+                probabilities = await self.silero_vad.speech_probabilities(audio)
+            segments = [
+                (segment["start"], segment["end"])
+                for segment in self.silero_vad.speech_segments(probabilities, threshold=self.config.vad_threshold)
+            ]
+        else:
+            start, end = await executors.run_cpu(
+                trim_silence, audio, TARGET_SAMPLE_RATE, self.config.silence_threshold_db, 0.0
+            )
+            segments = [(start / TARGET_SAMPLE_RATE, end / TARGET_SAMPLE_RATE)] if end > start else []
+        return plan_speech_regions(
+            segments, len(audio), TARGET_SAMPLE_RATE, self.config.vad_min_pause, self.config.silence_padding, align
+        )
+    
+    async def _prepare_for_stt(self, audio_file: AudioSource, trim: bool) -> Optional[Dict[str, Any]]:
+        """The upload as 16 kHz mono in STT_UPLOAD_FORMAT, cut down to its speech when trim is set.
+        
+        Returns None when sending the upload as it is is cheaper: it is too large to
+        decode in memory, cannot be decoded here, or is already smaller.
+        """
+        original_bytes = upload_size(audio_file)
+        if original_bytes > self.config.stt_trim_max_bytes:
+            return None
+        with stage("tempfile.read"):
+            upload = await read_all(audio_file)
+        try:
+            audio = await executors.run_cpu(decode_audio, upload)
+        except (ValueError, OSError) as e:
+            # Undecodable here (or no ffmpeg); Groq may still accept it
+            print(f"Not re-encoding audio before transcription: {str(e)}")
+            return None
+        
+        if trim:
+            regions = await self.speech_regions(audio)
+        else:
+            regions = [(0, len(audio))] if len(audio) else []
+        gap = int(self.config.stt_pause_seconds * TARGET_SAMPLE_RATE)
+        with stage("audio.encode", format=self.config.stt_upload_format):
+            audio_format, payload = await executors.run_cpu(self._encode_speech, audio, regions, gap)
+        if regions and len(payload) >= original_bytes:
+            return None
+        sent_samples = sum(end - start for start, end in regions) + gap * max(0, len(regions) - 1)
+        return {
+            "payload": payload,
+            "format": audio_format,
+            "trimmed": trim,
+            "regions": regions,
+            "gap": gap,
+            "speech": {
+                "audio_seconds": round(len(audio) / TARGET_SAMPLE_RATE, 3),
+                "sent_seconds": round(sent_samples / TARGET_SAMPLE_RATE, 3),
+                "format": audio_format,
+                "original_bytes": original_bytes,
+                "sent_bytes": len(payload)
+            }
+        }
+    
+    def _encode_speech(self, audio: np.ndarray, regions: List[Tuple[int, int]], gap: int) -> Tuple[str, bytes]:
+        """Encode the kept regions; returns the format used and the payload"""
+        speech = condense(audio, regions, gap)
+        try:
+            return self.config.stt_upload_format, encode_audio(
+                speech, self.config.stt_upload_format, self.config.stt_upload_bitrate
+            )
+        except (ValueError, OSError) as e:
+            # WAV needs no encoder
+            print(f"Sending WAV for transcription instead of {self.config.stt_upload_format}: {str(e)}")
+            return "wav", encode_wav(speech)
+    
+    def _restore_segments(self, segments: List[Dict[str, Any]], prepared: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Move Whisper's segment timestamps from the trimmed audio back onto the uploaded audio"""
+        if not segments:
+            return []
+        bounds = to_original_time(
+            [[segment.get("start", 0.0), segment.get("end", 0.0)] for segment in segments],
+            prepared["regions"],
+            TARGET_SAMPLE_RATE,
+            prepared["gap"]
+        )
+        return [
+            {"start": round(float(start), 3), "end": round(float(end), 3), "text": segment.get("text", "").strip()}
+            for segment, (start, end) in zip(segments, bounds)
+        ]
+    
+    async def transcribe_audio(
+        self,
+        audio_file: AudioSource,
+        use_groq: bool = True,
+        trim: Optional[bool] = None
+    ) -> Dict[str, Any]:
         """Transcribe audio using Groq Whisper API or Silero fallback"""
-        request_id = generate_request_id(f"transcribe_{time.time()}")
+        request_id = generate_request_id()
+        bind_request_id(request_id)
         
         if use_groq and self.groq_api_key:
             try:
-                # Save audio file temporarily
-                temp_audio_path = os.path.join(self.config.audio_assets_path, f"{request_id}.wav")
-                with open(temp_audio_path, 'wb') as f:
-                    f.write(audio_file)
+                filename = getattr(audio_file, "filename", None) or f"{request_id}.wav"
+                content_type = getattr(audio_file, "content_type", None) or "audio/wav"
+                fields = {"model": self.groq_stt_model}
+                source = audio_file
                 
-                # Call Groq Whisper API
-                headers = {
-                    "Authorization": f"Bearer {self.groq_api_key}"
-                }
+                # Uploads are downmixed, resampled and compressed before they go out. Leading,
+                # trailing and long pauses are cut, and Whisper's timestamps are mapped back afterwards
+                prepared = None
+                trim = self.config.stt_trim_silence if trim is None else trim
+                if trim or self.config.stt_transcode:
+                    prepared = await self._prepare_for_stt(audio_file, trim)
+                if prepared is not None:
+                    if not prepared["regions"]:
+                        return {"text": "", "request_id": request_id, "segments": [], "speech": prepared["speech"]}
+                    source = prepared["payload"]
+                    extension, _, content_type = AUDIO_FORMATS[prepared["format"]]
+                    filename = f"{os.path.splitext(os.path.basename(filename))[0]}.{extension}"
+                    if prepared["trimmed"]:
+                        fields["response_format"] = "verbose_json"
                 
-                async with httpx.AsyncClient() as client:
-                    files = {'file': open(temp_audio_path, 'rb')}
-                    response = await client.post(
-                        "https://api.groq.com/openai/v1/audio/transcriptions",
-                        headers=headers,
-                        files=files,
-                        data={"model": self.groq_stt_model}
-                    )
+                # Stream the upload straight into the outbound multipart body, no temp file
+                headers, body = await build_multipart_stream(
+                    fields,
+                    "file",
+                    source,
+                    os.path.basename(filename),
+                    content_type
+                )
                 
-                # Clean up temp file
-                os.remove(temp_audio_path)
+                # Call Groq Whisper API over the shared pooled client
+                response = await groq_client.post(
+                    "/audio/transcriptions",
+                    headers=headers,
+                    content_factory=body
+                )
                 
                 if response.status_code == 200:
                     result = response.json()
-                    return {
+                    transcript = {
                         "text": result.get("text", ""),
                         "request_id": request_id
                     }
+                    if prepared is not None:
+                        if prepared["trimmed"]:
+                            transcript["segments"] = self._restore_segments(result.get("segments"), prepared)
+                        transcript["speech"] = prepared["speech"]
+                    return transcript
                 else:
                     print(f"Groq API error: {response.text}")
                     raise HTTPException(status_code=response.status_code, detail=response.text)
             
             except Exception as e:
                 print(f"Error using Groq API: {str(e)}")
-                # Fall back to Silero if Groq fails
-                if not use_groq:
+                # Fall back to local Silero STT if Groq fails and a model is configured
+                if self.config.silero_stt_model_path:
                     return await self._transcribe_with_silero(audio_file, request_id)
                 raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
         else:
             # Use Silero for transcription
             return await self._transcribe_with_silero(audio_file, request_id)
     
-    async def _transcribe_with_silero(self, audio_file: bytes, request_id: str) -> Dict[str, Any]:
-        """Fallback to Silero models for transcription"""
+    async def _transcribe_with_silero(self, audio_file: AudioSource, request_id: str) -> Dict[str, Any]:
+        """Local transcription: batched Silero VAD segmentation, then CTC decoding when an STT model is configured"""
         if not self.silero_initialized:
-            if not self._initialize_silero():
+            if not await executors.run_cpu(self.load_silero):
                 raise HTTPException(status_code=500, detail="Failed to initialize Silero models")
+        if self.silero_stt is None:
+            # VAD alone produces no text; an empty transcript would look like silence
+            raise HTTPException(
+                status_code=501,
+                detail="Local STT model not configured: set SILERO_STT_MODEL_PATH and SILERO_STT_LABELS_PATH"
+            )
         
         try:
-            # Implementation would depend on how you want to use Silero ONNX models
-            # This is a placeholder for the actual implementation
+            # Local inference needs the whole signal in memory anyway
+            with stage("tempfile.read"):
+                payload = await read_all(audio_file)
+            audio = await executors.run_cpu(decode_audio, payload)
+            probabilities = await self.silero_vad.speech_probabilities(audio)
+            segments = self.silero_vad.speech_segments(probabilities)
+            
+            # All segments of this request join the same micro-batch
+            texts = await asyncio.gather(*(
+                self.silero_stt.transcribe(
+                    audio[int(segment["start"] * TARGET_SAMPLE_RATE):int(segment["end"] * TARGET_SAMPLE_RATE)]
+                )
+                for segment in segments
+            ))
+            for segment, segment_text in zip(segments, texts):
+                segment["text"] = segment_text
+            
             return {
-                "text": "Silero transcription not fully implemented",
-                "request_id": request_id
+                "text": " ".join(t for t in texts if t),
+                "request_id": request_id,
+                "engine": "silero-stt",
+                "duration": round(len(audio) / TARGET_SAMPLE_RATE, 3),
+                "segments": segments
             }
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Silero transcription failed: {str(e)}")
     
-    async def text_to_speech(self, text: str, voice: str = "alloy") -> Dict[str, Any]:
-        """Convert text to speech using Groq TTS API"""
-        request_id = generate_request_id(f"tts_{time.time()}")
+    async def _synthesize(self, text: str, voice: str, audio_format: str, bitrate: Optional[str]) -> bytes:
+        """Call Groq TTS and return the speech encoded as audio_format"""
+        payload = {
+            "model": self.groq_tts_model,
+            "input": text,
+            "voice": voice,
+            "response_format": self.config.tts_upstream_format
+        }
+        
+        response = await groq_client.post(
+            "/audio/speech",
+            json=payload
+        )
+        
+        if response.status_code != 200:
+            print(f"Groq API error: {response.text}")
+            raise HTTPException(status_code=response.status_code, detail=response.text)
+        
+        # Lossless output already in the wanted format is kept as it is; lossy output is
+        # always encoded here, so the bitrate is the one that was asked for
+        if audio_format not in LOSSY_FORMATS and sniff_format(response.content) == audio_format:
+            return response.content
+        with stage("audio.transcode", format=audio_format):
+            return await executors.run_cpu(transcode_audio, response.content, audio_format, bitrate)
+    
+    def _tts_cache_key(self, text: str, voice: str, audio_format: str, bitrate: Optional[str]) -> str:
+        return self.tts_cache.key(text, voice, self.groq_tts_model, f"{audio_format}@{bitrate}" if bitrate else audio_format)
+    
+    def _audio_url(self, audio_path: str) -> Optional[str]:
+        """URL of a file under audio_assets, which is served from /audio-assets/"""
+        relative = os.path.relpath(audio_path, self.config.audio_assets_path)
+        return None if relative.startswith("..") else f"/audio-assets/{relative}"
+    
+    async def text_to_speech(
+        self,
+        text: str,
+        voice: str = "alloy",
+        audio_format: Optional[str] = None,
+        bitrate: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Convert text to speech using Groq TTS API.
+        
+        The speech is stored as audio_format (default TTS_OUTPUT_FORMAT) in mono;
+        bitrate (default TTS_OUTPUT_BITRATE) applies to mp3 and opus.
+        """
+        request_id = generate_request_id()
+        bind_request_id(request_id)
         
         if not self.groq_api_key:
             raise HTTPException(status_code=400, detail="Groq API key not configured")
         
+        audio_format = audio_format or self.config.tts_output_format
+        if audio_format not in AUDIO_FORMATS:
+            raise HTTPException(status_code=422, detail=f"Unsupported audio format: {audio_format}")
+        bitrate = (bitrate or self.config.tts_output_bitrate) if audio_format in LOSSY_FORMATS else None
+        if bitrate and not BITRATE_PATTERN.fullmatch(bitrate):
+            raise HTTPException(status_code=422, detail=f"Invalid bitrate: {bitrate} (expected e.g. 32k)")
+        extension, _, content_type = AUDIO_FORMATS[audio_format]
+        
         try:
-            headers = {
-                "Authorization": f"Bearer {self.groq_api_key}",
-                "Content-Type": "application/json"
-            }
-            
-            payload = {
-                "model": self.groq_tts_model,
-                "input": text,
-                "voice": voice
-            }
-            
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    "https://api.groq.com/openai/v1/audio/speech",
-                    headers=headers,
-                    json=payload
+            if self.tts_cache is not None:
+                # Identical requests share one file and, while in flight, one upstream call
+                key = self._tts_cache_key(text, voice, audio_format, bitrate)
+                audio_path, cached = await self.tts_cache.get_or_create(
+                    key, lambda: self._synthesize(text, voice, audio_format, bitrate), extension
                 )
-            
-            if response.status_code == 200:
-                # Save audio file
-                audio_path = os.path.join(self.config.audio_assets_path, f"{request_id}.mp3")
-                with open(audio_path, 'wb') as f:
-                    f.write(response.content)
-                
-                return {
-                    "audio_path": audio_path,
-                    "request_id": request_id
-                }
             else:
-                print(f"Groq API error: {response.text}")
-                raise HTTPException(status_code=response.status_code, detail=response.text)
+                # Save audio file
+                audio_content = await self._synthesize(text, voice, audio_format, bitrate)
+                audio_path = os.path.join(self.config.audio_assets_path, f"{request_id}.{extension}")
+                with stage("file.write"):
+                    await asyncio.to_thread(write_file, audio_path, audio_content)
+                storage_service.record(audio_path, "audio")
+                cached = False
+            
+            return {
+                "audio_path": audio_path,
+                "audio_url": self._audio_url(audio_path),
+                "request_id": request_id,
+                "cached": cached,
+                "format": audio_format,
+                "bitrate": bitrate,
+                "content_type": content_type
+            }
         
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Text-to-speech failed: {str(e)}")
+    
+    async def text_to_speech_batch(
+        self,
+        texts: List[str],
+        voice: str = "alloy",
+        audio_format: Optional[str] = None,
+        bitrate: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Synthesize several texts, at most tts_batch_concurrency at a time.
+        
+        Returns a manifest with one item per text, in order; an item that failed
+        carries its error instead of an audio path.
+        """
+        request_id = generate_request_id()
+        bind_request_id(request_id)
+        
+        if not self.groq_api_key:
+            raise HTTPException(status_code=400, detail="Groq API key not configured")
+        if not texts:
+            raise HTTPException(status_code=422, detail="At least one text is required")
+        if len(texts) > self.config.batch_max_items:
+            raise HTTPException(status_code=422, detail=f"At most {self.config.batch_max_items} texts per batch")
+        
+        start_time = time.time()
+        semaphore = asyncio.Semaphore(self.config.tts_batch_concurrency)
+        
+        async def synthesize(index: int, text: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    result = await self.text_to_speech(text, voice, audio_format, bitrate)
+                except HTTPException as e:
+                    return {"index": index, "error": str(e.detail)}
+            return {
+                "index": index,
+                "audio_path": result["audio_path"],
+                "audio_url": result["audio_url"],
+                "cached": result["cached"]
+            }
+        
+        items = await asyncio.gather(*(synthesize(index, text) for index, text in enumerate(texts)))
+        failed = sum(1 for item in items if "error" in item)
+        return {
+            "request_id": request_id,
+            "items": items,
+            "succeeded": len(items) - failed,
+            "failed": failed,
+            "timings": {"total_ms": round((time.time() - start_time) * 1000)}
+        }
+    
+    def tts_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss statistics of the TTS cache"""
+        if self.tts_cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **self.tts_cache.stats()}
+    
+    async def _stream_sentence(self, sentence: str, voice: str, queue: asyncio.Queue):
+        """Stream one sentence's audio from Groq into a queue; None marks the end"""
+        payload = {
+            "model": self.groq_tts_model,
+            "input": sentence,
+            "voice": voice,
+            "response_format": "mp3"
+        }
+        try:
+            with stage("groq.stream", path="/audio/speech"):
+                async with groq_client.stream("POST", "/audio/speech", json=payload) as response:
+                    if response.status_code != 200:
+                        detail = (await response.aread()).decode(errors="replace")
+                        print(f"Groq API error: {detail}")
+                        raise HTTPException(status_code=response.status_code, detail=detail)
+                    async for chunk in response.aiter_bytes(self.config.tts_stream_chunk_size):
+                        await queue.put(chunk)
+            await queue.put(None)
+        except Exception as e:
+            await queue.put(e)
+
+    async def _pipelined_speech(self, sentences: List[str], voice: str) -> AsyncIterator[bytes]:
+        """Yield audio in sentence order while the next sentences are already being synthesized"""
+        queues = [asyncio.Queue() for _ in sentences]
+        tasks = []
+        try:
+            for index in range(len(sentences)):
+                # Keep up to tts_stream_prefetch sentences in flight, starting with the current one
+                while len(tasks) < min(len(sentences), index + self.config.tts_stream_prefetch):
+                    next_index = len(tasks)
+                    tasks.append(asyncio.create_task(
+                        self._stream_sentence(sentences[next_index], voice, queues[next_index])
+                    ))
+                while True:
+                    item = await queues[index].get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def stream_text_to_speech(self, text: str, voice: str = "alloy", save: bool = False) -> Dict[str, Any]:
+        """Start streaming speech for text; the first chunk is awaited so upstream errors surface before streaming"""
+        request_id = generate_request_id()
+        bind_request_id(request_id)
+        
+        if not self.groq_api_key:
+            raise HTTPException(status_code=400, detail="Groq API key not configured")
+        
+        sentences = split_into_sentences(text, self.config.tts_sentence_max_chars)
+        if not sentences:
+            raise HTTPException(status_code=422, detail="Text is empty")
+        
+        cached_path = ""
+        if self.tts_cache is not None:
+            # Only MP3 entries can be served on this stream
+            cached_path = await asyncio.to_thread(
+                self.tts_cache.lookup, self._tts_cache_key(text, voice, "mp3", self.config.tts_output_bitrate)
+            )
+        
+        if cached_path:
+            return {
+                "request_id": request_id,
+                "audio_path": cached_path,
+                "sentences": len(sentences),
+                "cached": True,
+                "stream": iter_file(cached_path, self.config.tts_stream_chunk_size)
+            }
+        
+        chunks = self._pipelined_speech(sentences, voice)
+        try:
+            first_chunk = await chunks.__anext__()
+        except StopAsyncIteration:
+            first_chunk = b""
+        except HTTPException:
+            await chunks.aclose()
+            raise
+        except Exception as e:
+            await chunks.aclose()
+            raise HTTPException(status_code=500, detail=f"Text-to-speech failed: {str(e)}")
+        
+        audio_path = os.path.join(self.config.audio_assets_path, f"{request_id}.mp3") if save else None
+        
+        async def audio_stream() -> AsyncIterator[bytes]:
+            # Optionally tee the stream to disk; partial files are removed on failure
+            audio_file = await asyncio.to_thread(open, audio_path, 'wb') if audio_path else None
+            completed = False
+            try:
+                if first_chunk:
+                    if audio_file:
+                        await asyncio.to_thread(audio_file.write, first_chunk)
+                    yield first_chunk
+                async for chunk in chunks:
+                    if audio_file:
+                        await asyncio.to_thread(audio_file.write, chunk)
+                    yield chunk
+                completed = True
+            finally:
+                await chunks.aclose()
+                if audio_file:
+                    await asyncio.to_thread(audio_file.close)
+                    if not completed:
+                        await asyncio.to_thread(remove_file, audio_path)
+                    else:
+                        storage_service.record(audio_path, "audio")
+        
+        return {
+            "request_id": request_id,
+            "audio_path": audio_path,
+            "sentences": len(sentences),
+            "cached": False,
+            "stream": audio_stream()
+        }
 
 # Create a singleton instance
 audio_service = AudioService()
\ No newline at end of file
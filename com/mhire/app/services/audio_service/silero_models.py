@@ -0,0 +1,206 @@
+import json
+import asyncio
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import onnxruntime as ort
+
+from com.mhire.app.common.audio_utils import TARGET_SAMPLE_RATE
+from com.mhire.app.common.executors import executors
+
+logger = logging.getLogger(__name__)
+
+def create_session_options(intra_op_threads: int, inter_op_threads: int) -> ort.SessionOptions:
+    """CPU session options shared by all Silero sessions"""
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.intra_op_num_threads = intra_op_threads
+    options.inter_op_num_threads = inter_op_threads
+    return options
+
+class MicroBatcher:
+    """Coalesces concurrent requests into one batched call run off the event loop.
+
+    The first request of a batch waits up to ``max_wait`` seconds for company; a batch
+    is flushed early once ``max_batch`` requests are pending.
+    """
+
+    def __init__(self, run_batch: Callable[[List[Any]], List[Any]], max_batch: int, max_wait: float):
+        self.run_batch = run_batch
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._pending: List[Any] = []
+        self._futures: List[asyncio.Future] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(item)
+        self._futures.append(future)
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        items, futures = self._pending, self._futures
+        self._pending, self._futures = [], []
+        if items:
+            asyncio.ensure_future(self._run(items, futures))
+
+    async def _run(self, items: List[Any], futures: List[asyncio.Future]):
+        try:
+            results = await executors.run_cpu(self.run_batch, items)
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for future, result in zip(futures, results):
+            if not future.done():
+                future.set_result(result)
+
+class SileroVad:
+    """Silero VAD v5 split into a stateless encoder and a recurrent decoder.
+
+    The encoder runs once over every frame of every request in the batch; the
+    decoder steps through time with one recurrent state row per request.
+    """
+    WINDOW = 512
+    CONTEXT = 64
+
+    def __init__(self, encoder_path: str, decoder_path: str, options: ort.SessionOptions, max_batch: int, max_wait: float):
+        providers = ["CPUExecutionProvider"]
+        self.encoder = ort.InferenceSession(encoder_path, sess_options=options, providers=providers)
+        self.decoder = ort.InferenceSession(decoder_path, sess_options=options, providers=providers)
+        self.batcher = MicroBatcher(self.run_batch, max_batch, max_wait)
+
+    @property
+    def frame_duration(self) -> float:
+        return self.WINDOW / TARGET_SAMPLE_RATE
+
+    def frames(self, audio: np.ndarray) -> np.ndarray:
+        """Vectorized framing: 512-sample windows, each prefixed by the previous 64 samples"""
+        if len(audio) == 0:
+            return np.zeros((0, self.WINDOW + self.CONTEXT), dtype=np.float32)
+        padding = (-len(audio)) % self.WINDOW
+        padded = np.concatenate([
+            np.zeros(self.CONTEXT, dtype=np.float32),
+            audio.astype(np.float32, copy=False),
+            np.zeros(padding, dtype=np.float32)
+        ])
+        windows = np.lib.stride_tricks.sliding_window_view(padded, self.WINDOW + self.CONTEXT)
+        return windows[::self.WINDOW]
+
+    def run_batch(self, batch: List[np.ndarray]) -> List[np.ndarray]:
+        frames = [self.frames(audio) for audio in batch]
+        lengths = np.array([len(f) for f in frames])
+        if lengths.sum() == 0:
+            return [np.zeros(0, dtype=np.float32) for _ in batch]
+
+        # One encoder pass over every frame of every request
+        features = self.encoder.run(None, {"input": np.concatenate(frames)})[0][:, :, 0]
+
+        # Lay features out as (time, request, 128), zero-padding shorter requests
+        steps, requests = int(lengths.max()), len(batch)
+        grid = np.zeros((steps, requests, features.shape[1]), dtype=np.float32)
+        offsets = np.concatenate([[0], np.cumsum(lengths)])
+        for index in range(requests):
+            grid[:lengths[index], index] = features[offsets[index]:offsets[index + 1]]
+
+        state = np.zeros((2, requests, 128), dtype=np.float32)
+        probabilities = np.zeros((steps, requests), dtype=np.float32)
+        for step in range(steps):
+            output, state = self.decoder.run(None, {"input": grid[step], "state": state})
+            probabilities[step] = output[:, 0, 0]
+
+        return [probabilities[:lengths[index], index] for index in range(requests)]
+
+    async def speech_probabilities(self, audio: np.ndarray) -> np.ndarray:
+        """Per-frame speech probability of a 16 kHz mono signal, micro-batched across callers"""
+        return await self.batcher.submit(audio)
+
+    def speech_segments(
+        self,
+        probabilities: np.ndarray,
+        threshold: float = 0.5,
+        min_speech: float = 0.25,
+        min_silence: float = 0.1,
+        pad: float = 0.03
+    ) -> List[Dict[str, float]]:
+        """Turn frame probabilities into speech segments (seconds) with hysteresis"""
+        if probabilities.size == 0:
+            return []
+
+        # Above threshold starts speech, below threshold - 0.15 ends it, anything in between keeps the last state
+        state = np.full(probabilities.shape, -1, dtype=np.int8)
+        state[probabilities >= threshold] = 1
+        state[probabilities < threshold - 0.15] = 0
+        positions = np.where(state >= 0, np.arange(len(state)), 0)
+        np.maximum.accumulate(positions, out=positions)
+        speech = (state[positions] == 1).astype(np.int8)
+
+        edges = np.diff(np.concatenate([[0], speech, [0]]))
+        starts = np.flatnonzero(edges == 1) * self.frame_duration
+        ends = np.flatnonzero(edges == -1) * self.frame_duration
+
+        segments = []
+        for start, end in zip(starts, ends):
+            if segments and start - segments[-1]["end"] < min_silence:
+                segments[-1]["end"] = float(end)
+            else:
+                segments.append({"start": float(start), "end": float(end)})
+
+        total = len(probabilities) * self.frame_duration
+        return [
+            {"start": round(max(0.0, s["start"] - pad), 3), "end": round(min(total, s["end"] + pad), 3)}
+            for s in segments if s["end"] - s["start"] >= min_speech
+        ]
+
+class SileroStt:
+    """Optional single-graph Silero STT model with greedy CTC decoding"""
+
+    def __init__(self, model_path: str, labels_path: str, options: ort.SessionOptions, max_batch: int, max_wait: float):
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        with open(labels_path, "r") as f:
+            self.labels: List[str] = json.load(f)
+        self.blank_index = self.labels.index("_")
+        self.repeat_index = self.labels.index("2") if "2" in self.labels else None
+        self.input_name = self.session.get_inputs()[0].name
+        self.batcher = MicroBatcher(self.run_batch, max_batch, max_wait)
+
+    def run_batch(self, batch: List[np.ndarray]) -> List[str]:
+        # Zero padding only adds trailing blanks after CTC decoding
+        longest = max(len(audio) for audio in batch)
+        inputs = np.zeros((len(batch), max(longest, 1)), dtype=np.float32)
+        for index, audio in enumerate(batch):
+            inputs[index, :len(audio)] = audio
+        logits = self.session.run(None, {self.input_name: inputs})[0]
+        return [self.ctc_decode(row) for row in np.argmax(logits, axis=-1)]
+
+    def ctc_decode(self, tokens: np.ndarray) -> str:
+        """Greedy CTC: collapse repeats, drop blanks, expand Silero's repeat token"""
+        if tokens.size == 0:
+            return ""
+        keep = np.concatenate([[True], tokens[1:] != tokens[:-1]])
+        text = []
+        for token in tokens[keep]:
+            if token == self.blank_index:
+                continue
+            if token == self.repeat_index:
+                if text:
+                    text.append(text[-1])
+                continue
+            text.append(self.labels[token])
+        return " ".join("".join(text).split())
+
+    async def transcribe(self, audio: np.ndarray) -> str:
+        return await self.batcher.submit(audio)
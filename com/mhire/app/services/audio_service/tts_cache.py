@@ -0,0 +1,181 @@
+import os
+import time
+import fcntl
+import asyncio
+import hashlib
+import logging
+import tempfile
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from com.mhire.app.common.telemetry import stage
+
+logger = logging.getLogger(__name__)
+
+
+class TTSCache:
+    """Content-addressed on-disk cache of synthesized speech.
+
+    Entries live in ``<root>/<key>.<ext>`` so they survive restarts and are shared by
+    every gunicorn worker. Identical concurrent requests are coalesced twice: within a
+    worker they await the same task, across workers they serialise on a ``flock`` of
+    ``<key>.lock`` and the loser finds the winner's file. An entry's mtime is its
+    creation time (for the TTL) and its atime its last use (for LRU eviction).
+    """
+
+    def __init__(
+        self,
+        root: str,
+        max_bytes: int,
+        ttl: float,
+        min_age: float = 600.0,
+        evict_interval: float = 60.0,
+    ):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # Entries used more recently than this are kept even when over budget,
+        # so paths just handed to clients stay valid for their follow-up render
+        self.min_age = min_age
+        self.evict_interval = evict_interval
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._last_evict = 0.0
+        self._usage = {"entries": 0, "bytes": 0}
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    def key(self, text: str, voice: str, model: str, audio_format: str = "mp3") -> str:
+        material = "\x1f".join([self.normalize(text), voice or "", model or "", audio_format])
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def path(self, key: str, extension: str = "mp3") -> str:
+        return os.path.join(self.root, f"{key}.{extension}")
+
+    def lookup(self, key: str, extension: str = "mp3") -> str:
+        """Path of a fresh entry, or an empty string; a hit refreshes the entry's last use"""
+        path = self.path(key, extension)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return ""
+        if time.time() - stat.st_mtime > self.ttl:
+            return ""
+        os.utime(path, (time.time(), stat.st_mtime))
+        return path
+
+    async def get_or_create(
+        self,
+        key: str,
+        producer: Callable[[], Awaitable[bytes]],
+        extension: str = "mp3"
+    ) -> Tuple[str, bool]:
+        """Return (path, hit), synthesizing at most once per key across all workers"""
+        path = await asyncio.to_thread(self.lookup, key, extension)
+        if path:
+            self._stats["hits"] += 1
+            return path, True
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self._stats["coalesced"] += 1
+            path, _ = await asyncio.shield(task)
+            return path, True
+
+        task = asyncio.create_task(self._create(key, producer, extension))
+        self._in_flight[key] = task
+        task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _create(self, key: str, producer: Callable[[], Awaitable[bytes]], extension: str) -> Tuple[str, bool]:
+        lock_path = os.path.join(self.root, f"{key}.lock")
+        lock_file = await asyncio.to_thread(open, lock_path, "a")
+        try:
+            await asyncio.to_thread(fcntl.flock, lock_file, fcntl.LOCK_EX)
+
+            # Another worker may have produced it while we waited for the lock
+            path = await asyncio.to_thread(self.lookup, key, extension)
+            if path:
+                self._stats["hits"] += 1
+                return path, True
+
+            self._stats["misses"] += 1
+            audio = await producer()
+            path = self.path(key, extension)
+            with stage("file.write"):
+                await asyncio.to_thread(self._store, path, audio)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+        if time.time() - self._last_evict > self.evict_interval:
+            self._last_evict = time.time()
+            asyncio.ensure_future(asyncio.to_thread(self.evict))
+        return path, False
+
+    def _store(self, path: str, audio: bytes):
+        # Write under a temporary name so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(audio)
+        os.replace(temp_path, path)
+
+    def evict(self) -> Dict[str, Any]:
+        """Remove expired entries, then least recently used ones until under max_bytes"""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.root):
+            if name.endswith(".lock") or name.endswith(".tmp"):
+                continue
+            path = os.path.join(self.root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_atime, stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, _, size, _ in entries)
+        kept = []
+        for last_used, created, size, path in entries:
+            if now - created > self.ttl and now - last_used > self.min_age:
+                self._remove(path)
+                total_bytes -= size
+            else:
+                kept.append((last_used, size, path))
+
+        kept.sort()
+        while kept and total_bytes > self.max_bytes and now - kept[0][0] > self.min_age:
+            last_used, size, path = kept.pop(0)
+            self._remove(path)
+            total_bytes -= size
+
+        self._usage = {"entries": len(kept), "bytes": total_bytes}
+        return self._usage
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+            self._stats["evictions"] += 1
+        except FileNotFoundError:
+            pass
+        # Dropping the lock file can at worst let two workers synthesize the same text once
+        lock_path = os.path.splitext(path)[0] + ".lock"
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of this worker plus on-disk usage from the last eviction pass"""
+        lookups = self._stats["hits"] + self._stats["misses"] + self._stats["coalesced"]
+        return {
+            **self._stats,
+            "hit_ratio": round((self._stats["hits"] + self._stats["coalesced"]) / lookups, 3) if lookups else 0.0,
+            "in_flight": len(self._in_flight),
+            "entries": self._usage["entries"],
+            "bytes": self._usage["bytes"],
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+        }
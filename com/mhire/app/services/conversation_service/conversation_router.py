@@ -0,0 +1,23 @@
+from fastapi import APIRouter, WebSocket
+
+from com.mhire.app.common.admission import AdmissionRejected, admission
+from com.mhire.app.services.conversation_service.conversation_service import ConversationSession
+
+router = APIRouter(prefix="/ws", tags=["conversation"])
+
+# Close code for "try again later" (RFC 6455 registry)
+TRY_AGAIN_LATER = 1013
+
+@router.websocket("/conversation")
+async def conversation(websocket: WebSocket):
+    """Live conversation: microphone PCM in; transcripts, audio chunks and video segments out"""
+    try:
+        async with admission.session("conversation", websocket):
+            await ConversationSession(websocket).run()
+    except AdmissionRejected as e:
+        # Turned away before the session was accepted; tell the client when to retry
+        await websocket.accept()
+        await websocket.send_json({
+            "type": "error", "stage": "admission", "error": e.detail, "retry_after": int(e.headers["Retry-After"])
+        })
+        await websocket.close(code=TRY_AGAIN_LATER)
@@ -0,0 +1,276 @@
+import io
+import json
+import time
+import wave
+import asyncio
+from typing import Any, Dict, Optional
+
+from fastapi import WebSocket, WebSocketDisconnect, HTTPException
+
+from com.mhire.app.config.config import Config
+from com.mhire.app.common.admission import AdmissionRejected, admission
+from com.mhire.app.services.audio_service.audio_service import audio_service, split_into_sentences
+from com.mhire.app.services.video_service.video_service import video_service
+
+# Marks the end of the work stream between pipeline stages
+END_OF_STREAM = object()
+
+# Conversation turns jump ahead of batch renders in the render queue
+CONVERSATION_RENDER_PRIORITY = 10
+
+def pcm_to_wav(pcm: bytes, sample_rate: int) -> bytes:
+    """Wrap raw 16-bit mono PCM frames in a WAV container"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm)
+    return buffer.getvalue()
+
+class Utterance:
+    """One user turn flowing through the pipeline, with its latency checkpoints"""
+
+    def __init__(self, index: int, pcm: bytes, sample_rate: int):
+        self.index = index
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+        self.text = ""
+        self.ended_at = time.time()
+        self.marks: Dict[str, float] = {}
+        self.pending_segments = 0
+        self.synthesis_done = False
+
+    def mark(self, name: str):
+        if name not in self.marks:
+            self.marks[name] = round((time.time() - self.ended_at) * 1000)
+
+class ConversationSession:
+    """Streaming STT -> TTS -> avatar pipeline for one WebSocket connection.
+
+    Client messages:
+        {"type": "start", "avatar_id": ..., "voice": "alloy", "sample_rate": 16000, "use_groq": true}
+        binary frames of 16-bit mono PCM at sample_rate
+        {"type": "end_utterance"} to close the current turn, {"type": "stop"} to hang up
+
+    Server messages: "transcript" (partial and final), "audio_start" followed by binary
+    audio chunks and "audio_end" per sentence, "video_segment" per rendered sentence,
+    "metrics" with per-turn latencies, and "error".
+
+    The session itself is admitted by the router; each turn additionally draws from the
+    client's turn bucket, and a turn over the limit is dropped with an "admission" error.
+    """
+
+    def __init__(self, websocket: WebSocket):
+        self.config = Config()
+        self.websocket = websocket
+        self.avatar_id: Optional[str] = None
+        self.voice = "alloy"
+        self.sample_rate = 16000
+        self.use_groq = True
+        self.client = admission.client_id(websocket)
+        self.admission = admission.controller("conversation") if admission.enabled else None
+
+        # Bounded queues give backpressure between stages all the way back to the socket
+        self.outbound: asyncio.Queue = asyncio.Queue(maxsize=self.config.conversation_outbound_queue)
+        self.utterances: asyncio.Queue = asyncio.Queue(maxsize=self.config.conversation_stage_queue)
+        self.texts: asyncio.Queue = asyncio.Queue(maxsize=self.config.conversation_stage_queue)
+        self.renders: asyncio.Queue = asyncio.Queue(maxsize=self.config.conversation_stage_queue)
+        self._partial_task: Optional[asyncio.Task] = None
+
+    async def run(self):
+        await self.websocket.accept()
+        stages = [
+            asyncio.create_task(self._send_loop()),
+            asyncio.create_task(self._transcribe_loop()),
+            asyncio.create_task(self._synthesize_loop()),
+            asyncio.create_task(self._deliver_loop()),
+        ]
+        try:
+            await self._receive_loop()
+            # Let in-flight turns drain before hanging up
+            await self.utterances.put(END_OF_STREAM)
+            await asyncio.gather(*stages[1:])
+            await self.outbound.put(END_OF_STREAM)
+            await stages[0]
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for stage in stages:
+                stage.cancel()
+            if self._partial_task is not None:
+                self._partial_task.cancel()
+            await asyncio.gather(*stages, return_exceptions=True)
+
+    async def _emit(self, message: Any):
+        await self.outbound.put(message)
+
+    async def _send_loop(self):
+        """Single writer so stage messages never interleave on the socket"""
+        while True:
+            message = await self.outbound.get()
+            if message is END_OF_STREAM:
+                await self.websocket.close()
+                return
+            if isinstance(message, bytes):
+                await self.websocket.send_bytes(message)
+            else:
+                await self.websocket.send_json(message)
+
+    async def _receive_loop(self):
+        pcm = bytearray()
+        partial_at = 0
+        index = 0
+        partial_bytes = int(self.config.conversation_partial_interval * self.sample_rate * 2)
+
+        while True:
+            message = await self.websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            if message.get("bytes") is not None:
+                pcm.extend(message["bytes"])
+                # Periodically transcribe what we have so far for a partial transcript
+                if partial_bytes and len(pcm) - partial_at >= partial_bytes and (
+                    self._partial_task is None or self._partial_task.done()
+                ):
+                    partial_at = len(pcm)
+                    self._partial_task = asyncio.create_task(self._partial_transcript(index, bytes(pcm)))
+                continue
+
+            try:
+                control = json.loads(message.get("text") or "{}")
+            except ValueError:
+                await self._emit({"type": "error", "error": "Malformed control message"})
+                continue
+
+            kind = control.get("type")
+            if kind == "start":
+                self.avatar_id = control.get("avatar_id")
+                self.voice = control.get("voice", self.voice)
+                self.sample_rate = int(control.get("sample_rate", self.sample_rate))
+                self.use_groq = bool(control.get("use_groq", self.use_groq))
+                partial_bytes = int(self.config.conversation_partial_interval * self.sample_rate * 2)
+                await self._emit({"type": "ready"})
+            elif kind == "end_utterance":
+                if pcm and await self._admit_turn(index):
+                    await self.utterances.put(Utterance(index, bytes(pcm), self.sample_rate))
+                if pcm:
+                    index += 1
+                pcm = bytearray()
+                partial_at = 0
+            elif kind == "stop":
+                return
+            else:
+                await self._emit({"type": "error", "error": f"Unknown message type: {kind}"})
+
+    async def _admit_turn(self, index: int) -> bool:
+        """Charge a turn to the client's turn bucket; a rejected turn is reported and dropped"""
+        if self.admission is None:
+            return True
+        try:
+            await self.admission.take_turn(
+                self.client, self.config.admission_conversation_turn_rate, self.config.admission_conversation_turn_burst
+            )
+        except AdmissionRejected as e:
+            await self._emit({
+                "type": "error", "utterance": index, "stage": "admission",
+                "error": e.detail, "retry_after": int(e.headers["Retry-After"])
+            })
+            return False
+        return True
+
+    async def _partial_transcript(self, index: int, pcm: bytes):
+        try:
+            result = await audio_service.transcribe_audio(pcm_to_wav(pcm, self.sample_rate), self.use_groq)
+            await self._emit({"type": "transcript", "utterance": index, "text": result["text"], "partial": True})
+        except Exception as e:
+            print(f"Partial transcription failed: {str(e)}")
+
+    async def _transcribe_loop(self):
+        while True:
+            utterance = await self.utterances.get()
+            if utterance is END_OF_STREAM:
+                await self.texts.put(END_OF_STREAM)
+                return
+            try:
+                result = await audio_service.transcribe_audio(
+                    pcm_to_wav(utterance.pcm, utterance.sample_rate), self.use_groq
+                )
+                utterance.text = result["text"].strip()
+                utterance.mark("transcript_ms")
+                await self._emit({
+                    "type": "transcript",
+                    "utterance": utterance.index,
+                    "text": utterance.text,
+                    "partial": False
+                })
+                if utterance.text:
+                    await self.texts.put(utterance)
+            except Exception as e:
+                await self._emit({"type": "error", "utterance": utterance.index, "stage": "transcribe", "error": str(e)})
+
+    async def _synthesize_loop(self):
+        while True:
+            utterance = await self.texts.get()
+            if utterance is END_OF_STREAM:
+                await self.renders.put(END_OF_STREAM)
+                return
+            try:
+                for sentence_index, sentence in enumerate(
+                    split_into_sentences(utterance.text, self.config.tts_sentence_max_chars)
+                ):
+                    speech = await audio_service.stream_text_to_speech(sentence, self.voice, save=True)
+                    await self._emit({"type": "audio_start", "utterance": utterance.index, "sentence": sentence_index})
+                    async for chunk in speech["stream"]:
+                        utterance.mark("first_audio_ms")
+                        await self._emit(chunk)
+                    await self._emit({"type": "audio_end", "utterance": utterance.index, "sentence": sentence_index})
+
+                    if self.avatar_id:
+                        # Submit now so renders overlap with synthesis of the next sentence
+                        job = await video_service.generate_talking_avatar(
+                            None, speech["audio_path"], CONVERSATION_RENDER_PRIORITY, self.avatar_id,
+                            quality=self.config.conversation_render_quality
+                        )
+                        utterance.pending_segments += 1
+                        await self.renders.put((utterance, sentence_index, job["job_id"]))
+            except Exception as e:
+                await self._emit({"type": "error", "utterance": utterance.index, "stage": "synthesize", "error": str(e)})
+            finally:
+                utterance.synthesis_done = True
+                if utterance.pending_segments == 0:
+                    await self._emit_metrics(utterance)
+
+    async def _deliver_loop(self):
+        """Push rendered segments back in order as their render jobs finish"""
+        while True:
+            item = await self.renders.get()
+            if item is END_OF_STREAM:
+                return
+            utterance, sentence_index, job_id = item
+            try:
+                job = await video_service.wait_for_job(job_id, self.config.render_job_timeout)
+                if job["status"] != "completed":
+                    raise HTTPException(status_code=500, detail=job["error"] or job["status"])
+                utterance.mark("first_video_ms")
+                video_path = job["result"]["video_path"]
+                await self._emit({
+                    "type": "video_segment",
+                    "utterance": utterance.index,
+                    "sentence": sentence_index,
+                    "job_id": job_id,
+                    "video_path": video_path,
+                    "video_url": f"/video-assets/{video_path.rsplit('/', 1)[-1]}"
+                })
+            except Exception as e:
+                detail = e.detail if isinstance(e, HTTPException) else str(e)
+                await self._emit({"type": "error", "utterance": utterance.index, "stage": "render", "error": detail})
+            finally:
+                utterance.pending_segments -= 1
+                if utterance.synthesis_done and utterance.pending_segments == 0:
+                    await self._emit_metrics(utterance)
+
+    async def _emit_metrics(self, utterance: Utterance):
+        utterance.mark("total_ms")
+        await self._emit({"type": "metrics", "utterance": utterance.index, **utterance.marks})
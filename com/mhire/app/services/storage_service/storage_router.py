@@ -0,0 +1,31 @@
+from fastapi import APIRouter
+import asyncio
+import time
+
+from com.mhire.app.config.config import Config
+from com.mhire.app.services.storage_service.storage_service import storage_service
+from com.mhire.app.common.network_responses import NetworkResponse, HTTPCode
+
+router = APIRouter(prefix=f"{Config().api_prefix}/storage", tags=["storage"])
+network_response = NetworkResponse()
+
+@router.get("")
+async def storage_stats():
+    """Disk usage per asset directory against its quota, from the artifact index"""
+    start_time = time.time()
+    
+    try:
+        return network_response.success_response(
+            HTTPCode.SUCCESS,
+            await asyncio.to_thread(storage_service.stats),
+            "storage",
+            start_time
+        )
+    except Exception as e:
+        return network_response.error_response(
+            HTTPCode.INTERNAL_SERVER_ERROR,
+            50000,
+            str(e),
+            "storage",
+            start_time
+        )
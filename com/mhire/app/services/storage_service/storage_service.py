@@ -0,0 +1,438 @@
+import os
+import re
+import json
+import time
+import fcntl
+import shutil
+import sqlite3
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from com.mhire.app.config.config import Config
+from com.mhire.app.services.video_service.render_queue import LOST_AFTER, JobStatus
+
+logger = logging.getLogger(__name__)
+
+# Progressive renders are directories named by request ID
+REQUEST_DIR_PATTERN = re.compile(r"REQ-[0-9a-f-]{36}")
+# Scratch directories that renders create and may leave behind: request directories
+# without a playlist, tempfile.mkdtemp(prefix=f"{request_id}_") render directories and
+# the timestamped run directories SadTalker's inference.py makes under --result_dir
+SCRATCH_DIR_PATTERNS = (
+    REQUEST_DIR_PATTERN,
+    re.compile(r"REQ-[0-9a-f-]{36}_\w+"),
+    re.compile(r"\d{4}_\d{2}_\d{2}_\d{2}\.\d{2}\.\d{2}"),
+)
+# Leftovers of interrupted atomic writes, anywhere below an area
+TEMP_SUFFIXES = (".tmp", ".tmp.mp4")
+# Render inputs left inside per-request and per-avatar directories
+NESTED_ORPHAN_SUFFIXES = TEMP_SUFFIXES + (".wav",)
+NESTED_ORPHAN_NAMES = ("idle_raw.mp4",)
+# Subdirectories managed by their own caches
+MANAGED_DIRECTORIES = ("avatars", "tts_cache")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    path TEXT PRIMARY KEY,
+    area TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS artifacts_lru ON artifacts (area, last_access);
+"""
+
+class StorageArea:
+    """A directory whose generated artifacts are tracked and kept within a quota"""
+
+    def __init__(
+        self,
+        name: str,
+        root: str,
+        max_bytes: int,
+        ttl: float,
+        extensions: Tuple[str, ...],
+        orphan_suffixes: Tuple[str, ...] = TEMP_SUFFIXES,
+        directories: bool = False
+    ):
+        self.name = name
+        self.root = os.path.abspath(root)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.extensions = extensions
+        # Top-level files with these suffixes are scratch files once they are old enough
+        self.orphan_suffixes = orphan_suffixes
+        # Whether request-named subdirectories (progressive renders) count as artifacts
+        self.directories = directories
+
+    def is_artifact(self, entry: os.DirEntry) -> bool:
+        if entry.is_dir(follow_symlinks=False):
+            return self.directories and REQUEST_DIR_PATTERN.fullmatch(entry.name) is not None \
+                and os.path.exists(os.path.join(entry.path, "index.m3u8"))
+        return entry.name.endswith(self.extensions) and not entry.name.endswith(TEMP_SUFFIXES)
+
+def _path_size(path: str) -> int:
+    if not os.path.isdir(path):
+        return os.path.getsize(path)
+    total = 0
+    for directory, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+    return total
+
+def _remove_path(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+class StorageService:
+    """Tracks generated audio/video files in SQLite and evicts them by TTL and quota.
+
+    Request handlers only append to in-memory buffers (``record`` and ``touch``); each
+    worker flushes its buffers to the index in the background. Sweeps (eviction,
+    orphan cleanup and reconciliation with the disk) run in whichever worker holds
+    the index's ``flock``, so only one process deletes files at a time.
+    """
+
+    def __init__(self):
+        self.config = Config()
+        self.index_path = self.config.storage_index_path
+        self.areas = {
+            "audio": StorageArea(
+                "audio", self.config.audio_assets_path,
+                self.config.audio_assets_max_bytes, self.config.audio_assets_ttl,
+                extensions=(".mp3", ".wav", ".opus", ".flac", ".ogg", ".aac")
+            ),
+            "video": StorageArea(
+                "video", self.config.video_assets_path,
+                self.config.video_assets_max_bytes, self.config.video_assets_ttl,
+                extensions=(".mp4",),
+                # Trimmed speech WAVs, SadTalker's copied inputs and ffmpeg concat lists
+                orphan_suffixes=TEMP_SUFFIXES + (".wav", ".png", ".jpg", ".txt"),
+                directories=True
+            ),
+        }
+        self._records: Dict[str, str] = {}
+        self._touches: Dict[str, float] = {}
+        self._buffer_lock = threading.Lock()
+        self._local = threading.local()
+        self._leader_file = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_reconcile = 0.0
+        self._stats = {"evicted": 0, "evicted_bytes": 0, "orphans_removed": 0, "sweeps": 0}
+        # Never swept, even when they sit inside an area: SadTalker's checkout and checkpoints,
+        # the artifact store's inputs, the caches that manage themselves and the inputs of
+        # queued renders (see _remove_stale_inputs)
+        self.render_inputs_path = os.path.abspath(self.config.render_inputs_path)
+        self.protected = {
+            os.path.abspath(path) for path in (
+                self.config.sadtalker_path,
+                os.path.join(self.config.artifact_store_path, "inputs"),
+                self.config.avatar_cache_path,
+                self.config.tts_cache_path,
+                os.path.dirname(self.index_path),
+                self.config.render_jobs_path,
+                self.render_inputs_path
+            )
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets every worker write while others read
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.index_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            # Schema on first connect, not in __init__: a preloading gunicorn master never opens the index
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def record(self, path: str, area: str):
+        """Note a newly written artifact; never blocks the caller on I/O"""
+        with self._buffer_lock:
+            self._records[os.path.abspath(path)] = area
+
+    def touch(self, path: str):
+        """Note that an artifact was served, for LRU ordering"""
+        with self._buffer_lock:
+            self._touches[os.path.abspath(path)] = time.time()
+
+    async def start(self):
+        if not self.config.storage_lifecycle_enabled:
+            return
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.to_thread(self.flush)
+        if self._leader_file is not None:
+            self._leader_file.close()
+            self._leader_file = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.flush)
+                if await asyncio.to_thread(self._is_leader):
+                    await asyncio.to_thread(self.sweep)
+            except Exception:
+                logger.exception("Storage lifecycle sweep failed")
+            await asyncio.sleep(self.config.storage_sweep_interval)
+
+    def _is_leader(self) -> bool:
+        if self._leader_file is not None:
+            return True
+        lock_file = open(f"{self.index_path}.lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        # Held until this worker exits; another worker takes over after that
+        self._leader_file = lock_file
+        return True
+
+    def flush(self):
+        """Write buffered records and accesses to the index"""
+        with self._buffer_lock:
+            records, self._records = self._records, {}
+            touches, self._touches = self._touches, {}
+        if not records and not touches:
+            return
+
+        now = time.time()
+        rows = []
+        for path, area in records.items():
+            try:
+                rows.append((path, area, _path_size(path), now, touches.pop(path, now)))
+            except FileNotFoundError:
+                continue
+        connection = self._connect()
+        with connection:
+            connection.executemany(
+                "INSERT INTO artifacts (path, area, size, created, last_access) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, last_access = excluded.last_access",
+                rows
+            )
+            connection.executemany(
+                "UPDATE artifacts SET last_access = MAX(last_access, ?) WHERE path = ?",
+                [(accessed, path) for path, accessed in touches.items()]
+            )
+
+    def sweep(self) -> Dict[str, Any]:
+        """Reconcile with the disk when due, drop orphans, then apply TTLs and quotas"""
+        if time.time() - self._last_reconcile > self.config.storage_reconcile_interval:
+            self.reconcile()
+            self._last_reconcile = time.time()
+        for area in self.areas.values():
+            self._evict(area)
+        self._stats["sweeps"] += 1
+        return self.stats()
+
+    def reconcile(self):
+        """Index artifacts written outside the app and forget rows whose files are gone.
+
+        This is the only directory scan, and it runs in the background sweep.
+        """
+        connection = self._connect()
+        known = {path for (path,) in connection.execute("SELECT path FROM artifacts")}
+        now = time.time()
+        active = self._active_requests()
+        found, missing = [], []
+        for area in self.areas.values():
+            if not os.path.isdir(area.root):
+                continue
+            seen = set()
+            for entry in os.scandir(area.root):
+                if area.is_artifact(entry):
+                    seen.add(entry.path)
+                    if entry.path not in known:
+                        stat = entry.stat(follow_symlinks=False)
+                        found.append((entry.path, area.name, _path_size(entry.path), stat.st_mtime, stat.st_mtime))
+                elif self._is_orphan(area, entry, now, active):
+                    _remove_path(entry.path)
+                    self._stats["orphans_removed"] += 1
+            # Orphans inside per-request and per-avatar subdirectories
+            self._remove_nested_orphans(area.root, now, active, REQUEST_DIR_PATTERN)
+            self._remove_nested_orphans(os.path.join(area.root, "avatars"), now, active)
+            prefix = area.root + os.sep
+            missing.extend(path for path in known if path.startswith(prefix) and os.path.dirname(path) == area.root and path not in seen)
+        self._remove_stale_inputs(now, active)
+
+        with connection:
+            connection.executemany("INSERT OR IGNORE INTO artifacts VALUES (?, ?, ?, ?, ?)", found)
+            connection.executemany("DELETE FROM artifacts WHERE path = ?", [(path,) for path in missing])
+        if found or missing:
+            logger.info(f"Storage index reconciled: {len(found)} added, {len(missing)} removed")
+
+    def _age(self, entry: os.DirEntry, now: float) -> float:
+        try:
+            return now - entry.stat(follow_symlinks=False).st_mtime
+        except FileNotFoundError:
+            return 0.0
+
+    def _active_requests(self) -> Set[str]:
+        """Request IDs of render jobs whose state file says they are still queued or running.
+
+        A job whose owner stopped heartbeating is not active; its worker is gone.
+        """
+        now = time.time()
+        active = set()
+        state_dir = self.config.render_jobs_path
+        if not os.path.isdir(state_dir):
+            return active
+        for entry in os.scandir(state_dir):
+            job_id, extension = os.path.splitext(entry.name)
+            if extension != ".json" or not REQUEST_DIR_PATTERN.fullmatch(job_id):
+                continue
+            try:
+                with open(entry.path) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not isinstance(state, dict) or state.get("status") in JobStatus.FINISHED:
+                continue
+            if now - (state.get("heartbeat_at") or state.get("created_at") or 0) <= LOST_AFTER:
+                active.add(job_id)
+        return active
+
+    def _is_active(self, name: str, active: Set[str]) -> bool:
+        # Render files and scratch directories are named after the job's request ID
+        match = REQUEST_DIR_PATTERN.match(name)
+        return match is not None and match.group(0) in active
+
+    def _is_orphan(self, area: StorageArea, entry: os.DirEntry, now: float, active: Set[str]) -> bool:
+        if os.path.abspath(entry.path) in self.protected or self._age(entry, now) < self.config.storage_orphan_age:
+            return False
+        if self._is_active(entry.name, active):
+            return False
+        if entry.is_dir(follow_symlinks=False):
+            # Only directories renders are known to create; anything else may be an operator's
+            return entry.name not in MANAGED_DIRECTORIES \
+                and any(pattern.fullmatch(entry.name) for pattern in SCRATCH_DIR_PATTERNS)
+        return entry.name.endswith(area.orphan_suffixes)
+
+    def _remove_nested_orphans(
+        self,
+        directory: str,
+        now: float,
+        active: Set[str],
+        name_pattern: Optional[re.Pattern] = None
+    ):
+        if not os.path.isdir(directory):
+            return
+        for entry in os.scandir(directory):
+            if not entry.is_dir(follow_symlinks=False) or os.path.abspath(entry.path) in self.protected:
+                continue
+            if self._is_active(entry.name, active):
+                continue
+            if name_pattern is not None and not name_pattern.fullmatch(entry.name):
+                continue
+            for child in os.scandir(entry.path):
+                if not child.is_file(follow_symlinks=False):
+                    continue
+                if (child.name.endswith(NESTED_ORPHAN_SUFFIXES) or child.name in NESTED_ORPHAN_NAMES) \
+                        and self._age(child, now) >= self.config.storage_orphan_age:
+                    _remove_path(child.path)
+                    self._stats["orphans_removed"] += 1
+
+    def _remove_stale_inputs(self, now: float, active: Set[str]):
+        """Drop render inputs left behind by jobs that finished without removing them (cancelled while queued, crashed)"""
+        if not os.path.isdir(self.render_inputs_path):
+            return
+        for entry in os.scandir(self.render_inputs_path):
+            if not entry.is_file(follow_symlinks=False) or self._is_active(entry.name, active):
+                continue
+            if self._age(entry, now) >= self.config.storage_orphan_age:
+                _remove_path(entry.path)
+                self._stats["orphans_removed"] += 1
+
+    def _evict(self, area: StorageArea):
+        connection = self._connect()
+        now = time.time()
+        protected_since = now - self.config.storage_min_age
+        victims: List[Tuple[str, int]] = []
+
+        # Expired by TTL
+        if area.ttl > 0:
+            victims += connection.execute(
+                "SELECT path, size FROM artifacts WHERE area = ? AND last_access < ? AND last_access < ?",
+                (area.name, now - area.ttl, protected_since)
+            ).fetchall()
+
+        # Least recently used beyond the quota
+        if area.max_bytes > 0:
+            expired = {path for path, _ in victims}
+            (total,) = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM artifacts WHERE area = ?", (area.name,)
+            ).fetchone()
+            total -= sum(size for _, size in victims)
+            if total > area.max_bytes:
+                for path, size in connection.execute(
+                    "SELECT path, size FROM artifacts WHERE area = ? AND last_access < ? ORDER BY last_access",
+                    (area.name, protected_since)
+                ):
+                    if total <= area.max_bytes:
+                        break
+                    if path in expired:
+                        continue
+                    victims.append((path, size))
+                    total -= size
+
+        if not victims:
+            return
+        for path, size in victims:
+            _remove_path(path)
+            self._stats["evicted"] += 1
+            self._stats["evicted_bytes"] += size
+        with connection:
+            connection.executemany("DELETE FROM artifacts WHERE path = ?", [(path,) for path, _ in victims])
+        logger.info(f"Evicted {len(victims)} {area.name} artifacts ({sum(size for _, size in victims)} bytes)")
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-area usage from the index plus this worker's sweep counters"""
+        connection = self._connect()
+        areas = {}
+        for area in self.areas.values():
+            count, total, oldest = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(last_access) FROM artifacts WHERE area = ?",
+                (area.name,)
+            ).fetchone()
+            areas[area.name] = {
+                "root": area.root,
+                "artifacts": count,
+                "bytes": total,
+                "max_bytes": area.max_bytes,
+                "usage": round(total / area.max_bytes, 3) if area.max_bytes else None,
+                "ttl": area.ttl,
+                "oldest_access": oldest,
+            }
+        try:
+            disk = shutil.disk_usage(self.areas["video"].root)
+            free_bytes = disk.free
+        except FileNotFoundError:
+            free_bytes = None
+        return {
+            "areas": areas,
+            "disk_free_bytes": free_bytes,
+            "leader": self._leader_file is not None,
+            "pending_records": len(self._records),
+            **self._stats,
+        }
+
+# Create a singleton instance
+storage_service = StorageService()
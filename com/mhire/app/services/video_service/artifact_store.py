@@ -0,0 +1,103 @@
+import os
+import shutil
+import tempfile
+from typing import Tuple
+
+
+class LocalArtifactStore:
+    """Artifact store on a directory that every node mounts (NFS, a bind mount, a mounted bucket).
+
+    Objects are addressed by relative keys such as ``REQ-<id>.mp4`` or
+    ``inputs/<job_id>/audio.wav``. Writes go to a temporary file next to the target
+    and are renamed into place, so readers on other nodes never see partial objects.
+    On API nodes the root is the video assets directory, which nginx and the UI
+    already read from, so published renders are served without another copy.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Invalid artifact key: {key}")
+        return path
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def put(self, local_path: str, key: str):
+        """Copy a local file into the store; a no-op when it already is the stored file"""
+        target = self.path(key)
+        if os.path.abspath(local_path) == target:
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f, open(local_path, "rb") as source:
+                shutil.copyfileobj(source, f, 1024 * 1024)
+            shutil.copystat(local_path, temp_path)
+            os.replace(temp_path, target)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def put_tree(self, local_dir: str, prefix: str, suffixes: Tuple[str, ...], last: Tuple[str, ...] = ()):
+        """Copy new or changed files of a directory, then the files named in last.
+
+        The files in last (playlists) are read before anything is copied, so they
+        never reference a file that is not in the store yet.
+        """
+        snapshots = {}
+        for name in last:
+            try:
+                with open(os.path.join(local_dir, name), "rb") as f:
+                    snapshots[name] = f.read()
+            except FileNotFoundError:
+                pass
+
+        for entry in os.scandir(local_dir):
+            if not entry.is_file() or entry.name in last or not entry.name.endswith(suffixes):
+                continue
+            key = f"{prefix}/{entry.name}"
+            try:
+                stored = os.stat(self.path(key))
+                source = entry.stat()
+                if stored.st_size == source.st_size and stored.st_mtime_ns == source.st_mtime_ns:
+                    continue
+            except FileNotFoundError:
+                pass
+            self.put(entry.path, key)
+
+        for name, content in snapshots.items():
+            self.write(f"{prefix}/{name}", content)
+
+    def write(self, key: str, content: bytes):
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, target)
+
+    def read(self, key: str) -> bytes:
+        with open(self.path(key), "rb") as f:
+            return f.read()
+
+    def get(self, key: str, local_path: str):
+        """Copy a stored object to a local file"""
+        source = self.path(key)
+        if os.path.abspath(local_path) != source:
+            shutil.copyfile(source, local_path)
+
+    def delete(self, key: str):
+        """Remove an object or everything under a prefix"""
+        path = self.path(key)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
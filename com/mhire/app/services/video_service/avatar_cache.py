@@ -0,0 +1,122 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import time
+from typing import Any, Dict
+
+from fastapi import HTTPException
+
+from com.mhire.app.common.telemetry import stage
+
+logger = logging.getLogger(__name__)
+
+SOURCE_IMAGE_NAME = "source.png"
+
+
+class AvatarCache:
+    """Content-addressed store of avatar images and their SadTalker preprocessing output.
+
+    Layout: ``<root>/<avatar_id>/source.png`` plus one ``<preprocess>_<size>/`` directory
+    per render configuration holding the cropped face, 3DMM coefficients and crop info.
+    The avatar directory's mtime records its last use, which drives LRU eviction once
+    the cache exceeds its size or entry budget.
+    """
+
+    def __init__(self, root: str, max_bytes: int, max_entries: int, min_age: float = 600.0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        # Entries used more recently than this are never evicted, so in-flight renders keep their inputs
+        self.min_age = min_age
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def avatar_id_for(image_file: bytes) -> str:
+        return hashlib.sha256(image_file).hexdigest()[:32]
+
+    def _avatar_dir(self, avatar_id: str) -> str:
+        if not avatar_id or not all(c in "0123456789abcdef" for c in avatar_id):
+            raise HTTPException(status_code=422, detail=f"Invalid avatar ID: {avatar_id}")
+        return os.path.join(self.root, avatar_id)
+
+    def register(self, image_file: bytes) -> Dict[str, Any]:
+        """Store an avatar image once; re-registering the same bytes is a cache hit"""
+        avatar_id = self.avatar_id_for(image_file)
+        avatar_dir = self._avatar_dir(avatar_id)
+        source_path = os.path.join(avatar_dir, SOURCE_IMAGE_NAME)
+
+        created = not os.path.exists(source_path)
+        if created:
+            os.makedirs(avatar_dir, exist_ok=True)
+            with stage("file.write"):
+                fd, temp_path = tempfile.mkstemp(dir=avatar_dir, suffix=".tmp")
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(image_file)
+                os.replace(temp_path, source_path)
+        self.touch(avatar_id)
+
+        return {
+            "avatar_id": avatar_id,
+            "created": created,
+            "size_bytes": len(image_file)
+        }
+
+    def touch(self, avatar_id: str):
+        try:
+            os.utime(self._avatar_dir(avatar_id))
+        except FileNotFoundError:
+            pass
+
+    def source_path(self, avatar_id: str) -> str:
+        """Path of a registered avatar image, marking it as recently used"""
+        source_path = os.path.join(self._avatar_dir(avatar_id), SOURCE_IMAGE_NAME)
+        if not os.path.exists(source_path):
+            raise HTTPException(status_code=404, detail=f"Avatar not found: {avatar_id}")
+        self.touch(avatar_id)
+        return source_path
+
+    def preprocessed_dir(self, avatar_id: str, preprocess: str, size: int) -> str:
+        """Directory holding preprocessing output for one render configuration"""
+        return os.path.join(self._avatar_dir(avatar_id), f"{preprocess}_{size}")
+
+    def _entry_size(self, avatar_dir: str) -> int:
+        total = 0
+        for dirpath, _, filenames in os.walk(avatar_dir):
+            for filename in filenames:
+                try:
+                    total += os.path.getsize(os.path.join(dirpath, filename))
+                except OSError:
+                    continue
+        return total
+
+    def evict(self) -> Dict[str, Any]:
+        """Drop least recently used avatars until the cache fits its budget"""
+        entries = []
+        for avatar_id in os.listdir(self.root):
+            avatar_dir = os.path.join(self.root, avatar_id)
+            if os.path.isdir(avatar_dir):
+                entries.append((os.path.getmtime(avatar_dir), avatar_id, self._entry_size(avatar_dir)))
+
+        entries.sort()
+        total_bytes = sum(size for _, _, size in entries)
+        evicted = 0
+        now = time.time()
+        for last_used, avatar_id, size in entries:
+            if total_bytes <= self.max_bytes and len(entries) - evicted <= self.max_entries:
+                break
+            if now - last_used < self.min_age:
+                break
+            shutil.rmtree(os.path.join(self.root, avatar_id), ignore_errors=True)
+            total_bytes -= size
+            evicted += 1
+            logger.info(f"Evicted avatar {avatar_id} ({size} bytes) from cache")
+
+        return {
+            "entries": len(entries) - evicted,
+            "bytes": total_bytes,
+            "evicted": evicted,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries
+        }
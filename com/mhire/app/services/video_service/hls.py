@@ -0,0 +1,123 @@
+import os
+import math
+import asyncio
+import mimetypes
+from typing import List
+
+from com.mhire.app.common.ffmpeg import run_ffmpeg
+
+# Starlette's StaticFiles guesses content types from this table
+mimetypes.add_type("application/vnd.apple.mpegurl", ".m3u8")
+mimetypes.add_type("video/iso.segment", ".m4s")
+
+PLAYLIST_NAME = "index.m3u8"
+
+class HlsPlaylist:
+    """Event playlist that grows by one rendered clip at a time.
+
+    Every clip is packaged on its own, so each one brings its own init segment and
+    is preceded by a discontinuity. Writes are atomic renames, so players polling
+    the file never see a partial playlist.
+    """
+
+    def __init__(self, output_dir: str, max_segment_seconds: float):
+        self.path = os.path.join(output_dir, PLAYLIST_NAME)
+        self.target_duration = max(1, math.ceil(max_segment_seconds) + 1)
+        self.entries: List[str] = []
+        self.finished = False
+
+    def append(self, lines: List[str]):
+        if self.entries:
+            self.entries.append("#EXT-X-DISCONTINUITY")
+        self.entries.extend(lines)
+        self.write()
+
+    def finish(self):
+        self.finished = True
+        self.write()
+
+    def write(self):
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:7",
+            f"#EXT-X-TARGETDURATION:{self.target_duration}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:EVENT",
+            "#EXT-X-INDEPENDENT-SEGMENTS",
+            *self.entries
+        ]
+        if self.finished:
+            lines.append("#EXT-X-ENDLIST")
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(temp_path, self.path)
+
+async def package_clip(clip_path: str, output_dir: str, name: str) -> List[str]:
+    """Remux a rendered clip into fMP4 HLS segments; returns its playlist entries"""
+    clip_playlist = f"{name}.m3u8"
+    await run_ffmpeg([
+        "-i", os.path.abspath(clip_path),
+        "-c", "copy",
+        "-f", "hls",
+        "-hls_time", "3600",
+        "-hls_playlist_type", "vod",
+        "-hls_segment_type", "fmp4",
+        "-hls_fmp4_init_filename", f"{name}_init.mp4",
+        "-hls_segment_filename", f"{name}_%03d.m4s",
+        clip_playlist
+    ], cwd=output_dir)
+
+    # Keep the map and media lines; the header and end tag belong to the combined playlist
+    lines = await asyncio.to_thread(_read_clip_playlist, os.path.join(output_dir, clip_playlist))
+    return [
+        line for line in lines
+        if line.startswith(("#EXT-X-MAP", "#EXTINF")) or not line.startswith("#")
+    ]
+
+def _read_clip_playlist(path: str) -> List[str]:
+    with open(path) as f:
+        lines = [line.strip() for line in f if line.strip()]
+    os.remove(path)
+    return lines
+
+def _write_concat_list(list_path: str, clip_paths: List[str]):
+    with open(list_path, "w") as f:
+        for clip_path in clip_paths:
+            f.write(f"file '{os.path.abspath(clip_path)}'\n")
+
+async def concat_clips(clip_paths: List[str], output_path: str):
+    """Join rendered clips into one MP4 without re-encoding"""
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    list_path = f"{output_path}.txt"
+    await asyncio.to_thread(_write_concat_list, list_path, clip_paths)
+    try:
+        await run_ffmpeg([
+            "-f", "concat", "-safe", "0",
+            "-i", os.path.abspath(list_path),
+            "-c", "copy",
+            "-movflags", "+faststart",
+            os.path.abspath(output_path)
+        ], cwd=output_dir)
+    finally:
+        await asyncio.to_thread(os.remove, list_path)
+
+async def split_clip(clip_path: str, cuts: List[float], output_pattern: str):
+    """Cut a rendered clip at the given times into numbered MP4s (output_pattern takes %03d).
+
+    Stream copy could only cut at the existing keyframes, so the clip is re-encoded
+    once with a keyframe forced at every cut, which makes each part start exactly there.
+    """
+    times = ",".join(f"{cut:.3f}" for cut in cuts)
+    # Without cuts the segment muxer would fall back to its 2 second default
+    split = ["-force_key_frames", times, "-segment_times", times] if cuts else ["-segment_time", "86400"]
+    await run_ffmpeg([
+        "-i", os.path.abspath(clip_path),
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac",
+        *split,
+        "-f", "segment",
+        "-reset_timestamps", "1",
+        "-segment_format_options", "movflags=+faststart",
+        os.path.abspath(output_pattern)
+    ])
@@ -0,0 +1,109 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS idempotency (
+    key TEXT PRIMARY KEY,
+    job_id TEXT NOT NULL,
+    created REAL NOT NULL
+);
+"""
+
+# Expired keys are pruned on every this many claims
+PRUNE_EVERY = 500
+
+
+def request_key(idempotency_key: str) -> str:
+    """Index key for a client-supplied Idempotency-Key"""
+    return "key:" + hashlib.sha256(idempotency_key.encode()).hexdigest()
+
+
+def content_key(audio_path: str, params: Dict[str, Any]) -> str:
+    """Index key for identical work: the driving audio's bytes plus the render parameters"""
+    digest = hashlib.sha256()
+    with open(audio_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    for name in sorted(params):
+        digest.update(f"\0{name}={params[name]}".encode())
+    return "content:" + digest.hexdigest()
+
+
+class IdempotencyIndex:
+    """Maps idempotency keys to the render job that did (or is doing) the work.
+
+    The first request for a key records its job ID; later ones get that job back
+    and attach to it instead of rendering again. The index is a SQLite file next
+    to the job state, so every worker (and, with remote dispatch, every API node
+    sharing the directory) sees the same mapping. Keys expire after ``ttl`` seconds.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._claims = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def claim(self, key: str, job_id: str) -> Optional[Tuple[str, float]]:
+        """Record job_id for key; returns the (job_id, created) already recorded, if any"""
+        connection = self._connect()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute(
+                "SELECT job_id, created FROM idempotency WHERE key = ? AND created >= ?", (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                connection.execute(
+                    "INSERT OR REPLACE INTO idempotency (key, job_id, created) VALUES (?, ?, ?)", (key, job_id, now)
+                )
+            self._claims += 1
+            if self._claims % PRUNE_EVERY == 0:
+                connection.execute("DELETE FROM idempotency WHERE created < ?", (now - self.ttl,))
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return row
+
+    def replace(self, key: str, stale_job_id: str, job_id: str) -> Optional[str]:
+        """Point key at job_id if it still maps to stale_job_id; otherwise return its current job"""
+        connection = self._connect()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            updated = connection.execute(
+                "UPDATE idempotency SET job_id = ?, created = ? WHERE key = ? AND job_id = ?",
+                (job_id, time.time(), key, stale_job_id)
+            ).rowcount
+            row = None if updated else connection.execute(
+                "SELECT job_id FROM idempotency WHERE key = ?", (key,)
+            ).fetchone()
+            if not updated and row is None:
+                # Pruned in the meantime
+                connection.execute(
+                    "INSERT INTO idempotency (key, job_id, created) VALUES (?, ?, ?)", (key, job_id, time.time())
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return row[0] if row else None
+
+    def release(self, key: str, job_id: str):
+        """Drop key if it still maps to job_id, e.g. after the job could not be submitted"""
+        self._connect().execute("DELETE FROM idempotency WHERE key = ? AND job_id = ?", (key, job_id))
@@ -0,0 +1,284 @@
+import os
+import fcntl
+import shutil
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from com.mhire.app.common.ffmpeg import probe_duration, run_ffmpeg
+from com.mhire.app.common.utility import remove_file, write_file
+
+logger = logging.getLogger(__name__)
+
+# SadTalker renders at 25 fps
+FRAME_RATE = 25
+
+class IdleLoopCache:
+    """Per-avatar idle loops and neutral frames, rendered once per quality tier.
+
+    Assets live in ``<root>/<avatar_id>/idle_<tier>.mp4`` (a seamless ping-pong loop
+    of the avatar rendered on silence) and ``neutral_<tier>.jpg`` (its first frame),
+    under the video assets directory so nginx can serve the neutral frame as a poster.
+    Builds are coalesced within a worker and serialised across workers with ``flock``.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        # Callers currently waiting for each in-flight build
+        self._waiters: Dict[str, int] = {}
+        os.makedirs(self.root, exist_ok=True)
+
+    def _avatar_dir(self, avatar_id: str) -> str:
+        return os.path.join(self.root, avatar_id)
+
+    def loop_path(self, avatar_id: str, tier: str) -> str:
+        return os.path.join(self._avatar_dir(avatar_id), f"idle_{tier}.mp4")
+
+    def neutral_path(self, avatar_id: str, tier: str) -> str:
+        return os.path.join(self._avatar_dir(avatar_id), f"neutral_{tier}.jpg")
+
+    def lookup(self, avatar_id: str, tier: str) -> Optional[str]:
+        path = self.loop_path(avatar_id, tier)
+        return path if os.path.exists(path) else None
+
+    async def ensure(
+        self,
+        avatar_id: str,
+        tier: str,
+        render: Callable[[str], Awaitable[str]],
+        should_cancel: Optional[Callable[[], bool]] = None
+    ) -> str:
+        """Path of the avatar's idle loop, building it with render(output_dir) on first use.
+
+        render must produce a clip of the avatar on silent audio and return its path, and
+        must not stop for any one caller's cancellation: the build is shared by every
+        caller waiting for it. Each caller passes its own should_cancel, polled while it
+        waits; a cancelled caller stops waiting, and the build is cancelled only once no
+        callers are left.
+        """
+        path = await asyncio.to_thread(self.lookup, avatar_id, tier)
+        if path:
+            return path
+
+        key = f"{avatar_id}_{tier}"
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._build(avatar_id, tier, render))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._in_flight.pop(key) if self._in_flight.get(key) is done else None)
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=1.0)
+                if not task.done() and should_cancel is not None and should_cancel():
+                    raise asyncio.CancelledError()
+            return task.result()
+        finally:
+            self._waiters[key] -= 1
+            if self._waiters[key] == 0:
+                del self._waiters[key]
+                if not task.done():
+                    # Nobody wants it any more; later callers start a fresh build
+                    task.cancel()
+                    self._in_flight.pop(key, None)
+
+    async def _build(self, avatar_id: str, tier: str, render: Callable[[str], Awaitable[str]]) -> str:
+        avatar_dir = self._avatar_dir(avatar_id)
+        lock_file = await asyncio.to_thread(self._open_lock, avatar_dir, tier)
+        try:
+            await asyncio.to_thread(fcntl.flock, lock_file, fcntl.LOCK_EX)
+
+            # Another worker may have built it while we waited for the lock
+            path = await asyncio.to_thread(self.lookup, avatar_id, tier)
+            if path:
+                return path
+
+            clip_path = await render(avatar_dir)
+            path = self.loop_path(avatar_id, tier)
+            temp_path = f"{path}.tmp.mp4"
+            try:
+                # Forward then reversed, so the loop has no visible jump when it wraps
+                await run_ffmpeg([
+                    "-i", clip_path,
+                    "-filter_complex", "[0:v]split[a][b];[b]reverse[r];[a][r]concat=n=2:v=1:a=0[v]",
+                    "-map", "[v]", "-an",
+                    "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+                    temp_path
+                ])
+                await run_ffmpeg(["-i", temp_path, "-frames:v", "1", self.neutral_path(avatar_id, tier)])
+                await asyncio.to_thread(os.replace, temp_path, path)
+            finally:
+                for leftover in (clip_path, temp_path):
+                    await asyncio.to_thread(remove_file, leftover)
+            logger.info(f"Built idle loop for avatar {avatar_id} ({tier})")
+            return path
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+            lock_file.close()
+
+    def _open_lock(self, avatar_dir: str, tier: str):
+        os.makedirs(avatar_dir, exist_ok=True)
+        return open(os.path.join(avatar_dir, f"idle_{tier}.lock"), "a")
+
+    async def composite(
+        self,
+        loop_path: str,
+        speech_path: Optional[str],
+        audio_path: str,
+        sections: List[Tuple[float, float]],
+        total: float,
+        output_path: str,
+        encoder: Optional[Dict[str, Any]] = None
+    ):
+        """Idle footage everywhere except the speech sections, which come from the rendered clip.
+
+        sections are (start, end) seconds of the original audio, rendered back to back
+        in speech_path. Each stretch of idle footage starts where the loop would be at
+        that point, and the original (untrimmed) audio is laid over the whole video.
+
+        With encoder ({"preset", "crf"}), speech_path must have been encoded with those
+        settings and a keyframe at every ``section_cuts`` time: its sections are then
+        stream-copied and only the idle stretches are encoded, so the rendered speech is
+        not encoded a second time. Without it everything is re-encoded in one pass.
+        """
+        if speech_path is None:
+            sections = []
+        if sections and encoder is not None:
+            await self._composite_copy(loop_path, speech_path, audio_path, sections, total, output_path, encoder)
+            return
+
+        inputs = ["-i", audio_path]
+        filters: List[str] = []
+        parts: List[str] = []
+        loop_duration: Optional[float] = None
+
+        def add_input(args: List[str]) -> int:
+            inputs.extend(args)
+            return inputs.count("-i") - 1
+
+        async def add_idle(start: float, duration: float):
+            nonlocal loop_duration
+            seek = []
+            if start > 0:
+                if loop_duration is None:
+                    loop_duration = await probe_duration(loop_path)
+                seek = ["-ss", f"{start % loop_duration:.3f}"]
+            index = add_input(["-stream_loop", "-1", *seek, "-i", loop_path])
+            label = f"idle{len(parts)}"
+            filters.append(f"[{index}:v]fps={FRAME_RATE},trim=duration={duration:.3f},setpts=PTS-STARTPTS,setsar=1[{label}]")
+            parts.append(f"[{label}]")
+
+        if sections:
+            index = add_input(["-i", speech_path])
+            labels = "".join(f"[clip{i}]" for i in range(len(sections)))
+            filters.append(f"[{index}:v]fps={FRAME_RATE},setsar=1,split={len(sections)}{labels}")
+
+        position, clip_position = 0.0, 0.0
+        for i, (start, end) in enumerate(sections):
+            if start > position:
+                await add_idle(position, start - position)
+            filters.append(
+                f"[clip{i}]trim=start={clip_position:.3f}:end={clip_position + end - start:.3f},setpts=PTS-STARTPTS[speech{i}]"
+            )
+            parts.append(f"[speech{i}]")
+            clip_position += end - start
+            position = end
+        if total > position:
+            await add_idle(position, total - position)
+        filters.append(f"{''.join(parts)}concat=n={len(parts)}:v=1:a=0[v]")
+
+        await run_ffmpeg([
+            *inputs,
+            "-filter_complex", ";".join(filters),
+            "-map", "[v]", "-map", "0:a",
+            "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+            "-c:a", "aac",
+            "-shortest",
+            "-movflags", "+faststart",
+            output_path
+        ])
+
+    async def _composite_copy(
+        self,
+        loop_path: str,
+        speech_path: str,
+        audio_path: str,
+        sections: List[Tuple[float, float]],
+        total: float,
+        output_path: str,
+        encoder: Dict[str, Any]
+    ):
+        """composite() without re-encoding the speech: cut it at its keyframes and concatenate the parts"""
+        parts_dir = f"{os.path.splitext(output_path)[0]}_parts"
+        await asyncio.to_thread(os.makedirs, parts_dir, exist_ok=True)
+        try:
+            cuts = section_cuts(sections)
+            times = ",".join(f"{cut:.3f}" for cut in cuts)
+            # Without cuts the segment muxer would fall back to its 2 second default
+            split = ["-segment_times", times] if cuts else ["-segment_time", "86400"]
+            await run_ffmpeg([
+                "-i", speech_path,
+                "-map", "0:v", "-c", "copy",
+                *split,
+                "-f", "segment",
+                "-reset_timestamps", "1",
+                os.path.join(parts_dir, "speech%03d.mp4")
+            ])
+
+            loop_duration: Optional[float] = None
+            part_paths: List[str] = []
+
+            async def add_idle(start: float, duration: float):
+                nonlocal loop_duration
+                seek = []
+                if start > 0:
+                    if loop_duration is None:
+                        loop_duration = await probe_duration(loop_path)
+                    seek = ["-ss", f"{start % loop_duration:.3f}"]
+                path = os.path.join(parts_dir, f"idle{len(part_paths):03d}.mp4")
+                # Same encoder settings as the speech clip, so the parts join without a re-encode
+                await run_ffmpeg([
+                    "-stream_loop", "-1", *seek, "-i", loop_path,
+                    "-t", f"{duration:.3f}",
+                    "-vf", f"fps={FRAME_RATE}",
+                    "-an",
+                    "-c:v", "libx264", "-preset", encoder["preset"], "-crf", str(encoder["crf"]), "-pix_fmt", "yuv420p",
+                    path
+                ])
+                part_paths.append(path)
+
+            position = 0.0
+            for i, (start, end) in enumerate(sections):
+                if start > position:
+                    await add_idle(position, start - position)
+                part_paths.append(os.path.join(parts_dir, f"speech{i:03d}.mp4"))
+                position = end
+            if total > position:
+                await add_idle(position, total - position)
+
+            list_path = os.path.join(parts_dir, "parts.txt")
+            listing = "".join(f"file '{os.path.abspath(path)}'\n" for path in part_paths)
+            await asyncio.to_thread(write_file, list_path, listing.encode())
+            await run_ffmpeg([
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                "-i", audio_path,
+                "-map", "0:v", "-map", "1:a",
+                "-c:v", "copy",
+                "-c:a", "aac",
+                "-shortest",
+                "-movflags", "+faststart",
+                output_path
+            ])
+        finally:
+            await asyncio.to_thread(shutil.rmtree, parts_dir, True)
+
+
+def section_cuts(sections: List[Tuple[float, float]]) -> List[float]:
+    """Times in the rendered speech clip where one section ends and the next begins"""
+    cuts, position = [], 0.0
+    for start, end in sections[:-1]:
+        position += end - start
+        cuts.append(position)
+    return cuts
@@ -0,0 +1,765 @@
+"""Resident SadTalker inference server.
+
+The server process imports torch and loads the SadTalker, face detector and GFPGAN
+weights once, then serves render requests over a Unix socket using newline-delimited
+JSON. It is started and health-checked by ``InferenceServerSupervisor`` and called
+from the API workers through ``InferenceClient``.
+
+This module only depends on the standard library so it can be executed as a script
+with SadTalker's own interpreter::
+
+    python inference_server.py --socket /tmp/sadtalker.sock --sadtalker-path ./SadTalker
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import select
+import shutil
+import socket
+import socketserver
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceServerUnavailable(Exception):
+    """Raised when the resident inference server cannot be reached"""
+
+
+class InferenceServerError(Exception):
+    """Raised when the resident inference server reports a failed render"""
+
+
+class RenderCancelled(InferenceServerError):
+    """Raised inside the inference server when the client went away mid-render"""
+
+
+def _to_builtin(value):
+    """Convert SadTalker's crop info (tuples of NumPy scalars) into JSON-serialisable values"""
+    if isinstance(value, (list, tuple)):
+        return [_to_builtin(item) for item in value]
+    if hasattr(value, "item"):
+        return value.item()
+    return value
+
+
+# SadTalker's face renderer produces 25 frames per second of audio
+FPS = 25
+
+# x264/AAC settings used when a render request does not carry its own
+DEFAULT_ENCODER = {"preset": "veryfast", "crf": 23, "audio_bitrate": "96k"}
+
+# Face renderer steps run between checks for a disconnected client
+ANIMATE_CHUNK = 25
+
+# How often a render's connection is polled for the client hanging up
+DISCONNECT_POLL_INTERVAL = 0.5
+
+
+class _LazyFrames(list):
+    """Frames produced one at a time for SadTalker's enhancer_generator_no_len.
+
+    That generator insists on a list (anything else is taken for a video path) but
+    only calls len() and reads images[0], images[1], ... in order, so each frame is
+    pulled from the iterator as it is read and never kept.
+    """
+
+    def __init__(self, frames: Iterator, count: int):
+        super().__init__()
+        self._frames = frames
+        self._count = count
+        self._next = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index):
+        if index != self._next:
+            raise IndexError("Frames can only be read once, in order")
+        self._next += 1
+        return next(self._frames)
+
+
+class FrameEncoder:
+    """Encodes raw RGB frames and the driving audio into an MP4 in a single ffmpeg pass.
+
+    Frames are written to ffmpeg's stdin as they are produced, so encoding overlaps
+    with compositing. The process starts with the first frame, once the frame size is
+    known. Output goes to a hidden file next to ``output_path`` and is renamed into
+    place when encoding succeeds, so a partial MP4 is never visible. ``keyframes``
+    forces a keyframe at each of the given times, so the clip can later be cut there
+    without re-encoding.
+    """
+
+    def __init__(
+        self,
+        output_path: str,
+        audio_path: str,
+        preset: str = "veryfast",
+        crf: int = 23,
+        audio_bitrate: str = "96k",
+        fps: int = FPS,
+        keyframes: Optional[List[float]] = None
+    ):
+        self.output_path = output_path
+        self.audio_path = audio_path
+        self.preset = preset
+        self.crf = int(crf)
+        self.audio_bitrate = audio_bitrate
+        self.fps = fps
+        self.keyframes = keyframes or []
+        self.frames = 0
+        self._temp_path = os.path.join(os.path.dirname(output_path), f".{os.path.basename(output_path)}.part")
+        self._process: Optional[subprocess.Popen] = None
+        self._stderr = None
+
+    def _start(self, width: int, height: int):
+        self._stderr = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(
+            [
+                "ffmpeg", "-v", "error", "-y",
+                "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-r", str(self.fps), "-i", "pipe:0",
+                "-i", self.audio_path,
+                "-map", "0:v", "-map", "1:a",
+                # yuv420p needs even dimensions, and paste-back keeps the source image's size
+                "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2",
+                *(["-force_key_frames", ",".join(f"{t:.3f}" for t in self.keyframes)] if self.keyframes else []),
+                "-c:v", "libx264", "-preset", self.preset, "-crf", str(self.crf), "-pix_fmt", "yuv420p",
+                "-c:a", "aac", "-b:a", self.audio_bitrate,
+                "-shortest", "-movflags", "+faststart", "-f", "mp4", self._temp_path
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=self._stderr,
+            bufsize=0
+        )
+
+    def _error(self) -> str:
+        self._stderr.seek(0)
+        return self._stderr.read().decode(errors="replace").strip()
+
+    def write(self, frame):
+        """Append one C-contiguous HxWx3 uint8 RGB frame"""
+        if self._process is None:
+            self._start(frame.shape[1], frame.shape[0])
+        elif self._process.returncode is not None:
+            return
+        try:
+            self._process.stdin.write(frame.data)
+        except BrokenPipeError:
+            # With -shortest, ffmpeg finishes once the audio ends; SadTalker may round up by a frame
+            if self._process.wait() != 0:
+                raise InferenceServerError(f"Encoding failed: {self._error()}")
+            return
+        self.frames += 1
+
+    def close(self):
+        """Wait for the encoder to finish and move the MP4 into place"""
+        if self._process is None:
+            raise InferenceServerError("Encoding failed: no frames were rendered")
+        self._process.stdin.close()
+        if self._process.wait() != 0:
+            raise InferenceServerError(f"Encoding failed: {self._error()}")
+        os.replace(self._temp_path, self.output_path)
+
+    def abort(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        if os.path.exists(self._temp_path):
+            os.remove(self._temp_path)
+
+    def __enter__(self) -> "FrameEncoder":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.close()
+        finally:
+            self.abort()
+            if self._stderr is not None:
+                self._stderr.close()
+
+
+class SadTalkerPipeline:
+    """Keeps SadTalker models resident in memory and renders requests in-process"""
+
+    def __init__(self, sadtalker_path: str, checkpoint_dir: str = "./checkpoints", device: Optional[str] = None):
+        self.sadtalker_path = os.path.abspath(sadtalker_path)
+        self.checkpoint_dir = checkpoint_dir
+        self.device = device
+        self.models: Dict[tuple, Dict[str, Any]] = {}
+        self.model_load_ms: Dict[str, float] = {}
+        self.renders = 0
+
+        # SadTalker resolves its configs and checkpoints relative to its checkout
+        os.chdir(self.sadtalker_path)
+        if self.sadtalker_path not in sys.path:
+            sys.path.insert(0, self.sadtalker_path)
+
+        import torch
+        if self.device is None:
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    def load(self, size: int = 256, preprocess: str = "full", old_version: bool = False) -> Dict[str, Any]:
+        """Load (or reuse) the model set for a render size and preprocess mode"""
+        key = (int(size), preprocess, bool(old_version))
+        if key in self.models:
+            return self.models[key]
+
+        from src.utils.preprocess import CropAndExtract
+        from src.test_audio2coeff import Audio2Coeff
+        from src.facerender.animate import AnimateFromCoeff
+        from src.utils.init_path import init_path
+
+        start_time = time.time()
+        paths = init_path(self.checkpoint_dir, os.path.join(self.sadtalker_path, "src/config"), key[0], key[2], key[1])
+        self.models[key] = {
+            "preprocess": CropAndExtract(paths, self.device),
+            "audio_to_coeff": Audio2Coeff(paths, self.device),
+            "animate": AnimateFromCoeff(paths, self.device),
+        }
+        elapsed = round((time.time() - start_time) * 1000)
+        self.model_load_ms[f"{key[0]}_{key[1]}"] = elapsed
+        logger.info(f"Loaded SadTalker models for size={key[0]} preprocess={key[1]} in {elapsed} ms")
+        return self.models[key]
+
+    def _preprocess(self, models: Dict[str, Any], image_path: str, output_dir: str, preprocess: str, size: int):
+        """Face detection, cropping, landmarks and 3DMM coefficient fitting"""
+        first_coeff_path, crop_pic_path, crop_info = models["preprocess"].generate(
+            image_path, output_dir, preprocess, source_image_flag=True, pic_size=size
+        )
+        if first_coeff_path is None:
+            raise InferenceServerError("Can't get the coeffs of the input image")
+        return first_coeff_path, crop_pic_path, crop_info
+
+    def _cached_preprocess(self, models: Dict[str, Any], image_path: str, avatar_dir: str, preprocess: str, size: int):
+        """Reuse an avatar's preprocessing output, computing and storing it on first use"""
+        meta_path = os.path.join(avatar_dir, "crop_info.json")
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+            return (
+                os.path.join(avatar_dir, meta["first_coeff"]),
+                os.path.join(avatar_dir, meta["crop_pic"]),
+                meta["crop_info"],
+                True
+            )
+
+        # Build in a scratch directory and rename, so a half-written entry is never visible
+        temp_dir = tempfile.mkdtemp(prefix=".preprocess_", dir=os.path.dirname(avatar_dir))
+        try:
+            first_coeff_path, crop_pic_path, crop_info = self._preprocess(models, image_path, temp_dir, preprocess, size)
+            with open(os.path.join(temp_dir, "crop_info.json"), "w") as f:
+                json.dump({
+                    "first_coeff": os.path.basename(first_coeff_path),
+                    "crop_pic": os.path.basename(crop_pic_path),
+                    "crop_info": _to_builtin(crop_info)
+                }, f)
+            os.rename(temp_dir, avatar_dir)
+        except OSError:
+            # Another render stored the same entry first
+            if not os.path.exists(meta_path):
+                raise
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        return self._cached_preprocess(models, image_path, avatar_dir, preprocess, size)[:3] + (False,)
+
+    def _animate(self, models: Dict[str, Any], data: Dict[str, Any], check_cancelled: Callable[[], None]):
+        """Run the face renderer as AnimateFromCoeff.generate does; returns the frames as a uint8 NxHxWx3 array.
+
+        make_animation runs ANIMATE_CHUNK steps at a time, so check_cancelled can stop
+        a render between chunks instead of after the whole clip.
+        """
+        import torch
+        from src.facerender.modules.make_animation import make_animation
+
+        animate = models["animate"]
+        inputs = {
+            key: data[key].type(torch.FloatTensor).to(self.device)
+            for key in ("source_image", "source_semantics", "target_semantics_list", "yaw_c_seq", "pitch_c_seq", "roll_c_seq")
+            if key in data
+        }
+        # Sequences are batch x step; make_animation stacks its steps along dim 1
+        chunks = []
+        for start in range(0, inputs["target_semantics_list"].shape[1], ANIMATE_CHUNK):
+            check_cancelled()
+            window = {
+                key: inputs[key][:, start:start + ANIMATE_CHUNK]
+                for key in ("target_semantics_list", "yaw_c_seq", "pitch_c_seq", "roll_c_seq")
+                if key in inputs
+            }
+            chunks.append(make_animation(
+                inputs["source_image"], inputs["source_semantics"], window["target_semantics_list"],
+                animate.generator, animate.kp_extractor, animate.he_estimator, animate.mapping,
+                window.get("yaw_c_seq"), window.get("pitch_c_seq"), window.get("roll_c_seq"), use_exp=True
+            ))
+        predictions = torch.cat(chunks, dim=1)
+        predictions = predictions.reshape((-1,) + predictions.shape[2:])[:data["frame_num"]]
+        # Converted on the device, then copied to host memory once
+        return (predictions.clamp(0, 1) * 255).round().to(torch.uint8).permute(0, 2, 3, 1).contiguous().cpu().numpy()
+
+    def _composite(self, frames, image_path: str, crop_info, preprocess: str, size: int, enhancer: Optional[str]):
+        """Yield the final RGB frames: resized to the crop, pasted back into the source image and enhanced.
+
+        SadTalker does each of these steps on a video file (writing, muxing and reading
+        it back in between); here the frames stay in memory.
+        """
+        import cv2
+        import numpy as np
+
+        paste_box = None
+        if "full" in preprocess.lower() and len(crop_info) == 3:
+            # Same placement as SadTalker's paste_pic
+            full_image = cv2.cvtColor(cv2.imread(image_path), cv2.COLOR_BGR2RGB)
+            clx, cly, crx, cry = (int(value) for value in crop_info[1])
+            lx, ly, rx, ry = (int(value) for value in crop_info[2])
+            if "ext" in preprocess.lower():
+                paste_box = (clx, cly, crx, cry)
+            else:
+                paste_box = (clx + lx, cly + ly, clx + rx, cly + ry)
+
+        def composited():
+            for frame in frames:
+                if paste_box is not None:
+                    x1, y1, x2, y2 = paste_box
+                    face = cv2.resize(frame, (x2 - x1, y2 - y1))
+                    mask = np.full(face.shape, 255, face.dtype)
+                    yield cv2.seamlessClone(face, full_image, mask, ((x1 + x2) // 2, (y1 + y2) // 2), cv2.NORMAL_CLONE)
+                elif crop_info[0]:
+                    # Keep the crop's aspect ratio
+                    width, height = crop_info[0]
+                    yield cv2.resize(frame, (size, int(size * height / width)))
+                else:
+                    yield frame
+
+        if not enhancer:
+            yield from (np.ascontiguousarray(frame) for frame in composited())
+            return
+
+        from src.utils.face_enhancer import enhancer_generator_no_len
+        # GFPGAN takes and returns RGB frames; each is enhanced and encoded before the next is pasted
+        lazy_frames = _LazyFrames(composited(), len(frames))
+        for frame in enhancer_generator_no_len(lazy_frames, method=enhancer, bg_upsampler=None):
+            yield np.ascontiguousarray(frame)
+
+    def render(
+        self,
+        params: Dict[str, Any],
+        on_progress: Callable[[float, str], None],
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> Dict[str, Any]:
+        """Render one talking-head clip, mirroring SadTalker's inference.py.
+
+        Frames never touch the disk: they are composited in memory and piped into a
+        single encoder together with the driving audio (see ``FrameEncoder``).
+        should_stop is checked between stages, animation chunks and frames; once it
+        returns true the render raises RenderCancelled and the encoder is aborted.
+        """
+        def check_cancelled():
+            if should_stop is not None and should_stop():
+                raise RenderCancelled("Render cancelled: client disconnected")
+
+        from src.generate_batch import get_data
+        from src.generate_facerender_batch import get_facerender_data
+
+        options = params.get("options", {})
+        size = int(options.get("size", 256))
+        preprocess = options.get("preprocess", "full")
+        still = bool(options.get("still", True))
+        timings = {}
+
+        start_time = time.time()
+        was_warm = (size, preprocess, False) in self.models
+        models = self.load(size, preprocess)
+        timings["load_ms"] = round((time.time() - start_time) * 1000)
+
+        output_path = os.path.join(params["result_dir"], f"{params['request_id']}.mp4")
+        # Coefficients and first-frame crops stay on local disk; only the finished MP4 is written to result_dir
+        save_dir = tempfile.mkdtemp(prefix=f"{params['request_id']}_", dir=params.get("scratch_dir") or None)
+        try:
+            check_cancelled()
+            stage_start = time.time()
+            on_progress(0.05, "preprocess")
+            if params.get("avatar_dir"):
+                first_coeff_path, crop_pic_path, crop_info, cached = self._cached_preprocess(
+                    models, params["image_path"], params["avatar_dir"], preprocess, size
+                )
+                timings["preprocess_cached"] = cached
+            else:
+                first_frame_dir = os.path.join(save_dir, "first_frame_dir")
+                os.makedirs(first_frame_dir, exist_ok=True)
+                first_coeff_path, crop_pic_path, crop_info = self._preprocess(
+                    models, params["image_path"], first_frame_dir, preprocess, size
+                )
+            timings["preprocess_ms"] = round((time.time() - stage_start) * 1000)
+
+            check_cancelled()
+            stage_start = time.time()
+            on_progress(0.20, "audio2coeff")
+            batch = get_data(first_coeff_path, params["audio_path"], self.device, None, still=still)
+            coeff_path = models["audio_to_coeff"].generate(batch, save_dir, int(options.get("pose_style", 0)), None)
+            timings["audio2coeff_ms"] = round((time.time() - stage_start) * 1000)
+
+            stage_start = time.time()
+            on_progress(0.30, "render")
+            data = get_facerender_data(
+                coeff_path, crop_pic_path, first_coeff_path, params["audio_path"],
+                int(options.get("batch_size", 1)), None, None, None,
+                expression_scale=float(options.get("expression_scale", 1.0)),
+                still_mode=still, preprocess=preprocess, size=size
+            )
+            frames = self._animate(models, data, check_cancelled)
+            timings["render_ms"] = round((time.time() - stage_start) * 1000)
+
+            encoder_options = {**DEFAULT_ENCODER, **(params.get("encoder") or {})}
+            with FrameEncoder(output_path, params["audio_path"], **encoder_options) as encoder:
+                stage_start = time.time()
+                enhancer = options.get("enhancer") or None
+                on_progress(0.70, "enhance" if enhancer else "composite")
+                for frame in self._composite(frames, params["image_path"], crop_info, preprocess, size, enhancer):
+                    check_cancelled()
+                    encoder.write(frame)
+                timings["composite_ms"] = round((time.time() - stage_start) * 1000)
+
+                # Frames were encoded as they were written; this waits for the tail and the moov atom
+                stage_start = time.time()
+                on_progress(0.95, "encode")
+            timings["encode_ms"] = round((time.time() - stage_start) * 1000)
+        finally:
+            shutil.rmtree(save_dir, ignore_errors=True)
+
+        self.renders += 1
+        timings["total_ms"] = round((time.time() - start_time) * 1000)
+        return {"video_path": output_path, "warm": was_warm, "frames": encoder.frames, "timings": timings}
+
+    def warm_up(self, image_path: Optional[str], audio_path: Optional[str], result_dir: str, options: Dict[str, Any]):
+        """Load the default models and run one throwaway render so CUDA/ONNX kernels are initialised"""
+        self.load(int(options.get("size", 256)), options.get("preprocess", "full"))
+        if not image_path or not audio_path or not os.path.exists(image_path) or not os.path.exists(audio_path):
+            logger.info("Skipping warm-up render: no warm-up image/audio available")
+            return
+
+        start_time = time.time()
+        result = self.render(
+            {"request_id": "warmup", "image_path": image_path, "audio_path": audio_path,
+             "result_dir": result_dir, "options": options},
+            lambda progress, stage: None
+        )
+        os.remove(result["video_path"])
+        logger.info(f"Warm-up render finished in {round((time.time() - start_time) * 1000)} ms")
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def _send(self, message: Dict[str, Any]):
+        self.wfile.write((json.dumps(message) + "\n").encode())
+        self.wfile.flush()
+
+    def _watch_disconnect(self, done: threading.Event, disconnected: threading.Event):
+        """Set disconnected once the client closes the connection, until done is set.
+
+        The client closes the connection to cancel a render (or when it times out), and
+        a progress write might not fail for seconds; peeking at the socket notices the
+        hang-up within DISCONNECT_POLL_INTERVAL so the render lock is released promptly.
+        """
+        while not done.is_set():
+            readable, _, _ = select.select([self.connection], [], [], DISCONNECT_POLL_INTERVAL)
+            if not readable:
+                continue
+            try:
+                if not self.connection.recv(1, socket.MSG_PEEK):
+                    disconnected.set()
+                    return
+            except OSError:
+                disconnected.set()
+                return
+            # The client sent something else; it is read once this render is done
+            done.wait(DISCONNECT_POLL_INTERVAL)
+
+    def handle(self):
+        server = self.server
+        for raw in self.rfile:
+            try:
+                request = json.loads(raw)
+            except ValueError:
+                self._send({"event": "error", "error": "Malformed request"})
+                continue
+
+            op = request.get("op")
+            if op == "ping":
+                self._send({
+                    "event": "pong",
+                    "ready": server.ready.is_set(),
+                    "busy": server.render_lock.locked(),
+                    "uptime": round(time.time() - server.started_at, 1),
+                    "renders": server.pipeline.renders if server.pipeline else 0,
+                    "model_load_ms": server.pipeline.model_load_ms if server.pipeline else {},
+                })
+            elif op == "render":
+                if not server.ready.is_set():
+                    self._send({"event": "error", "error": "Inference server is still warming up"})
+                    continue
+                done, disconnected = threading.Event(), threading.Event()
+                threading.Thread(target=self._watch_disconnect, args=(done, disconnected), daemon=True).start()
+                try:
+                    with server.render_lock:
+                        result = server.pipeline.render(
+                            request["params"],
+                            lambda progress, stage: self._send({"event": "progress", "progress": progress, "stage": stage}),
+                            should_stop=disconnected.is_set
+                        )
+                    self._send({"event": "result", "result": result})
+                except RenderCancelled:
+                    logger.info(f"Render {request['params'].get('request_id')} cancelled: client disconnected")
+                    return
+                except BrokenPipeError:
+                    return
+                except Exception as e:
+                    logger.exception("Render failed")
+                    self._send({"event": "error", "error": str(e)})
+                finally:
+                    done.set()
+            else:
+                self._send({"event": "error", "error": f"Unknown op: {op}"})
+
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Threaded Unix socket server; renders are serialised, health checks are not"""
+    daemon_threads = True
+
+    def __init__(self, socket_path: str):
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        super().__init__(socket_path, _RequestHandler)
+        self.pipeline: Optional[SadTalkerPipeline] = None
+        self.render_lock = threading.Lock()
+        self.ready = threading.Event()
+        self.started_at = time.time()
+
+
+def serve(args):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    os.makedirs(os.path.dirname(os.path.abspath(args.socket)), exist_ok=True)
+    result_dir = os.path.abspath(args.result_dir)
+    server = InferenceServer(args.socket)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    # Health checks answer immediately, while models load in this thread
+    server.pipeline = SadTalkerPipeline(args.sadtalker_path, args.checkpoint_dir, args.device)
+    server.pipeline.warm_up(args.warmup_image, args.warmup_audio, result_dir, json.loads(args.warmup_options))
+    server.ready.set()
+    logger.info(f"SadTalker inference server ready on {args.socket}")
+
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+class InferenceClient:
+    """Async client for the resident inference server, used from the API workers"""
+
+    def __init__(self, socket_path: str, connect_timeout: float = 2.0):
+        self.socket_path = socket_path
+        self.connect_timeout = connect_timeout
+
+    async def _connect(self):
+        try:
+            return await asyncio.wait_for(
+                asyncio.open_unix_connection(self.socket_path, limit=2 ** 20), self.connect_timeout
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            raise InferenceServerUnavailable(f"Inference server unreachable at {self.socket_path}: {e}")
+
+    async def ping(self) -> Dict[str, Any]:
+        reader, writer = await self._connect()
+        try:
+            writer.write(b'{"op": "ping"}\n')
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), self.connect_timeout)
+            if not line:
+                raise InferenceServerUnavailable("Inference server closed the connection")
+            return json.loads(line)
+        finally:
+            writer.close()
+
+    async def render(
+        self,
+        params: Dict[str, Any],
+        on_progress: Optional[Callable[[float, str], Any]] = None
+    ) -> Dict[str, Any]:
+        """Submit a render and stream its progress; cancelling closes the connection"""
+        reader, writer = await self._connect()
+        try:
+            writer.write((json.dumps({"op": "render", "params": params}) + "\n").encode())
+            await writer.drain()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    raise InferenceServerUnavailable("Inference server closed the connection mid-render")
+                message = json.loads(line)
+                event = message.get("event")
+                if event == "progress":
+                    if on_progress is not None:
+                        on_progress(message["progress"], message["stage"])
+                elif event == "result":
+                    return message["result"]
+                elif event == "error":
+                    if "warming up" in message.get("error", ""):
+                        raise InferenceServerUnavailable(message["error"])
+                    raise InferenceServerError(message["error"])
+        finally:
+            writer.close()
+
+
+class InferenceServerSupervisor:
+    """Runs the inference server as a child process and restarts it when it dies or stops answering"""
+
+    def __init__(
+        self,
+        python: str,
+        socket_path: str,
+        sadtalker_path: str,
+        result_dir: str,
+        warmup_image: Optional[str] = None,
+        warmup_audio: Optional[str] = None,
+        warmup_options: Optional[Dict[str, Any]] = None,
+        health_interval: float = 10.0,
+        health_failures: int = 3,
+        startup_grace: float = 60.0,
+    ):
+        self.python = python
+        self.socket_path = socket_path
+        self.sadtalker_path = sadtalker_path
+        self.result_dir = result_dir
+        self.warmup_image = warmup_image
+        self.warmup_audio = warmup_audio
+        self.warmup_options = warmup_options or {}
+        self.health_interval = health_interval
+        self.health_failures = health_failures
+        self.startup_grace = startup_grace
+        self.restarts = 0
+        self._process: Optional[subprocess.Popen] = None
+        self._started_at = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _spawn(self):
+        cmd = [
+            self.python, os.path.abspath(__file__),
+            "--socket", os.path.abspath(self.socket_path),
+            "--sadtalker-path", os.path.abspath(self.sadtalker_path),
+            "--result-dir", os.path.abspath(self.result_dir),
+            "--warmup-options", json.dumps(self.warmup_options),
+        ]
+        if self.warmup_image:
+            cmd += ["--warmup-image", os.path.abspath(self.warmup_image)]
+        if self.warmup_audio:
+            cmd += ["--warmup-audio", os.path.abspath(self.warmup_audio)]
+        self._process = subprocess.Popen(cmd, cwd=self.sadtalker_path)
+        self._started_at = time.time()
+        logger.info(f"Started SadTalker inference server (pid {self._process.pid})")
+
+    def _ping(self) -> bool:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(5)
+                sock.connect(self.socket_path)
+                sock.sendall(b'{"op": "ping"}\n')
+                return sock.makefile().readline().startswith('{"event": "pong"')
+        except OSError:
+            return False
+
+    def _terminate(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+
+    def _run(self):
+        failures = 0
+        backoff = 1.0
+        while not self._stop.is_set():
+            if self._process is None or self._process.poll() is not None:
+                if self._process is not None:
+                    logger.warning(f"Inference server exited with code {self._process.returncode}, restarting in {backoff:.0f}s")
+                    self.restarts += 1
+                    if self._stop.wait(backoff):
+                        break
+                    backoff = min(backoff * 2, 60.0)
+                self._spawn()
+                failures = 0
+
+            if self._stop.wait(self.health_interval):
+                break
+
+            if self._ping():
+                failures = 0
+                backoff = 1.0
+            elif time.time() - self._started_at > self.startup_grace:
+                failures += 1
+                if failures >= self.health_failures:
+                    logger.warning("Inference server failed health checks, restarting")
+                    self._terminate()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sadtalker-supervisor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.health_interval + 1)
+        self._terminate()
+
+
+def build_supervisor(config) -> InferenceServerSupervisor:
+    """Create a supervisor from the application ``Config``"""
+    # Imported here: this module also runs standalone under SadTalker's interpreter
+    from com.mhire.app.services.video_service.quality import QUALITY_PROFILES
+
+    return InferenceServerSupervisor(
+        python=config.sadtalker_python,
+        socket_path=config.sadtalker_server_socket,
+        sadtalker_path=config.sadtalker_path,
+        result_dir=config.video_assets_path,
+        warmup_image=config.sadtalker_warmup_image,
+        warmup_audio=config.sadtalker_warmup_audio,
+        warmup_options=QUALITY_PROFILES.get(config.render_default_quality),
+        health_interval=config.sadtalker_health_interval,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resident SadTalker inference server")
+    parser.add_argument("--socket", required=True)
+    parser.add_argument("--sadtalker-path", required=True)
+    parser.add_argument("--result-dir", required=True)
+    parser.add_argument("--checkpoint-dir", default="./checkpoints")
+    parser.add_argument("--device", default=None)
+    parser.add_argument("--warmup-image", default=None)
+    parser.add_argument("--warmup-audio", default=None)
+    parser.add_argument("--warmup-options", default="{}")
+    serve(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
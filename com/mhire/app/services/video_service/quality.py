@@ -0,0 +1,94 @@
+import time
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+# SadTalker render settings per quality tier, cheapest first
+QUALITY_PROFILES = {
+    "realtime": {
+        "enhancer": None,          # Skip the GFPGAN pass, which dominates CPU render time
+        "pose_style": 0,
+        "batch_size": 4,
+        "size": 256,
+        "expression_scale": 1.0,
+        "still": True,
+        "preprocess": "crop"       # Render the face crop only, no paste-back
+    },
+    "balanced": {
+        "enhancer": None,
+        "pose_style": 0,
+        "batch_size": 2,
+        "size": 256,
+        "expression_scale": 1.0,
+        "still": True,
+        "preprocess": "full"
+    },
+    "high": {
+        "enhancer": "gfpgan",      # Optional face enhancer
+        "pose_style": 0,           # Pose style (0 for still)
+        "batch_size": 1,
+        "size": 256,               # Size of the generated video
+        "expression_scale": 1.0,   # Expression intensity
+        "still": True,             # Keep the face still
+        "preprocess": "full"       # Full face detection
+    },
+}
+QUALITY_TIERS = list(QUALITY_PROFILES)
+
+
+class QualityPolicy:
+    """Chooses the render tier for a job, stepping down under load.
+
+    One tier is dropped when this worker's queue depth reaches ``queue_threshold`` and
+    another at twice that; one more is dropped when renders finished within the last
+    ``latency_window`` seconds took ``latency_threshold`` seconds on average. Samples
+    age out of the window, so full quality returns once the pressure is gone.
+    """
+
+    def __init__(self, default_tier: str, queue_threshold: int, latency_threshold: float, latency_window: float):
+        if default_tier not in QUALITY_PROFILES:
+            raise ValueError(f"Unknown quality tier: {default_tier}")
+        self.default_tier = default_tier
+        self.queue_threshold = queue_threshold
+        self.latency_threshold = latency_threshold
+        self.latency_window = latency_window
+        self._durations = deque(maxlen=256)
+
+    def record(self, tier: str, duration: float):
+        self._durations.append((time.time(), tier, duration))
+
+    def recent_latency(self) -> Optional[float]:
+        """Mean render time over the window, or None without recent renders"""
+        cutoff = time.time() - self.latency_window
+        recent = [duration for finished_at, _, duration in self._durations if finished_at >= cutoff]
+        return sum(recent) / len(recent) if recent else None
+
+    def choose(self, requested: Optional[str], queue_depth: int, adaptive: bool = True) -> Tuple[str, Optional[str]]:
+        """Return (tier, reason it was degraded or None)"""
+        tier = requested or self.default_tier
+        if tier not in QUALITY_PROFILES:
+            raise ValueError(f"Unknown quality tier: {tier}. Choose one of {', '.join(QUALITY_TIERS)}")
+        if not adaptive:
+            return tier, None
+
+        steps, reasons = 0, []
+        if self.queue_threshold > 0 and queue_depth >= self.queue_threshold:
+            steps += 2 if queue_depth >= 2 * self.queue_threshold else 1
+            reasons.append(f"queue depth {queue_depth}")
+        latency = self.recent_latency()
+        if self.latency_threshold > 0 and latency is not None and latency >= self.latency_threshold:
+            steps += 1
+            reasons.append(f"recent render time {latency:.1f}s")
+
+        chosen = QUALITY_TIERS[max(0, QUALITY_TIERS.index(tier) - steps)]
+        if chosen == tier:
+            return tier, None
+        return chosen, ", ".join(reasons)
+
+    def stats(self) -> Dict[str, Any]:
+        latency = self.recent_latency()
+        return {
+            "default_tier": self.default_tier,
+            "queue_threshold": self.queue_threshold,
+            "latency_threshold": self.latency_threshold,
+            "recent_latency": round(latency, 2) if latency is not None else None,
+        }
@@ -0,0 +1,364 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+
+from com.mhire.app.common.utility import generate_request_id
+from com.mhire.app.services.video_service.artifact_store import LocalArtifactStore
+from com.mhire.app.services.video_service.render_queue import JobStatus
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    params TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, priority, created_at);
+CREATE TABLE IF NOT EXISTS workers (
+    worker_id TEXT PRIMARY KEY,
+    last_seen REAL NOT NULL
+);
+"""
+
+STATE_COLUMNS = (
+    "job_id, status, stage, progress, priority, result, error, worker, attempts, "
+    "cancel_requested, created_at, started_at, finished_at"
+)
+
+# Finished jobs are pruned from the broker on every this many submissions
+PRUNE_EVERY = 100
+
+
+def input_prefix(job_id: str) -> str:
+    """Artifact store prefix holding a job's uploaded inputs"""
+    return f"inputs/{os.path.basename(job_id)}"
+
+
+def avatar_key(avatar_id: str) -> str:
+    return f"inputs/avatars/{os.path.basename(avatar_id)}.png"
+
+
+class SqliteRenderBroker:
+    """Render job queue in a SQLite file shared by API nodes and render workers.
+
+    API nodes enqueue jobs; render workers claim the highest-priority queued job
+    under a lease, renew the lease with progress heartbeats and report the outcome.
+    A job whose lease runs out (its worker died) goes back to the queue until it
+    has been attempted ``max_attempts`` times. SQLite suits one host or a test
+    setup; a network broker only has to provide the same methods.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 2, retention: float = 86400.0):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self._local = threading.local()
+        self._enqueued = 0
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _state(self, row: Optional[Tuple]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        state = dict(zip([column.strip() for column in STATE_COLUMNS.split(",")], row))
+        state["progress"] = round(state["progress"], 3)
+        state["result"] = json.loads(state["result"]) if state["result"] else None
+        state["cancel_requested"] = bool(state["cancel_requested"])
+        return state
+
+    def enqueue(self, job_id: str, params: Dict[str, Any], priority: int = 0) -> Dict[str, Any]:
+        connection = self._connect()
+        connection.execute(
+            "INSERT INTO jobs (job_id, params, priority, status, stage, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (job_id, json.dumps(params), priority, JobStatus.QUEUED, "queued", time.time())
+        )
+        self._enqueued += 1
+        if self._enqueued % PRUNE_EVERY == 0:
+            connection.execute(
+                f"DELETE FROM jobs WHERE status IN ({','.join('?' * len(JobStatus.FINISHED))}) AND finished_at < ?",
+                (*JobStatus.FINISHED, time.time() - self.retention)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(f"SELECT {STATE_COLUMNS} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._state(row)
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancel a queued job outright, or ask the worker rendering it to stop"""
+        connection = self._connect()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "UPDATE jobs SET status = ?, stage = ?, error = ?, finished_at = ? WHERE job_id = ? AND status = ?",
+                (JobStatus.CANCELLED, JobStatus.CANCELLED, "Cancelled before start", now, job_id, JobStatus.QUEUED)
+            )
+            connection.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = ?",
+                (job_id, JobStatus.RUNNING)
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return self.get(job_id)
+
+    def claim(self, worker_id: str, lease: float) -> Optional[Tuple[str, Dict[str, Any], int]]:
+        """Take the next queued job for a worker; returns (job_id, params, priority) or None"""
+        connection = self._connect()
+        now = time.time()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "INSERT INTO workers (worker_id, last_seen) VALUES (?, ?) "
+                "ON CONFLICT(worker_id) DO UPDATE SET last_seen = excluded.last_seen",
+                (worker_id, now)
+            )
+            self._expire_leases(connection, now)
+            row = connection.execute(
+                "SELECT job_id, params, priority FROM jobs WHERE status = ? ORDER BY priority DESC, created_at LIMIT 1",
+                (JobStatus.QUEUED,)
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, stage = ?, worker = ?, lease_expires = ?, "
+                    "attempts = attempts + 1, started_at = ? WHERE job_id = ?",
+                    (JobStatus.RUNNING, "starting", worker_id, now + lease, now, row[0])
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2]
+
+    def _expire_leases(self, connection: sqlite3.Connection, now: float):
+        """Settle running jobs whose worker stopped renewing its lease"""
+        expired = "status = ? AND lease_expires < ?"
+        connection.execute(
+            f"UPDATE jobs SET status = ?, stage = ?, error = ?, finished_at = ? WHERE {expired} AND cancel_requested = 1",
+            (JobStatus.CANCELLED, JobStatus.CANCELLED, "Cancelled while rendering", now, JobStatus.RUNNING, now)
+        )
+        connection.execute(
+            f"UPDATE jobs SET status = ?, stage = ?, error = ?, finished_at = ? WHERE {expired} AND attempts >= ?",
+            (JobStatus.FAILED, JobStatus.FAILED, "Render worker lost", now, JobStatus.RUNNING, now, self.max_attempts)
+        )
+        requeued = connection.execute(
+            f"UPDATE jobs SET status = ?, stage = ?, progress = 0, worker = NULL, lease_expires = NULL WHERE {expired}",
+            (JobStatus.QUEUED, "queued", JobStatus.RUNNING, now)
+        ).rowcount
+        if requeued:
+            logger.warning(f"Requeued {requeued} render job(s) from lost workers")
+
+    def heartbeat(self, job_id: str, worker_id: str, progress: float, stage: str, lease: float) -> Optional[bool]:
+        """Renew a claimed job's lease and record progress.
+
+        Returns whether cancellation was requested, or None once the worker no
+        longer holds the job (its lease expired and the job moved on).
+        """
+        connection = self._connect()
+        updated = connection.execute(
+            "UPDATE jobs SET progress = ?, stage = ?, lease_expires = ? WHERE job_id = ? AND worker = ? AND status = ?",
+            (progress, stage, time.time() + lease, job_id, worker_id, JobStatus.RUNNING)
+        ).rowcount
+        if not updated:
+            return None
+        (cancel_requested,) = connection.execute(
+            "SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return bool(cancel_requested)
+
+    def finish(
+        self,
+        job_id: str,
+        worker_id: str,
+        status: str,
+        result: Optional[Dict[str, Any]] = None,
+        error: Optional[str] = None
+    ) -> bool:
+        """Record a claimed job's outcome; False if the worker had already lost it"""
+        return bool(self._connect().execute(
+            "UPDATE jobs SET status = ?, stage = ?, progress = CASE WHEN ? = ? THEN 1 ELSE progress END, "
+            "result = ?, error = ?, lease_expires = NULL, finished_at = ? "
+            "WHERE job_id = ? AND worker = ? AND status = ?",
+            (
+                status, status, status, JobStatus.COMPLETED,
+                json.dumps(result) if result is not None else None, error, time.time(),
+                job_id, worker_id, JobStatus.RUNNING
+            )
+        ).rowcount)
+
+    def release(self, job_id: str, worker_id: str):
+        """Hand a claimed job back to the queue, e.g. when its worker shuts down"""
+        self._connect().execute(
+            "UPDATE jobs SET status = ?, stage = ?, progress = 0, worker = NULL, lease_expires = NULL, "
+            "attempts = attempts - 1 WHERE job_id = ? AND worker = ? AND status = ?",
+            (JobStatus.QUEUED, "queued", job_id, worker_id, JobStatus.RUNNING)
+        )
+
+    def summary(self, worker_timeout: float) -> Dict[str, Any]:
+        """Job counts by status and the workers seen within worker_timeout seconds"""
+        connection = self._connect()
+        counts = dict(connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        running = dict(connection.execute(
+            "SELECT worker, COUNT(*) FROM jobs WHERE status = ? GROUP BY worker", (JobStatus.RUNNING,)
+        ).fetchall())
+        workers = [
+            {"worker_id": worker_id, "last_seen": last_seen, "running": running.get(worker_id, 0)}
+            for worker_id, last_seen in connection.execute(
+                "SELECT worker_id, last_seen FROM workers WHERE last_seen > ? ORDER BY worker_id",
+                (time.time() - worker_timeout,)
+            )
+        ]
+        return {"jobs": counts, "workers": workers}
+
+
+class RemoteRenderQueue:
+    """Render queue whose jobs are rendered by render worker nodes.
+
+    It offers the calls VideoService makes on RenderQueue (``submit``, ``get``,
+    ``cancel``, ``wait``, ``stats``, ``queue_depth``) on top of a broker. Inputs are
+    copied to the artifact store on submit, and results are read back from it, so
+    API nodes and workers share nothing but the broker and the store. Queue depth
+    comes from a summary refreshed in the background.
+    """
+
+    def __init__(
+        self,
+        broker: SqliteRenderBroker,
+        store: LocalArtifactStore,
+        max_queue_size: int = 32,
+        poll_interval: float = 0.5,
+        worker_timeout: float = 30.0,
+    ):
+        self.broker = broker
+        self.store = store
+        self.max_queue_size = max_queue_size
+        self.poll_interval = poll_interval
+        self.worker_timeout = worker_timeout
+        self._summary: Dict[str, Any] = {"jobs": {}, "workers": []}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh())
+            logger.info(f"Dispatching renders through {self.broker.path}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _refresh(self):
+        while True:
+            try:
+                self._summary = await asyncio.to_thread(self.broker.summary, self.worker_timeout)
+            except Exception:
+                logger.exception("Failed to read the render broker summary")
+            await asyncio.sleep(self.poll_interval)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._summary["jobs"].get(JobStatus.QUEUED, 0)
+
+    @property
+    def running(self) -> int:
+        return self._summary["jobs"].get(JobStatus.RUNNING, 0)
+
+    async def submit(self, params: Dict[str, Any], priority: int = 0, job_id: Optional[str] = None) -> Dict[str, Any]:
+        """Upload the job's inputs and enqueue it; higher priority values run first"""
+        if self.queue_depth >= self.max_queue_size:
+            raise HTTPException(status_code=503, detail="Render queue is full, try again later")
+        job_id = job_id or generate_request_id()
+        state = await asyncio.to_thread(self._submit, job_id, params, priority)
+        # Count it before the next refresh, so a burst cannot overshoot the limit
+        self._summary["jobs"][JobStatus.QUEUED] = self.queue_depth + 1
+        return state
+
+    def _submit(self, job_id: str, params: Dict[str, Any], priority: int) -> Dict[str, Any]:
+        params = dict(params)
+        audio_path = params.pop("audio_path")
+        image_path = params.pop("image_path")
+        params["audio_key"] = f"{input_prefix(job_id)}/audio{os.path.splitext(audio_path)[1]}"
+        params["image_key"] = avatar_key(params["avatar_id"])
+        try:
+            self.store.put(audio_path, params["audio_key"])
+            if not self.store.exists(params["image_key"]):
+                self.store.put(image_path, params["image_key"])
+            return self.broker.enqueue(job_id, params, priority)
+        except BaseException:
+            self.store.delete(input_prefix(job_id))
+            raise
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        """Job state from the broker, with the result path as seen from this node"""
+        state = self.broker.get(job_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+        result = state["result"]
+        if result is not None and "video_key" in result:
+            result["video_path"] = self.store.path(result["video_key"])
+            for clip in result.get("clips", []):
+                clip["video_path"] = self.store.path(clip["video_key"])
+        return state
+
+    async def cancel(self, job_id: str) -> Dict[str, Any]:
+        """Cancel a queued job, or signal the worker rendering it"""
+        state = await asyncio.to_thread(self.broker.cancel, job_id)
+        if state is None:
+            raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+        if state["status"] == JobStatus.CANCELLED and state["started_at"] is None:
+            # No worker will pick it up, so its inputs are ours to remove
+            await asyncio.to_thread(self.store.delete, input_prefix(job_id))
+        return state
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Poll the broker until a job finishes"""
+        async def poll() -> Dict[str, Any]:
+            while True:
+                state = await asyncio.to_thread(self.get, job_id)
+                if state["status"] in JobStatus.FINISHED:
+                    return state
+                await asyncio.sleep(self.poll_interval)
+        return await asyncio.wait_for(poll(), timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "dispatch": "remote",
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "max_queue_size": self.max_queue_size,
+            **self._summary,
+        }
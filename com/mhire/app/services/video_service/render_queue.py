@@ -0,0 +1,477 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from com.mhire.app.common.utility import generate_request_id
+from com.mhire.app.common.admission import SlotPool
+
+logger = logging.getLogger(__name__)
+
+# How often waiters re-read the state of a job owned by another worker
+STATE_POLL_INTERVAL = 0.5
+# How often the owner looks for cancel markers left by other workers
+CANCEL_POLL_INTERVAL = 1.0
+
+# Owners refresh the state of their unfinished jobs this often; a job whose state has
+# not been refreshed for LOST_AFTER seconds belongs to a worker that died
+HEARTBEAT_INTERVAL = 15.0
+LOST_AFTER = 60.0
+
+# State files of finished jobs no worker holds any more are deleted after this long
+FINISHED_STATE_TTL = 24 * 3600
+
+
+class JobStatus:
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+class RenderJob:
+    """A single SadTalker render request and its lifecycle state"""
+
+    def __init__(self, job_id: str, params: Dict[str, Any], priority: int = 0):
+        self.job_id = job_id
+        self.params = params
+        self.priority = priority
+        self.status = JobStatus.QUEUED
+        self.progress = 0.0
+        self.stage = "queued"
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_requested = False
+        self.done = asyncio.Event()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 3),
+            "priority": self.priority,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class RenderQueue:
+    """Bounded priority queue drained by a fixed pool of async render workers.
+
+    Job state is mirrored to ``<state_dir>/<job_id>.json`` so any gunicorn worker can
+    answer status requests, and cancellation of a job owned by another worker is
+    signalled through a ``<job_id>.cancel`` marker that the owner polls off the event
+    loop, flagging the job for is_cancel_requested. Each state names its owner (host
+    and pid) and carries a heartbeat; unfinished jobs of a dead owner are reported, and
+    on start rewritten, as failed. With a slot pool, a job only starts once it holds a
+    slot, which caps renders across workers.
+    State files are written by one background task off the event loop; updates that
+    arrive while a write is in progress are coalesced into the next one.
+    """
+
+    def __init__(
+        self,
+        render_func: Callable[[RenderJob], Awaitable[Dict[str, Any]]],
+        state_dir: str,
+        max_workers: int = 1,
+        max_queue_size: int = 32,
+        job_timeout: float = 600.0,
+        max_finished_jobs: int = 500,
+        slots: Optional[SlotPool] = None,
+    ):
+        self.render_func = render_func
+        self.state_dir = state_dir
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self.job_timeout = job_timeout
+        self.max_finished_jobs = max_finished_jobs
+        self.slots = slots
+
+        self.jobs: Dict[str, RenderJob] = {}
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._workers = []
+        self._running_tasks: Dict[str, asyncio.Task] = {}
+        self._sequence = itertools.count()
+        self._dirty: Dict[str, Dict[str, Any]] = {}
+        # Pruned jobs whose state and cancel files the writer still has to delete
+        self._expired: List[str] = []
+        self._writer: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._cancel_watch: Optional[asyncio.Task] = None
+        # Owner is set again in start(): a preloading gunicorn master builds the queue before forking
+        self.host = socket.gethostname()
+        self.owner = f"{self.host}:{os.getpid()}"
+
+        os.makedirs(self.state_dir, exist_ok=True)
+
+    async def start(self):
+        """Spawn the render workers; called from the app lifespan"""
+        if self._workers:
+            return
+        self.owner = f"{self.host}:{os.getpid()}"
+        await asyncio.to_thread(self._recover_states)
+        self._queue = asyncio.PriorityQueue()
+        self._workers = [
+            asyncio.create_task(self._worker(index)) for index in range(self.max_workers)
+        ]
+        self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+        self._cancel_watch = asyncio.create_task(self._cancel_watch_loop())
+        logger.info(f"Started render queue with {self.max_workers} worker(s)")
+
+    async def stop(self):
+        """Cancel running renders and stop the workers"""
+        self._stopping = True
+        for task in (self._heartbeat, self._cancel_watch):
+            if task is not None:
+                task.cancel()
+        for job_id in list(self._running_tasks):
+            self._cancel_local(self.jobs[job_id])
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        if self._writer is not None:
+            await self._writer
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for job in self.jobs.values() if job.status == JobStatus.QUEUED)
+
+    @property
+    def running(self) -> int:
+        return len(self._running_tasks)
+
+    def submit(self, params: Dict[str, Any], priority: int = 0, job_id: Optional[str] = None) -> RenderJob:
+        """Enqueue a render; higher priority values run first"""
+        if self._queue is None:
+            raise HTTPException(status_code=503, detail="Render queue is not running")
+        if self.queue_depth >= self.max_queue_size:
+            raise HTTPException(status_code=503, detail="Render queue is full, try again later")
+
+        job = RenderJob(job_id or generate_request_id(), params, priority)
+        self.jobs[job.job_id] = job
+        self._persist(job)
+        self._queue.put_nowait((-priority, next(self._sequence), job.job_id))
+        return job
+
+    def get(self, job_id: str) -> Dict[str, Any]:
+        """Job state from this worker, or from the shared state directory"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.to_dict()
+
+        state_path = self._state_path(job_id)
+        try:
+            with open(state_path, "r") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+        return self._as_lost(state) if self._is_lost(state, time.time()) else state
+
+    async def cancel(self, job_id: str) -> Dict[str, Any]:
+        """Cancel a queued or running job"""
+        job = self.jobs.get(job_id)
+        if job is None:
+            return await asyncio.to_thread(self._cancel_remote, job_id)
+        return self._cancel_local(job)
+
+    def _cancel_remote(self, job_id: str) -> Dict[str, Any]:
+        state = self.get(job_id)
+        if state["status"] not in JobStatus.FINISHED:
+            # Owned by another worker: leave a marker for it to pick up
+            with open(self._cancel_path(job_id), "w") as f:
+                f.write(str(time.time()))
+            state["cancel_requested"] = True
+        return state
+
+    def _cancel_local(self, job: RenderJob) -> Dict[str, Any]:
+        if job.status in JobStatus.FINISHED:
+            return job.to_dict()
+
+        job.cancel_requested = True
+        task = self._running_tasks.get(job.job_id)
+        if task is not None:
+            task.cancel()
+        else:
+            self._finish(job, JobStatus.CANCELLED, error="Cancelled before start")
+        return job.to_dict()
+
+    async def wait(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Wait for a job to finish; jobs owned by other workers are polled through their state files"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            await asyncio.wait_for(job.done.wait(), timeout)
+            return job.to_dict()
+
+        async def poll() -> Dict[str, Any]:
+            while True:
+                state = await asyncio.to_thread(self.get, job_id)
+                if state["status"] in JobStatus.FINISHED:
+                    return state
+                await asyncio.sleep(STATE_POLL_INTERVAL)
+        return await asyncio.wait_for(poll(), timeout)
+
+    def update_progress(self, job: RenderJob, progress: float, stage: Optional[str] = None):
+        """Record render progress reported by the render function"""
+        if job.status in JobStatus.FINISHED:
+            return
+        progress = max(job.progress, min(progress, 1.0))
+        if stage is not None:
+            job.stage = stage
+        if progress - job.progress >= 0.01 or stage is not None:
+            job.progress = progress
+            self._persist(job)
+
+    def is_cancel_requested(self, job: RenderJob) -> bool:
+        # Never touches the disk: markers from other workers are picked up by _cancel_watch_loop
+        return job.cancel_requested
+
+    def stats(self) -> Dict[str, Any]:
+        counts = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        stats = {
+            "workers": self.max_workers,
+            "running": self.running,
+            "queue_depth": self.queue_depth,
+            "max_queue_size": self.max_queue_size,
+            "jobs": counts,
+        }
+        if self.slots is not None:
+            stats["render_slots"] = {"size": self.slots.size, "in_use": self.slots.in_use()}
+        return stats
+
+    async def _worker(self, index: int):
+        while True:
+            _, _, job_id = await self._queue.get()
+            job = self.jobs.get(job_id)
+            try:
+                if job is None or job.status != JobStatus.QUEUED:
+                    continue
+                if self.is_cancel_requested(job):
+                    self._finish(job, JobStatus.CANCELLED, error="Cancelled before start")
+                    continue
+                if self.slots is None:
+                    await self._run(job)
+                    continue
+
+                job.stage = "waiting_for_slot"
+                self._persist(job)
+                slot = await self.slots.acquire(should_stop=lambda: self.is_cancel_requested(job))
+                if slot is None:
+                    self._finish(job, JobStatus.CANCELLED, error="Cancelled before start")
+                    continue
+                try:
+                    await self._run(job)
+                finally:
+                    self.slots.release(slot)
+            except asyncio.CancelledError:
+                # Only a stopping queue takes the worker down; a cancellation that
+                # escaped from a single job must not leave the queue without workers
+                if self._stopping:
+                    raise
+                logger.warning(f"Render worker {index} caught a stray cancellation for job {job_id}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: RenderJob):
+        job.status = JobStatus.RUNNING
+        job.stage = "starting"
+        job.started_at = time.time()
+        self._persist(job)
+
+        task = asyncio.create_task(self.render_func(job))
+        self._running_tasks[job.job_id] = task
+        try:
+            result = await asyncio.wait_for(task, self.job_timeout)
+            self._finish(job, JobStatus.COMPLETED, result=result)
+        except asyncio.CancelledError:
+            if job.cancel_requested:
+                self._finish(job, JobStatus.CANCELLED, error="Cancelled while rendering")
+            elif self._stopping:
+                # The worker itself is shutting down
+                self._finish(job, JobStatus.FAILED, error="Render worker stopped")
+                raise
+            else:
+                # Something this job depended on was cancelled without the job being cancelled
+                self._finish(job, JobStatus.FAILED, error="Render was interrupted")
+        except asyncio.TimeoutError:
+            self._finish(job, JobStatus.FAILED, error=f"Render timed out after {self.job_timeout}s")
+        except HTTPException as e:
+            self._finish(job, JobStatus.FAILED, error=str(e.detail))
+        except Exception as e:
+            logger.exception(f"Render job {job.job_id} failed")
+            self._finish(job, JobStatus.FAILED, error=str(e))
+        finally:
+            self._running_tasks.pop(job.job_id, None)
+
+    def _finish(self, job: RenderJob, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        job.status = status
+        job.stage = status
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        if status == JobStatus.COMPLETED:
+            job.progress = 1.0
+        self._persist(job)
+        job.done.set()
+        self._prune()
+
+    def _prune(self):
+        """Forget the oldest finished jobs, and delete their files, so the table and state_dir stay bounded"""
+        finished = [job for job in self.jobs.values() if job.status in JobStatus.FINISHED]
+        if len(finished) <= self.max_finished_jobs:
+            return
+        finished.sort(key=lambda job: job.finished_at or 0)
+        for job in finished[:len(finished) - self.max_finished_jobs]:
+            self.jobs.pop(job.job_id, None)
+            # A write still queued for it would only recreate the file
+            self._dirty.pop(job.job_id, None)
+            self._expired.append(job.job_id)
+        self._wake_writer()
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            for job in list(self.jobs.values()):
+                if job.status not in JobStatus.FINISHED:
+                    self._persist(job)
+
+    async def _cancel_watch_loop(self):
+        while True:
+            await asyncio.sleep(CANCEL_POLL_INTERVAL)
+            job_ids = [
+                job.job_id for job in self.jobs.values()
+                if job.status not in JobStatus.FINISHED and not job.cancel_requested
+            ]
+            if not job_ids:
+                continue
+            for job_id in await asyncio.to_thread(self._marked_for_cancel, job_ids):
+                job = self.jobs.get(job_id)
+                if job is not None:
+                    job.cancel_requested = True
+
+    def _marked_for_cancel(self, job_ids: List[str]) -> List[str]:
+        # The state directory may be on a network filesystem, so this runs in a thread
+        return [job_id for job_id in job_ids if os.path.exists(self._cancel_path(job_id))]
+
+    def _is_lost(self, state: Dict[str, Any], now: float) -> bool:
+        """Whether an unfinished job's owner is gone: a dead pid on this host, or no heartbeat for LOST_AFTER"""
+        if state["status"] in JobStatus.FINISHED:
+            return False
+        host, _, pid = (state.get("owner") or "").rpartition(":")
+        if host == self.host and pid.isdigit() and not _pid_alive(int(pid)):
+            return True
+        return now - (state.get("heartbeat_at") or state["created_at"]) > LOST_AFTER
+
+    def _as_lost(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **state,
+            "status": JobStatus.FAILED,
+            "stage": JobStatus.FAILED,
+            "error": "Render worker lost",
+            "finished_at": state.get("heartbeat_at") or state["created_at"],
+        }
+
+    def _recover_states(self):
+        """Fail the unfinished jobs of dead workers on disk and drop long-finished orphans"""
+        now = time.time()
+        lost = []
+        for entry in os.scandir(self.state_dir):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path) as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not isinstance(state, dict) or "status" not in state:
+                continue
+            if self._is_lost(state, now):
+                lost.append(self._as_lost(state))
+            elif state["status"] in JobStatus.FINISHED and now - (state.get("finished_at") or now) > FINISHED_STATE_TTL:
+                self._write_states([], [state["job_id"]])
+        if lost:
+            self._write_states(lost, [])
+            logger.warning(f"Marked {len(lost)} render job(s) of lost workers as failed")
+
+    def _state_path(self, job_id: str) -> str:
+        return os.path.join(self.state_dir, f"{os.path.basename(job_id)}.json")
+
+    def _cancel_path(self, job_id: str) -> str:
+        return os.path.join(self.state_dir, f"{os.path.basename(job_id)}.cancel")
+
+    def _persist(self, job: RenderJob):
+        """Queue a snapshot of the job's state for the background writer"""
+        self._dirty[job.job_id] = {**job.to_dict(), "owner": self.owner, "heartbeat_at": time.time()}
+        self._wake_writer()
+
+    def _wake_writer(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write_states(*self._take_dirty())
+            return
+        if self._writer is None or self._writer.done():
+            self._writer = loop.create_task(self._write_dirty())
+
+    def _take_dirty(self) -> Tuple[List[Dict[str, Any]], List[str]]:
+        batch, expired = list(self._dirty.values()), self._expired
+        self._dirty.clear()
+        self._expired = []
+        return batch, expired
+
+    async def _write_dirty(self):
+        while self._dirty or self._expired:
+            await asyncio.to_thread(self._write_states, *self._take_dirty())
+
+    def _write_states(self, states: List[Dict[str, Any]], expired: List[str]):
+        for state in states:
+            job_id = state["job_id"]
+            state_path = self._state_path(job_id)
+            temp_path = f"{state_path}.tmp"
+            try:
+                with open(temp_path, "w") as f:
+                    json.dump(state, f)
+                os.replace(temp_path, state_path)
+            except OSError as e:
+                logger.warning(f"Failed to persist state for job {job_id}: {str(e)}")
+            if state["status"] in JobStatus.FINISHED:
+                try:
+                    os.remove(self._cancel_path(job_id))
+                except FileNotFoundError:
+                    pass
+        # After the writes, so a state written in this batch cannot outlive its job
+        for job_id in expired:
+            for path in (self._state_path(job_id), self._cancel_path(job_id)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -0,0 +1,224 @@
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import socket
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+
+from com.mhire.app.config.config import Config
+from com.mhire.app.common.executors import executors
+from com.mhire.app.common.utility import remove_file
+from com.mhire.app.services.storage_service.storage_service import storage_service
+from com.mhire.app.services.video_service.artifact_store import LocalArtifactStore
+from com.mhire.app.services.video_service.hls import PLAYLIST_NAME
+from com.mhire.app.services.video_service.render_broker import SqliteRenderBroker, input_prefix
+from com.mhire.app.services.video_service.render_queue import JobStatus, RenderJob
+from com.mhire.app.services.video_service.video_service import VideoService, video_service
+
+logger = logging.getLogger(__name__)
+
+# Files of a progressive render that players fetch; everything else in its directory is scratch
+HLS_SUFFIXES = (".m4s", "_init.mp4")
+
+
+class RenderWorker:
+    """Render node: claims jobs from the broker and renders them with the local VideoService.
+
+    Each of ``concurrency`` claim loops takes one job at a time and hands it to the
+    node's own render queue, so the pipeline (inference server, avatar and idle
+    caches, quality tiers) is the same as in single-node mode. While a job runs its
+    progress is sent to the broker as a lease heartbeat; progressive renders publish
+    their playlist and segments to the artifact store on every heartbeat. Results
+    are published to the store before the job is reported as completed.
+    """
+
+    def __init__(
+        self,
+        service: VideoService,
+        broker: SqliteRenderBroker,
+        store: LocalArtifactStore,
+        worker_id: str,
+        concurrency: int = 1,
+        lease: float = 30.0,
+        poll_interval: float = 0.5,
+    ):
+        self.service = service
+        self.broker = broker
+        self.store = store
+        self.worker_id = worker_id
+        self.concurrency = concurrency
+        self.lease = lease
+        self.poll_interval = poll_interval
+        # Renewed well within the lease, and often enough for progress polling
+        self.heartbeat_interval = min(lease / 3, 1.0)
+        self._stopping = asyncio.Event()
+
+    def stop(self):
+        """Stop claiming jobs; jobs in progress are handed back to the queue"""
+        self._stopping.set()
+
+    async def run(self):
+        await self.service.start_rendering()
+        await storage_service.start()
+        logger.info(f"Render worker {self.worker_id} polling {self.broker.path} with {self.concurrency} slot(s)")
+        loops = [asyncio.create_task(self._claim_loop()) for _ in range(self.concurrency)]
+        try:
+            await self._stopping.wait()
+        finally:
+            for loop in loops:
+                loop.cancel()
+            await asyncio.gather(*loops, return_exceptions=True)
+            await storage_service.stop()
+            await self.service.stop()
+
+    async def _claim_loop(self):
+        while True:
+            try:
+                claimed = await asyncio.to_thread(self.broker.claim, self.worker_id, self.lease)
+            except Exception:
+                logger.exception("Failed to claim a render job")
+                claimed = None
+            if claimed is None:
+                await asyncio.sleep(self.poll_interval)
+                continue
+            await self._process(*claimed)
+
+    async def _process(self, job_id: str, params: Dict[str, Any], priority: int):
+        job: Optional[RenderJob] = None
+        try:
+            local_params = await asyncio.to_thread(self._fetch_inputs, job_id, params)
+            job = self.service.render_queue.submit(local_params, priority=priority, job_id=job_id)
+            if not await self._follow(job):
+                logger.warning(f"Lost the lease on render job {job_id}")
+                return
+
+            state = job.to_dict()
+            if state["status"] == JobStatus.COMPLETED:
+                result = await asyncio.to_thread(self._publish, state["result"], params)
+                await asyncio.to_thread(self.broker.finish, job_id, self.worker_id, JobStatus.COMPLETED, result)
+            else:
+                await asyncio.to_thread(
+                    self.broker.finish, job_id, self.worker_id, state["status"], None, state["error"]
+                )
+            await asyncio.to_thread(self.store.delete, input_prefix(job_id))
+        except asyncio.CancelledError:
+            # Shutting down: another worker can take the job over
+            if job is not None:
+                await self.service.render_queue.cancel(job_id)
+            await asyncio.to_thread(self.broker.release, job_id, self.worker_id)
+            raise
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.exception(f"Render job {job_id} failed on {self.worker_id}")
+            await asyncio.to_thread(self.broker.finish, job_id, self.worker_id, JobStatus.FAILED, None, detail)
+            await asyncio.to_thread(self.store.delete, input_prefix(job_id))
+        finally:
+            await asyncio.to_thread(remove_file, self._input_audio_path(job_id, params))
+
+    async def _follow(self, job: RenderJob) -> bool:
+        """Heartbeat a running job until it finishes; False if the lease was lost"""
+        while True:
+            try:
+                await asyncio.wait_for(job.done.wait(), self.heartbeat_interval)
+                return True
+            except asyncio.TimeoutError:
+                pass
+            cancel_requested = await asyncio.to_thread(
+                self.broker.heartbeat, job.job_id, self.worker_id, job.progress, job.stage, self.lease
+            )
+            if cancel_requested is None or cancel_requested:
+                await self.service.render_queue.cancel(job.job_id)
+                if cancel_requested is None:
+                    await job.done.wait()
+                    return False
+            if job.params.get("progressive"):
+                await asyncio.to_thread(self._publish_progressive, job.params["request_id"])
+
+    def _input_audio_path(self, job_id: str, params: Dict[str, Any]) -> str:
+        extension = os.path.splitext(params["audio_key"])[1]
+        return os.path.join(self.service.render_inputs_path, f"{os.path.basename(job_id)}_input{extension}")
+
+    def _fetch_inputs(self, job_id: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy a job's inputs from the store; the avatar lands in this node's avatar cache"""
+        avatar_id = params["avatar_id"]
+        try:
+            image_path = self.service.avatar_cache.source_path(avatar_id)
+        except HTTPException:
+            self.service.avatar_cache.register(self.store.read(params["image_key"]))
+            image_path = self.service.avatar_cache.source_path(avatar_id)
+
+        audio_path = self._input_audio_path(job_id, params)
+        self.store.get(params["audio_key"], audio_path)
+        return dict(params, image_path=image_path, audio_path=audio_path)
+
+    def _publish_progressive(self, request_id: str):
+        output_dir = os.path.join(self.service.video_assets_path, request_id)
+        if os.path.isdir(output_dir):
+            self.store.put_tree(output_dir, request_id, HLS_SUFFIXES, last=(PLAYLIST_NAME,))
+
+    def _publish_video(self, video_path: str) -> str:
+        video_key = os.path.basename(video_path)
+        self.store.put(video_path, video_key)
+        if self.store.path(video_key) != os.path.abspath(video_path):
+            remove_file(video_path)
+        return video_key
+
+    def _publish(self, result: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy a finished render to the store and drop the local copy"""
+        result = dict(result)
+        video_key = self._publish_video(result.pop("video_path"))
+        if "clips" in result:
+            clips = [dict(clip) for clip in result["clips"]]
+            for clip in clips:
+                clip["video_key"] = self._publish_video(clip.pop("video_path"))
+            result["clips"] = clips
+
+        if params.get("progressive"):
+            request_id = params["request_id"]
+            self._publish_progressive(request_id)
+            output_dir = os.path.join(self.service.video_assets_path, request_id)
+            if self.store.path(request_id) != os.path.abspath(output_dir):
+                shutil.rmtree(output_dir, ignore_errors=True)
+
+        result["video_key"] = video_key
+        result["worker"] = self.worker_id
+        return result
+
+
+def build_worker(config: Config, worker_id: Optional[str] = None) -> RenderWorker:
+    return RenderWorker(
+        video_service,
+        SqliteRenderBroker(config.render_broker_path, config.render_worker_max_attempts, config.render_broker_retention),
+        LocalArtifactStore(config.artifact_store_path),
+        worker_id or config.render_worker_id or f"{socket.gethostname()}-{os.getpid()}",
+        concurrency=config.render_workers,
+        lease=config.render_worker_lease,
+        poll_interval=config.render_broker_poll_interval,
+    )
+
+
+async def serve(args):
+    executors.install(asyncio.get_running_loop())
+    worker = build_worker(Config(), args.worker_id)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        executors.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render worker node for the shared render broker")
+    parser.add_argument("--worker-id", default=None)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,86 @@
-from fastapi import APIRouter, UploadFile, File, Form, HTTPException
-from typing import Optional
+from fastapi import APIRouter, Depends, UploadFile, File, Form, Header, HTTPException, Request
+from fastapi.responses import JSONResponse
+from typing import List, Optional
+import asyncio
 import time
 import os
 
 from com.mhire.app.config.config import Config
 from com.mhire.app.services.video_service.video_service import video_service
+from com.mhire.app.services.storage_service.storage_service import storage_service
 from com.mhire.app.common.network_responses import NetworkResponse, HTTPCode
+from com.mhire.app.common.file_streaming import serve_file
+from com.mhire.app.common.telemetry import stage
+from com.mhire.app.common.admission import admission
 
-router = APIRouter(prefix=f"{Config().api_prefix}/video", tags=["video"])
+config = Config()
+router = APIRouter(prefix=f"{config.api_prefix}/video", tags=["video"])
 network_response = NetworkResponse()
 
-@router.post("/generate")
-async def generate_video(image: UploadFile = File(...), audio_path: str = Form(...)):
-    """Generate a talking avatar video using SadTalker"""
+@router.post("/avatars")
+async def register_avatar(image: UploadFile = File(...)):
+    """Upload an avatar image once and refer to it by ID in later renders"""
+    start_time = time.time()
+    
+    try:
+        with stage("tempfile.read"):
+            image_content = await image.read()
+        result = await video_service.register_avatar(image_content)
+        
+        return network_response.success_response(
+            HTTPCode.SUCCESS,
+            result,
+            "video/avatars",
+            start_time
+        )
+    except Exception as e:
+        return network_response.error_response(
+            HTTPCode.INTERNAL_SERVER_ERROR,
+            50000,
+            str(e),
+            "video/avatars",
+            start_time
+        )
+
+@router.post("/generate", dependencies=[Depends(admission.limit("video"))])
+async def generate_video(
+    audio_path: str = Form(...),
+    image: Optional[UploadFile] = File(None),
+    avatar_id: Optional[str] = Form(None),
+    priority: int = Form(0),
+    wait: bool = Form(False),
+    progressive: bool = Form(False),
+    quality: Optional[str] = Form(None),
+    adaptive: bool = Form(True),
+    composite: Optional[bool] = Form(None),
+    dedupe: Optional[bool] = Form(None),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Enqueue a talking avatar render for an uploaded image or a registered avatar_id.
+
+    Retries carrying the same Idempotency-Key header (or, with dedupe, the same audio,
+    avatar and settings) get the original job back instead of a second render.
+    """
     start_time = time.time()
     
     try:
         # Validate audio path
-        if not os.path.exists(audio_path):
+        if not await asyncio.to_thread(os.path.exists, audio_path):
             raise HTTPException(status_code=404, detail=f"Audio file not found: {audio_path}")
         
-        # Read image file content
-        image_content = await image.read()
+        # Read image file content, unless the avatar was registered beforehand
+        image_content = None
+        if image is not None:
+            with stage("tempfile.read"):
+                image_content = await image.read()
         
-        # Call video service to generate talking avatar
-        result = await video_service.generate_talking_avatar(image_content, audio_path)
+        # Call video service to enqueue the talking avatar render
+        result = await video_service.generate_talking_avatar(
+            image_content, audio_path, priority, avatar_id, progressive, quality, adaptive, composite,
+            idempotency_key, dedupe
+        )
+        if wait:
+            result = await video_service.wait_for_job(result["job_id"])
         
         return network_response.success_response(
             HTTPCode.SUCCESS,
@@ -41,19 +97,48 @@ async def generate_video(image: UploadFile = File(...), audio_path: str = Form(.
             start_time
         )
 
-@router.get("/stream/{video_id}")
-async def stream_video(video_id: str):
-    """Stream a generated video by ID"""
+@router.post("/generate/batch", dependencies=[Depends(admission.limit("video"))])
+async def generate_video_batch(
+    texts: Optional[List[str]] = Form(None),
+    audio_paths: Optional[List[str]] = Form(None),
+    voice: Optional[str] = Form("alloy"),
+    image: Optional[UploadFile] = File(None),
+    avatar_id: Optional[str] = Form(None),
+    priority: int = Form(0),
+    wait: bool = Form(False),
+    quality: Optional[str] = Form(None),
+    adaptive: bool = Form(True),
+    dedupe: Optional[bool] = Form(None),
+    idempotency_key: Optional[str] = Header(None)
+):
+    """Enqueue one render for several utterances (repeated texts or audio_paths fields) of one avatar.
+
+    The finished job's result lists a clip per utterance, in order, each streamable
+    from /video/stream/{video_id}.
+    """
     start_time = time.time()
     
     try:
-        # Get video path
-        video_path = video_service.get_video_path(video_id)
+        for audio_path in audio_paths or []:
+            if not await asyncio.to_thread(os.path.exists, audio_path):
+                raise HTTPException(status_code=404, detail=f"Audio file not found: {audio_path}")
+        
+        image_content = None
+        if image is not None:
+            with stage("tempfile.read"):
+                image_content = await image.read()
+        
+        result = await video_service.generate_talking_avatar_batch(
+            image_content, texts, audio_paths, voice, priority, avatar_id, quality, adaptive,
+            idempotency_key, dedupe
+        )
+        if wait:
+            result = await video_service.wait_for_job(result["job_id"])
         
         return network_response.success_response(
             HTTPCode.SUCCESS,
-            {"video_path": video_path},
-            "video/stream",
+            result,
+            "video/generate/batch",
             start_time
         )
     except Exception as e:
@@ -61,6 +146,99 @@ async def stream_video(video_id: str):
             HTTPCode.INTERNAL_SERVER_ERROR,
             50000,
             str(e),
-            "video/stream",
+            "video/generate/batch",
             start_time
-        )
\ No newline at end of file
+        )
+
+@router.api_route("/stream/{video_id}", methods=["GET", "HEAD"])
+async def stream_video(video_id: str, request: Request):
+    """Serve a generated video with Range and conditional GET support"""
+    start_time = time.time()
+    
+    try:
+        # Resolving the ID is where access is decided, also when nginx sends the bytes
+        video_path = await asyncio.to_thread(video_service.get_video_path, video_id)
+        storage_service.touch(video_path)
+        
+        accel_path = None
+        if config.video_stream_mode == "accel":
+            accel_path = f"{config.video_accel_prefix}{os.path.basename(video_path)}"
+        return await serve_file(request, video_path, "video/mp4", accel_path, config.video_stream_chunk_size)
+    except HTTPException as e:
+        return JSONResponse(
+            status_code=e.status_code,
+            headers=e.headers,
+            content=network_response.error_response(
+                e.status_code,
+                e.status_code * 100,
+                str(e.detail),
+                "video/stream",
+                start_time
+            )
+        )
+
+@router.get("/jobs")
+async def render_queue_stats():
+    """Render queue depth and job counts for this worker"""
+    start_time = time.time()
+    
+    return network_response.success_response(
+        HTTPCode.SUCCESS,
+        {**video_service.jobs.stats(), "quality": video_service.quality_policy.stats()},
+        "video/jobs",
+        start_time
+    )
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Get status and progress of a render job"""
+    start_time = time.time()
+    
+    try:
+        return network_response.success_response(
+            HTTPCode.SUCCESS,
+            await asyncio.to_thread(video_service.get_job, job_id),
+            "video/jobs",
+            start_time
+        )
+    except HTTPException as e:
+        return network_response.error_response(
+            e.status_code,
+            e.status_code * 100,
+            str(e.detail),
+            "video/jobs",
+            start_time
+        )
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running render job"""
+    start_time = time.time()
+    
+    try:
+        return network_response.success_response(
+            HTTPCode.SUCCESS,
+            await video_service.cancel_job(job_id),
+            "video/jobs",
+            start_time
+        )
+    except HTTPException as e:
+        return network_response.error_response(
+            e.status_code,
+            e.status_code * 100,
+            str(e.detail),
+            "video/jobs",
+            start_time
+        )
+
+@router.get("/inference/health")
+async def inference_server_health():
+    """Health check of the resident SadTalker inference server"""
+    start_time = time.time()
+    
+    return network_response.success_response(
+        HTTPCode.SUCCESS,
+        await video_service.inference_server_health(),
+        "video/inference/health",
+        start_time
+    )
@@ -1,96 +1,891 @@
 import os
+import re
 import time
-import subprocess
-from typing import Dict, Any, Optional
+import shutil
+import asyncio
+import tempfile
+from collections import deque
+
+import numpy as np
+from typing import Callable, Dict, Any, List, Optional, Tuple
 from fastapi import HTTPException
 
 from com.mhire.app.config.config import Config
-from com.mhire.app.common.utility import generate_request_id
+from com.mhire.app.common.utility import generate_request_id, remove_file
+from com.mhire.app.common.executors import executors
+from com.mhire.app.common.admission import SlotPool
+from com.mhire.app.common.telemetry import StageClock, bind_request_id, observe_stage, stage
+from com.mhire.app.common.audio_utils import TARGET_SAMPLE_RATE, condense, decode_audio, encode_wav, join_clips, split_at_pauses
+from com.mhire.app.services.storage_service.storage_service import storage_service
+from com.mhire.app.services.audio_service.audio_service import audio_service
+from com.mhire.app.services.video_service.render_queue import JobStatus, RenderQueue, RenderJob
+from com.mhire.app.services.video_service.render_broker import RemoteRenderQueue, SqliteRenderBroker
+from com.mhire.app.services.video_service.artifact_store import LocalArtifactStore
+from com.mhire.app.services.video_service.idempotency import IdempotencyIndex, content_key, request_key
+from com.mhire.app.services.video_service.avatar_cache import AvatarCache
+from com.mhire.app.services.video_service.quality import QUALITY_PROFILES, QualityPolicy
+from com.mhire.app.services.video_service.idle_cache import FRAME_RATE, IdleLoopCache, section_cuts
+from com.mhire.app.services.video_service.hls import PLAYLIST_NAME, HlsPlaylist, concat_clips, package_clip, split_clip
+from com.mhire.app.services.video_service.inference_server import (
+    InferenceClient,
+    InferenceServerError,
+    InferenceServerUnavailable,
+    build_supervisor
+)
+
+# SadTalker reports each pipeline stage through a tqdm bar; map them onto overall progress
+SADTALKER_STAGES = [
+    ("landmark Det", "preprocess", 0.00, 0.10),
+    ("3DMM Extraction", "preprocess", 0.10, 0.20),
+    ("audio2exp", "audio2coeff", 0.20, 0.30),
+    ("Face Renderer", "render", 0.30, 0.80),
+    ("Face Enhancer", "enhance", 0.80, 0.95),
+]
+PERCENT_PATTERN = re.compile(r"(\d{1,3})%\|")
+
+VIDEO_ID_PATTERN = re.compile(r"[A-Za-z0-9_-]{1,128}")
+
+# Job state is written in the background (or, with remote dispatch, after the inputs are
+# uploaded), so a job this recent may not be visible yet to a request reusing it
+IDEMPOTENCY_GRACE_SECONDS = 30
+
+# Receives overall progress in [0, 1] and the current stage name
+ProgressCallback = Callable[[float, str], None]
 
 class VideoService:
     def __init__(self):
         self.config = Config()
         self.sadtalker_path = self.config.sadtalker_path
         self.video_assets_path = self.config.video_assets_path
-        
+
         # Create video assets directory if it doesn't exist
         os.makedirs(self.video_assets_path, exist_ok=True)
-        
+        # Audio written for a render lives here until its job finishes; the storage sweep leaves it alone
+        self.render_inputs_path = os.path.abspath(self.config.render_inputs_path)
+        os.makedirs(self.render_inputs_path, exist_ok=True)
+        # SadTalker runs from its own checkout, so the scratch directory must be absolute
+        self.render_scratch_dir = None
+        if self.config.render_scratch_dir:
+            self.render_scratch_dir = os.path.abspath(self.config.render_scratch_dir)
+            os.makedirs(self.render_scratch_dir, exist_ok=True)
+
         # Check if SadTalker exists
         if not os.path.exists(self.sadtalker_path):
             print(f"Warning: SadTalker not found at {self.sadtalker_path}")
             print("Please clone SadTalker repository to the specified path")
-    
-    async def generate_talking_avatar(self, image_file: bytes, audio_path: str) -> Dict[str, Any]:
-        """Generate a talking avatar video using SadTalker"""
-        request_id = generate_request_id(f"video_{time.time()}")
-        
+
+        # Renders run off the request path in a bounded worker pool
+        self.render_queue = RenderQueue(
+            self._render,
+            state_dir=self.config.render_jobs_path,
+            max_workers=self.config.render_workers,
+            max_queue_size=self.config.render_queue_max_size,
+            job_timeout=self.config.render_job_timeout,
+            # Host-wide cap, so every gunicorn worker rendering at once cannot thrash the machine
+            slots=SlotPool(
+                self.config.admission_state_path, "render_slot", self.config.render_global_concurrency
+            ) if self.config.render_global_concurrency > 0 else None
+        )
+
+        # With remote dispatch, render worker nodes (render_worker.py) take the jobs instead
+        self.remote_queue = None
+        if self.config.render_dispatch == "remote":
+            self.remote_queue = RemoteRenderQueue(
+                SqliteRenderBroker(
+                    self.config.render_broker_path,
+                    self.config.render_worker_max_attempts,
+                    self.config.render_broker_retention
+                ),
+                LocalArtifactStore(self.config.artifact_store_path),
+                max_queue_size=self.config.render_queue_max_size,
+                poll_interval=self.config.render_broker_poll_interval,
+                worker_timeout=self.config.render_worker_lease
+            )
+        self.jobs = self.remote_queue or self.render_queue
+
+        # Maps Idempotency-Keys and content hashes to the job that rendered them
+        self.idempotency = IdempotencyIndex(self.config.render_idempotency_path, self.config.render_idempotency_ttl)
+
+        # Avatars are stored once by content hash together with their preprocessing output
+        self.avatar_cache = AvatarCache(
+            self.config.avatar_cache_path,
+            max_bytes=self.config.avatar_cache_max_bytes,
+            max_entries=self.config.avatar_cache_max_entries,
+            min_age=self.config.render_job_timeout
+        )
+
+        # Idle loops per avatar let renders skip the silent parts of a turn
+        self.idle_cache = IdleLoopCache(os.path.join(self.video_assets_path, "avatars"))
+
+        # Render settings come from named tiers; busy workers step down to cheaper ones
+        self.quality_policy = QualityPolicy(
+            self.config.render_default_quality,
+            queue_threshold=self.config.render_degrade_queue_depth,
+            latency_threshold=self.config.render_degrade_latency,
+            latency_window=self.config.render_latency_window
+        )
+
+        # Resident inference server keeps SadTalker models warm between renders
+        self.inference_client = InferenceClient(self.config.sadtalker_server_socket)
+        self.supervisor = None
+
+    async def start(self):
+        if self.remote_queue is not None:
+            await self.remote_queue.start()
+            return
+        await self.start_rendering()
+
+    async def start_rendering(self):
+        """Start the local render pipeline; render worker nodes call this directly"""
+        # Under gunicorn the master process supervises a single shared inference server
+        if self.config.sadtalker_backend == "server" and not os.environ.get("SADTALKER_SERVER_SUPERVISED"):
+            self.supervisor = build_supervisor(self.config)
+            self.supervisor.start()
+        await self.render_queue.start()
+
+    async def stop(self):
+        if self.remote_queue is not None:
+            await self.remote_queue.stop()
+        await self.render_queue.stop()
+        if self.supervisor is not None:
+            await asyncio.to_thread(self.supervisor.stop)
+            self.supervisor = None
+
+    async def inference_server_health(self) -> Dict[str, Any]:
+        """Health of the resident inference server as seen from this worker"""
+        health = {"backend": self.config.sadtalker_backend, "socket": self.config.sadtalker_server_socket}
+        if self.config.sadtalker_backend != "server":
+            return health
+        try:
+            health.update(await self.inference_client.ping())
+            health["reachable"] = True
+        except InferenceServerUnavailable as e:
+            health.update({"reachable": False, "error": str(e)})
+        if self.supervisor is not None:
+            health["restarts"] = self.supervisor.restarts
+        return health
+
+    async def register_avatar(self, image_file: bytes) -> Dict[str, Any]:
+        """Store an avatar image so later renders can refer to it by ID"""
+        result = await asyncio.to_thread(self.avatar_cache.register, image_file)
+        if result["created"]:
+            await asyncio.to_thread(self.avatar_cache.evict)
+        return result
+
+    async def generate_talking_avatar(
+        self,
+        image_file: Optional[bytes],
+        audio_path: str,
+        priority: int = 0,
+        avatar_id: Optional[str] = None,
+        progressive: bool = False,
+        quality: Optional[str] = None,
+        adaptive: bool = True,
+        composite: Optional[bool] = None,
+        idempotency_key: Optional[str] = None,
+        dedupe: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """Enqueue a SadTalker render and return its job ID immediately.
+
+        With an idempotency_key, or with dedupe for identical inputs and settings, a
+        request that matches an earlier one gets that job back (``"reused": true``)
+        instead of a new render, whether it is still running or already finished.
+        """
+        request_id = generate_request_id()
+        bind_request_id(request_id)
+
+        tier, degraded = self._choose_tier(quality, adaptive)
+        avatar_id = await self._resolve_avatar(image_file, avatar_id)
+
+        composite = self.config.idle_compositing if composite is None else composite
+        params = {
+            "request_id": request_id,
+            "avatar_id": avatar_id,
+            "image_path": self.avatar_cache.source_path(avatar_id),
+            "audio_path": audio_path,
+            "progressive": progressive,
+            "composite": composite,
+            "quality": tier,
+            "options": QUALITY_PROFILES[tier]
+        }
+
+        key = None
+        if idempotency_key:
+            key = request_key(idempotency_key)
+        elif self.config.render_dedupe if dedupe is None else dedupe:
+            # The requested settings, not the tier chosen under the current load
+            key = await asyncio.to_thread(content_key, audio_path, {
+                "avatar_id": avatar_id,
+                "quality": quality or self.config.render_default_quality,
+                "adaptive": adaptive,
+                "progressive": progressive,
+                "composite": composite
+            })
+        result = await self._enqueue(params, priority, key)
+        if not result.get("reused"):
+            result["quality"] = tier
+            result["degraded"] = degraded
+        if progressive:
+            # Players can load the playlist right away; it fills in as clips finish
+            result["playlist_url"] = self.playlist_url(result["job_id"])
+        return result
+
+    async def generate_talking_avatar_batch(
+        self,
+        image_file: Optional[bytes],
+        texts: Optional[List[str]] = None,
+        audio_paths: Optional[List[str]] = None,
+        voice: str = "alloy",
+        priority: int = 0,
+        avatar_id: Optional[str] = None,
+        quality: Optional[str] = None,
+        adaptive: bool = True,
+        idempotency_key: Optional[str] = None,
+        dedupe: Optional[bool] = None
+    ) -> Dict[str, Any]:
+        """Enqueue one render for several utterances of the same avatar and return its job ID.
+
+        Texts are synthesized first, a few at a time. The utterances are then joined
+        into a single driving audio, so SadTalker loads, preprocesses and runs the face
+        renderer (with a larger batch size) once for all of them; the finished job
+        lists one clip per utterance, in order.
+        """
+        if bool(texts) == bool(audio_paths):
+            raise HTTPException(status_code=422, detail="Either texts or audio_paths is required")
+        if audio_paths and len(audio_paths) > self.config.batch_max_items:
+            raise HTTPException(status_code=422, detail=f"At most {self.config.batch_max_items} utterances per batch")
+
+        speech = None
+        if texts:
+            speech = await audio_service.text_to_speech_batch(texts, voice)
+            failed = next((item for item in speech["items"] if "error" in item), None)
+            if failed is not None:
+                raise HTTPException(
+                    status_code=500, detail=f"Text-to-speech failed for item {failed['index']}: {failed['error']}"
+                )
+            audio_paths = [item["audio_path"] for item in speech["items"]]
+
+        request_id = generate_request_id()
+        bind_request_id(request_id)
+
+        tier, degraded = self._choose_tier(quality, adaptive)
+        avatar_id = await self._resolve_avatar(image_file, avatar_id)
+
+        # Every utterance ends on a frame boundary, so the rendered video can be cut back apart exactly
+        batch_path = os.path.join(self.render_inputs_path, f"{request_id}_batch.wav")
+        with stage("tempfile.write"):
+            spans = await executors.run_cpu(self._join_audio, audio_paths, batch_path)
+        profile = QUALITY_PROFILES[tier]
+        params = {
+            "request_id": request_id,
+            "avatar_id": avatar_id,
+            "image_path": self.avatar_cache.source_path(avatar_id),
+            "audio_path": batch_path,
+            "batch": spans,
+            "quality": tier,
+            "options": dict(profile, batch_size=max(profile["batch_size"], self.config.render_batch_size))
+        }
+
+        key = None
+        if idempotency_key:
+            key = request_key(idempotency_key)
+        elif self.config.render_dedupe if dedupe is None else dedupe:
+            key = await asyncio.to_thread(content_key, batch_path, {
+                "avatar_id": avatar_id,
+                "quality": quality or self.config.render_default_quality,
+                "adaptive": adaptive,
+                "batch": len(spans)
+            })
+
+        try:
+            result = await self._enqueue(params, priority, key)
+        except BaseException:
+            await asyncio.to_thread(remove_file, batch_path)
+            raise
+        # A local job removes the joined audio once rendered; the store has its own copy of remote inputs
+        if self.remote_queue is not None or result.get("reused"):
+            await asyncio.to_thread(remove_file, batch_path)
+        if not result.get("reused"):
+            result["quality"] = tier
+            result["degraded"] = degraded
+        result["items"] = len(spans)
+        if speech is not None:
+            result["speech"] = speech["items"]
+        return result
+
+    def _join_audio(self, audio_paths: List[str], output_path: str) -> List[Tuple[int, int]]:
+        """Write the utterances back to back as one WAV; returns each one's (start, end) sample offsets"""
+        audio, spans = join_clips(
+            [self._read_audio(audio_path) for audio_path in audio_paths],
+            align=TARGET_SAMPLE_RATE // FRAME_RATE,
+            gap=int(self.config.render_batch_gap_seconds * TARGET_SAMPLE_RATE)
+        )
+        self._write_wav(output_path, audio)
+        return spans
+
+    def _choose_tier(self, quality: Optional[str], adaptive: bool) -> Tuple[str, bool]:
+        """The requested tier (or the default), which may be lowered while this worker is busy"""
+        try:
+            return self.quality_policy.choose(
+                quality, self.jobs.queue_depth, adaptive and self.config.render_adaptive_quality
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+    async def _resolve_avatar(self, image_file: Optional[bytes], avatar_id: Optional[str]) -> str:
+        # Uploaded images go through the avatar cache, so repeated turns reuse one file
+        if image_file is not None:
+            avatar_id = (await self.register_avatar(image_file))["avatar_id"]
+        if avatar_id is None:
+            raise HTTPException(status_code=422, detail="Either an image or an avatar_id is required")
+        return avatar_id
+
+    async def _enqueue(self, params: Dict[str, Any], priority: int, key: Optional[str]) -> Dict[str, Any]:
+        """Submit a render, or return the job already recorded for key (marked ``"reused"``)"""
+        request_id = params["request_id"]
+        if key is not None:
+            existing = await self._reuse(key, request_id)
+            if existing is not None:
+                existing["reused"] = True
+                return existing
+
+        try:
+            if self.remote_queue is not None:
+                return await self.remote_queue.submit(params, priority=priority, job_id=request_id)
+            return self.render_queue.submit(params, priority=priority, job_id=request_id).to_dict()
+        except BaseException:
+            if key is not None:
+                await asyncio.to_thread(self.idempotency.release, key, request_id)
+            raise
+
+    async def _reuse(self, key: str, request_id: str) -> Optional[Dict[str, Any]]:
+        """State of the job already recorded for key, or None once request_id owns the key"""
+        claimed = await asyncio.to_thread(self.idempotency.claim, key, request_id)
+        while claimed is not None:
+            job_id, created = claimed
+            state = await asyncio.to_thread(self._reusable_state, job_id, created)
+            if state is not None:
+                return state
+            # Failed, cancelled or evicted: this request renders it again, unless another got there first
+            current = await asyncio.to_thread(self.idempotency.replace, key, job_id, request_id)
+            claimed = None if current is None else (current, time.time())
+        return None
+
+    def _reusable_state(self, job_id: str, created: float) -> Optional[Dict[str, Any]]:
+        try:
+            state = self.jobs.get(job_id)
+        except HTTPException:
+            if time.time() - created < IDEMPOTENCY_GRACE_SECONDS:
+                return {"job_id": job_id, "status": JobStatus.QUEUED, "stage": "queued", "progress": 0.0}
+            return None
+        if state["status"] in (JobStatus.FAILED, JobStatus.CANCELLED):
+            return None
+        if state["status"] == JobStatus.COMPLETED and not os.path.exists(state["result"]["video_path"]):
+            return None
+        return state
+
+    def get_job(self, job_id: str) -> Dict[str, Any]:
+        """Get status and progress of a render job"""
+        return self.jobs.get(job_id)
+
+    async def cancel_job(self, job_id: str) -> Dict[str, Any]:
+        """Cancel a queued or running render job"""
+        return await self.jobs.cancel(job_id)
+
+    async def wait_for_job(self, job_id: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Wait until a render job owned by this worker (or any job, with remote dispatch) finishes"""
+        return await self.jobs.wait(job_id, timeout)
+
+    def _build_command(self, video_name: str, image_path: str, audio_path: str, result_dir: str, options: Dict[str, Any]) -> list:
+        cmd = [
+            self.config.sadtalker_python,
+            os.path.join(self.sadtalker_path, "inference.py"),
+            "--driven_audio", audio_path,
+            "--source_image", image_path,
+            "--result_dir", result_dir,
+            "--pose_style", str(options["pose_style"]),
+            "--batch_size", str(options["batch_size"]),
+            "--size", str(options["size"]),
+            "--expression_scale", str(options["expression_scale"]),
+            "--preprocess", options["preprocess"],
+            "--output_video_name", f"{video_name}.mp4"
+        ]
+        if options["enhancer"]:
+            cmd += ["--enhancer", options["enhancer"]]
+        if options["still"]:
+            cmd.append("--still")
+        return cmd
+
+    def _report_progress(self, progress: ProgressCallback, line: str):
+        """Translate a line of SadTalker tqdm output into job progress"""
+        for marker, stage_name, start, end in SADTALKER_STAGES:
+            if marker in line:
+                match = PERCENT_PATTERN.search(line)
+                fraction = int(match.group(1)) / 100 if match else 0.0
+                progress(start + (end - start) * fraction, stage_name)
+                return
+
+    async def _render(self, job: RenderJob) -> Dict[str, Any]:
+        """Render a job as one MP4, or clip by clip into a growing HLS playlist"""
+        tier = job.params.get("quality", self.config.render_default_quality)
+        options = dict(QUALITY_PROFILES[tier], **job.params.get("options", {}))
+        await asyncio.to_thread(self.avatar_cache.touch, job.params["avatar_id"])
+        start_time = time.time()
+
+        # Render workers outlive requests, so the job carries its request ID over
+        bind_request_id(job.params["request_id"])
+        observe_stage("render.queue_wait", job.started_at - job.created_at, job.started_at)
+
+        with stage("render.job", quality=tier):
+            if job.params.get("progressive"):
+                result = await self._render_progressive(job, options)
+            elif job.params.get("batch"):
+                result = await self._render_batch(job, options)
+            elif job.params.get("composite"):
+                result = await self._render_composited(job, options, tier)
+            else:
+                result = await self._render_single(job, options)
+
+        self.quality_policy.record(tier, time.time() - start_time)
+        storage_service.record(result["video_path"], "video")
+        for clip in result.get("clips", []):
+            storage_service.record(clip["video_path"], "video")
+        if job.params.get("progressive"):
+            storage_service.record(os.path.join(self.video_assets_path, job.params["request_id"]), "video")
+        result["quality"] = tier
+        return result
+
+    async def _render_single(self, job: RenderJob, options: Dict[str, Any]) -> Dict[str, Any]:
+        request_id = job.params["request_id"]
+        result = await self._render_clip(
+            job, options, job.params["audio_path"], self.video_assets_path, request_id,
+            lambda progress, stage: self.render_queue.update_progress(job, progress, stage)
+        )
+        return {
+            "video_path": result["video_path"],
+            "request_id": request_id,
+            "avatar_id": job.params["avatar_id"],
+            "warm": result["warm"],
+            "timings": result["timings"]
+        }
+
+    async def _render_batch(self, job: RenderJob, options: Dict[str, Any]) -> Dict[str, Any]:
+        """Render the joined utterances of a batch in one SadTalker run, then cut the video into one clip each"""
+        request_id = job.params["request_id"]
+        spans = job.params["batch"]
+        start_time = time.time()
+
+        try:
+            reel = await self._render_clip(
+                job, options, job.params["audio_path"], self.video_assets_path, request_id,
+                lambda progress, stage: self.render_queue.update_progress(job, progress * 0.95, stage)
+            )
+        finally:
+            await asyncio.to_thread(remove_file, job.params["audio_path"])
+
+        self.render_queue.update_progress(job, 0.95, "splitting")
+        with stage("video.split", clips=len(spans)):
+            await split_clip(
+                reel["video_path"],
+                [start / TARGET_SAMPLE_RATE for start, _ in spans[1:]],
+                os.path.join(self.video_assets_path, f"{request_id}_%03d.mp4")
+            )
+
+        timings = dict(reel["timings"] or {})
+        timings["total_ms"] = round((time.time() - start_time) * 1000)
+        return {
+            # The whole batch in one video, next to the clips
+            "video_path": reel["video_path"],
+            "request_id": request_id,
+            "avatar_id": job.params["avatar_id"],
+            "clips": [
+                {
+                    "index": index,
+                    "video_id": f"{request_id}_{index:03d}",
+                    "video_path": os.path.join(self.video_assets_path, f"{request_id}_{index:03d}.mp4"),
+                    "start": round(start / TARGET_SAMPLE_RATE, 3),
+                    "duration": round((end - start) / TARGET_SAMPLE_RATE, 3)
+                }
+                for index, (start, end) in enumerate(spans)
+            ],
+            "warm": reel["warm"],
+            "timings": timings
+        }
+
+    async def _render_composited(self, job: RenderJob, options: Dict[str, Any], tier: str) -> Dict[str, Any]:
+        """Render only the speech in the audio and fill the silences around it with the avatar's idle loop"""
+        request_id = job.params["request_id"]
+        avatar_id = job.params["avatar_id"]
+        start_time = time.time()
+
+        audio = await executors.run_cpu(self._read_audio, job.params["audio_path"])
+        total = len(audio) / TARGET_SAMPLE_RATE
+        # Whole frames per region, so cutting the rendered clip back apart keeps lip-sync exact
+        regions = await audio_service.speech_regions(audio, align=TARGET_SAMPLE_RATE // FRAME_RATE)
+        speech = sum(end - start for start, end in regions) / TARGET_SAMPLE_RATE
+        if speech < self.config.min_speech_seconds:
+            regions = []
+            speech = 0.0
+
+        # The loop is built on the avatar's first composited render, then reused by every turn
+        idle_built = await asyncio.to_thread(self.idle_cache.lookup, avatar_id, tier) is None
+        speech_share = 0.5 if idle_built else 1.0
+
+        def idle_progress(fraction: float, stage: str):
+            self.render_queue.update_progress(job, fraction * (1 - speech_share), f"idle_{stage}")
+
+        def speech_progress(fraction: float, stage: str):
+            self.render_queue.update_progress(job, 1 - speech_share + fraction * speech_share, stage)
+
+        loop_path = await self.idle_cache.ensure(
+            avatar_id, tier,
+            lambda output_dir: self._render_idle(job, options, output_dir, idle_progress),
+            should_cancel=self._cancel_check(job)
+        )
+
+        sections = [(start / TARGET_SAMPLE_RATE, end / TARGET_SAMPLE_RATE) for start, end in regions]
+        speech_path = None
+        encoder = None
+        timings = {}
+        if speech > 0:
+            trimmed_path = os.path.join(self.render_inputs_path, f"{request_id}_speech.wav")
+            with stage("tempfile.write"):
+                await executors.run_cpu(self._write_wav, trimmed_path, condense(audio, regions))
+            try:
+                # Keyframes at the section boundaries let the composite stream-copy the speech
+                clip = await self._render_clip(
+                    job, options, trimmed_path, self.video_assets_path, f"{request_id}_speech", speech_progress,
+                    keyframes=section_cuts(sections)
+                )
+            finally:
+                await asyncio.to_thread(remove_file, trimmed_path)
+            speech_path = clip["video_path"]
+            timings = dict(clip["timings"] or {})
+            if clip.get("keyframed"):
+                encoder = {"preset": self.config.render_encoder_preset, "crf": self.config.render_encoder_crf}
+
+        self.render_queue.update_progress(job, 1.0, "compositing")
+        video_path = os.path.join(self.video_assets_path, f"{request_id}.mp4")
+        try:
+            with stage("video.composite"):
+                await self.idle_cache.composite(
+                    loop_path,
+                    speech_path,
+                    job.params["audio_path"],
+                    sections=sections,
+                    total=total,
+                    output_path=video_path,
+                    encoder=encoder
+                )
+        finally:
+            if speech_path is not None:
+                await asyncio.to_thread(remove_file, speech_path)
+
+        timings["total_ms"] = round((time.time() - start_time) * 1000)
+        return {
+            "video_path": video_path,
+            "request_id": request_id,
+            "avatar_id": avatar_id,
+            "idle_built": idle_built,
+            "rendered_seconds": round(speech, 3),
+            "audio_seconds": round(total, 3),
+            "speech_segments": [{"start": round(start, 3), "end": round(end, 3)} for start, end in sections],
+            "warm": None if speech_path is None else clip["warm"],
+            "timings": timings
+        }
+
+    async def _render_idle(
+        self,
+        job: RenderJob,
+        options: Dict[str, Any],
+        output_dir: str,
+        progress: ProgressCallback
+    ) -> str:
+        """Render the avatar on silence; the idle cache turns the clip into a loop.
+
+        The build is shared by every job waiting for it, so it ignores job's cancel
+        state; the idle cache cancels it when no job is waiting any more.
+        """
+        silence_path = os.path.join(output_dir, "idle_silence.wav")
+        silence = np.zeros(int(self.config.idle_loop_seconds * TARGET_SAMPLE_RATE), dtype=np.float32)
+        with stage("tempfile.write"):
+            await executors.run_cpu(self._write_wav, silence_path, silence)
+        try:
+            clip = await self._render_clip(
+                job, options, silence_path, output_dir, "idle_raw", progress, should_cancel=lambda: False
+            )
+        finally:
+            await asyncio.to_thread(remove_file, silence_path)
+        return clip["video_path"]
+
+    def _read_audio(self, audio_path: str) -> np.ndarray:
+        with open(audio_path, "rb") as f:
+            return decode_audio(f.read())
+
+    def _write_wav(self, path: str, audio: np.ndarray):
+        with open(path, "wb") as f:
+            f.write(encode_wav(audio))
+
+    async def _render_clip(
+        self,
+        job: RenderJob,
+        options: Dict[str, Any],
+        audio_path: str,
+        result_dir: str,
+        video_name: str,
+        progress: ProgressCallback,
+        should_cancel: Optional[Callable[[], bool]] = None,
+        keyframes: Optional[List[float]] = None
+    ) -> Dict[str, Any]:
+        """Render one clip on the warm inference server, or with a fresh SadTalker process.
+
+        should_cancel is polled while rendering; it defaults to job's cancel state.
+        keyframes are clip times to force keyframes at; only the server can, and its
+        result then has "keyframed" set.
+        """
+        should_cancel = should_cancel or self._cancel_check(job)
+        if self.config.sadtalker_backend == "server":
+            try:
+                return await self._render_with_server(
+                    job, options, audio_path, result_dir, video_name, progress, should_cancel, keyframes
+                )
+            except InferenceServerUnavailable as e:
+                if not self.config.sadtalker_server_fallback:
+                    raise HTTPException(status_code=503, detail=f"Video generation failed: {str(e)}")
+                print(f"Inference server unavailable, spawning SadTalker instead: {str(e)}")
+        # inference.py cannot take precomputed coefficients, so this path always preprocesses
+        return await self._render_with_subprocess(
+            job, options, audio_path, result_dir, video_name, progress, should_cancel
+        )
+
+    def _cancel_check(self, job: RenderJob) -> Callable[[], bool]:
+        """Poll job's cancel marker, flagging the job so the queue records it as cancelled"""
+        def should_cancel() -> bool:
+            if self.render_queue.is_cancel_requested(job):
+                job.cancel_requested = True
+            return job.cancel_requested
+        return should_cancel
+
+    async def _render_progressive(self, job: RenderJob, options: Dict[str, Any]) -> Dict[str, Any]:
+        """Split the audio at pauses and publish each rendered clip to the playlist as it finishes"""
+        request_id = job.params["request_id"]
+        output_dir = os.path.join(self.video_assets_path, request_id)
+        await asyncio.to_thread(os.makedirs, output_dir, exist_ok=True)
+        start_time = time.time()
+
+        self.render_queue.update_progress(job, 0.0, "segmenting")
+        segments = await executors.run_cpu(self._split_audio, job.params["audio_path"], output_dir)
+        playlist = HlsPlaylist(output_dir, max(duration for _, duration in segments))
+        await asyncio.to_thread(playlist.write)
+
+        clip_paths, first_segment_ms, warm = [], None, None
+        for index, (segment_path, _) in enumerate(segments):
+            name = f"segment_{index:03d}"
+
+            def progress(fraction: float, stage: str, index: int = index):
+                self.render_queue.update_progress(job, (index + fraction) / len(segments), stage)
+
+            clip = await self._render_clip(job, options, segment_path, output_dir, name, progress)
+            with stage("video.package"):
+                entries = await package_clip(clip["video_path"], output_dir, name)
+            await asyncio.to_thread(playlist.append, entries)
+            clip_paths.append(clip["video_path"])
+            await asyncio.to_thread(remove_file, segment_path)
+            if first_segment_ms is None:
+                first_segment_ms = round((time.time() - start_time) * 1000)
+                warm = clip["warm"]
+
+        await asyncio.to_thread(playlist.finish)
+
+        # A single MP4 as well, for /video/stream and downloads
+        self.render_queue.update_progress(job, 1.0, "concatenating")
+        video_path = os.path.join(self.video_assets_path, f"{request_id}.mp4")
+        with stage("video.concat"):
+            await concat_clips(clip_paths, video_path)
+        for clip_path in clip_paths:
+            await asyncio.to_thread(remove_file, clip_path)
+
+        return {
+            "video_path": video_path,
+            "playlist_url": self.playlist_url(request_id),
+            "request_id": request_id,
+            "avatar_id": job.params["avatar_id"],
+            "segments": len(segments),
+            "warm": warm,
+            "timings": {
+                "first_segment_ms": first_segment_ms,
+                "total_ms": round((time.time() - start_time) * 1000)
+            }
+        }
+
+    def _split_audio(self, audio_path: str, output_dir: str) -> List[Tuple[str, float]]:
+        """Cut the driving audio at pauses into WAV segments; returns (path, seconds) pairs"""
+        audio = self._read_audio(audio_path)
+        segments = []
+        for index, (start, end) in enumerate(split_at_pauses(
+            audio,
+            TARGET_SAMPLE_RATE,
+            self.config.progressive_segment_seconds,
+            self.config.progressive_max_segment_seconds
+        )):
+            segment_path = os.path.join(output_dir, f"segment_{index:03d}.wav")
+            with stage("tempfile.write"), open(segment_path, "wb") as f:
+                f.write(encode_wav(audio[start:end]))
+            segments.append((segment_path, (end - start) / TARGET_SAMPLE_RATE))
+        return segments
+
+    def playlist_url(self, request_id: str) -> str:
+        """Public URL of a progressive render's playlist, served from /video-assets/"""
+        return f"/video-assets/{request_id}/{PLAYLIST_NAME}"
+
+    async def _render_with_server(
+        self,
+        job: RenderJob,
+        options: Dict[str, Any],
+        audio_path: str,
+        result_dir: str,
+        video_name: str,
+        progress: ProgressCallback,
+        should_cancel: Callable[[], bool],
+        keyframes: Optional[List[float]] = None
+    ) -> Dict[str, Any]:
+        params = {
+            "request_id": video_name,
+            "image_path": os.path.abspath(job.params["image_path"]),
+            "audio_path": os.path.abspath(audio_path),
+            "result_dir": os.path.abspath(result_dir),
+            "avatar_dir": os.path.abspath(self.avatar_cache.preprocessed_dir(
+                job.params["avatar_id"], options["preprocess"], options["size"]
+            )),
+            "options": options,
+            "scratch_dir": self.render_scratch_dir,
+            "encoder": {
+                "preset": self.config.render_encoder_preset,
+                "crf": self.config.render_encoder_crf,
+                "audio_bitrate": self.config.render_audio_bitrate,
+                "keyframes": keyframes
+            }
+        }
+        render_task = asyncio.ensure_future(self.inference_client.render(params, progress))
+        try:
+            # Wake up regularly so cancellations requested by other workers are noticed
+            while not render_task.done():
+                await asyncio.wait({render_task}, timeout=1.0)
+                if not render_task.done() and should_cancel():
+                    raise asyncio.CancelledError()
+            result = render_task.result()
+        except InferenceServerError as e:
+            raise HTTPException(status_code=500, detail=f"Video generation failed: {str(e)}")
+        finally:
+            render_task.cancel()
+
+        # The server times its own stages; encoding overlaps compositing, so encode is only the tail
+        for key, value in (result.get("timings") or {}).items():
+            if key.endswith("_ms") and key != "total_ms":
+                observe_stage(f"sadtalker.{key[:-len('_ms')]}", value / 1000)
+
+        return {
+            "video_path": os.path.join(result_dir, f"{video_name}.mp4"),
+            "warm": result.get("warm"),
+            "timings": result.get("timings"),
+            "keyframed": keyframes is not None
+        }
+
+    async def _render_with_subprocess(
+        self,
+        job: RenderJob,
+        options: Dict[str, Any],
+        audio_path: str,
+        result_dir: str,
+        video_name: str,
+        progress: ProgressCallback,
+        should_cancel: Callable[[], bool]
+    ) -> Dict[str, Any]:
+        """Run SadTalker's inference.py without blocking the event loop.
+
+        inference.py writes its intermediate frames and videos under --result_dir, so it
+        gets a local scratch directory and only the finished MP4 is moved to result_dir.
+        """
+        output_video_path = os.path.join(result_dir, f"{video_name}.mp4")
+        start_time = time.time()
+        process = None
+        scratch_dir = await asyncio.to_thread(
+            tempfile.mkdtemp, prefix=f"{video_name}_", dir=self.render_scratch_dir
+        )
+
+        # Stages are timed from the progress output: spawning lasts until the first bar
+        # appears, and encoding starts once the last bar is full
+        clock = StageClock("sadtalker")
+        final_stage = "enhance" if options["enhancer"] else "render"
+        final_end = next(end for _, name, _, end in SADTALKER_STAGES if name == final_stage)
+
+        def timed_progress(fraction: float, stage: str):
+            clock.enter("encode" if stage == final_stage and fraction >= final_end else stage)
+            progress(fraction, stage)
+
         try:
-            # Save image file temporarily
-            temp_image_path = os.path.join(self.video_assets_path, f"{request_id}.png")
-            with open(temp_image_path, 'wb') as f:
-                f.write(image_file)
-            
-            # Output video path
-            output_video_path = os.path.join(self.video_assets_path, f"{request_id}.mp4")
-            
-            # Run SadTalker subprocess
-            cmd = [
-                "python", 
-                os.path.join(self.sadtalker_path, "inference.py"),
-                "--driven_audio", audio_path,
-                "--source_image", temp_image_path,
-                "--result_dir", self.video_assets_path,
-                "--enhancer", "gfpgan",  # Optional face enhancer
-                "--pose_style", "0",     # Pose style (0 for still)
-                "--batch_size", "1",
-                "--size", "256",         # Size of the generated video
-                "--expression_scale", "1.0",  # Expression intensity
-                "--still",                # Keep the face still
-                "--preprocess", "full",  # Full face detection
-                "--output_video_name", f"{request_id}.mp4"
-            ]
-            
-            # Execute SadTalker
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                cwd=self.sadtalker_path,
-                text=True
+            clock.enter("spawn")
+            process = await asyncio.create_subprocess_exec(
+                *self._build_command(video_name, job.params["image_path"], audio_path, scratch_dir, options),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.STDOUT,
+                cwd=self.sadtalker_path
             )
-            
-            stdout, stderr = process.communicate()
-            
-            if process.returncode != 0:
-                print(f"SadTalker error: {stderr}")
-                raise HTTPException(status_code=500, detail=f"Video generation failed: {stderr}")
-            
+
+            # tqdm redraws with carriage returns, so split on both \r and \n
+            tail = deque(maxlen=20)
+            buffer = ""
+            while True:
+                # Wake up regularly so cancellations requested by other workers are noticed
+                if should_cancel():
+                    raise asyncio.CancelledError()
+                try:
+                    chunk = await asyncio.wait_for(process.stdout.read(4096), 1.0)
+                except asyncio.TimeoutError:
+                    continue
+                if not chunk:
+                    break
+                buffer += chunk.decode(errors="replace")
+                *lines, buffer = re.split(r"[\r\n]", buffer)
+                for line in lines:
+                    if line.strip():
+                        tail.append(line)
+                        self._report_progress(timed_progress, line)
+
+            returncode = await process.wait()
+            clock.finish()
+            if returncode != 0:
+                output = "\n".join(tail)
+                print(f"SadTalker error: {output}")
+                raise HTTPException(status_code=500, detail=f"Video generation failed: {output}")
+
             # Check if output video exists
-            if not os.path.exists(output_video_path):
+            scratch_video_path = os.path.join(scratch_dir, f"{video_name}.mp4")
+            if not await asyncio.to_thread(os.path.exists, scratch_video_path):
                 raise HTTPException(status_code=500, detail="Video generation failed: Output file not found")
-            
-            # Clean up temporary image file
-            os.remove(temp_image_path)
-            
+            await asyncio.to_thread(shutil.move, scratch_video_path, output_video_path)
+
             return {
                 "video_path": output_video_path,
-                "request_id": request_id
+                "warm": False,
+                "timings": {"total_ms": round((time.time() - start_time) * 1000)}
             }
-        
-        except Exception as e:
-            # Clean up any temporary files
-            if os.path.exists(temp_image_path):
-                os.remove(temp_image_path)
-            
-            raise HTTPException(status_code=500, detail=f"Video generation failed: {str(e)}")
-    
+
+        finally:
+            if process is not None and process.returncode is None:
+                process.kill()
+                await process.wait()
+            await asyncio.to_thread(shutil.rmtree, scratch_dir, True)
+
     def get_video_path(self, video_id: str) -> str:
         """Get the path to a generated video by ID"""
+        # IDs are request IDs; anything else could escape the assets directory
+        if not VIDEO_ID_PATTERN.fullmatch(video_id):
+            raise HTTPException(status_code=404, detail=f"Video not found: {video_id}")
         video_path = os.path.join(self.video_assets_path, f"{video_id}.mp4")
         if not os.path.exists(video_path):
             raise HTTPException(status_code=404, detail=f"Video not found: {video_id}")
         return video_path
 
 # Create a singleton instance
-video_service = VideoService()
\ No newline at end of file
+video_service = VideoService()
@@ -18,10 +18,17 @@ API_BASE_URL = "http://localhost:8000/api/v1"
 TRANSCRIBE_ENDPOINT = f"{API_BASE_URL}/audio/transcribe"
 SPEAK_ENDPOINT = f"{API_BASE_URL}/audio/speak"
 GENERATE_VIDEO_ENDPOINT = f"{API_BASE_URL}/video/generate"
+VIDEO_JOBS_ENDPOINT = f"{API_BASE_URL}/video/jobs"
+AVATARS_ENDPOINT = f"{API_BASE_URL}/video/avatars"
+JOB_POLL_INTERVAL = 1.0
+# Give up on a render after this long, queue wait included
+JOB_POLL_TIMEOUT = 900.0
 
 # Initialize session state
 if 'avatar_image' not in st.session_state:
     st.session_state.avatar_image = None
+if 'avatar_id' not in st.session_state:
+    st.session_state.avatar_id = None
 if 'generated_video' not in st.session_state:
     st.session_state.generated_video = None
 if 'conversation_history' not in st.session_state:
@@ -45,7 +52,18 @@ with st.sidebar:
         # Save the image to session state
         img_bytes = io.BytesIO()
         image.save(img_bytes, format="PNG")
-        st.session_state.avatar_image = img_bytes.getvalue()
+        if st.session_state.avatar_image != img_bytes.getvalue():
+            st.session_state.avatar_image = img_bytes.getvalue()
+            st.session_state.avatar_id = None
+        
+        # Register the avatar once so every turn reuses its cached preprocessing
+        if st.session_state.avatar_id is None:
+            try:
+                files = {'image': ('avatar.png', st.session_state.avatar_image, 'image/png')}
+                avatar_response = requests.post(AVATARS_ENDPOINT, files=files)
+                st.session_state.avatar_id = avatar_response.json()["data"]["avatar_id"]
+            except Exception as e:
+                st.warning(f"Could not register avatar, it will be uploaded with every message: {str(e)}")
     
     # Voice selection
     voice_option = st.selectbox(
@@ -99,17 +117,29 @@ with col1:
                         audio_path = tts_result["audio_path"]
                         
                         # Step 2: Generate video with the avatar
-                        files = {
-                            'image': ('avatar.png', st.session_state.avatar_image, 'image/png'),
-                            'audio_path': (None, audio_path)
-                        }
+                        files = {'audio_path': (None, audio_path)}
+                        if st.session_state.avatar_id:
+                            files['avatar_id'] = (None, st.session_state.avatar_id)
+                        else:
+                            files['image'] = ('avatar.png', st.session_state.avatar_image, 'image/png')
                         
                         video_response = requests.post(GENERATE_VIDEO_ENDPOINT, files=files)
                         if video_response.status_code != 200:
                             st.error(f"Error generating video: {video_response.text}")
                         else:
-                            video_result = video_response.json()["data"]
-                            video_path = video_result["video_path"]
+                            # The render runs as a background job; poll it until it finishes
+                            job = video_response.json()["data"]
+                            progress_bar = st.progress(0.0)
+                            deadline = time.time() + JOB_POLL_TIMEOUT
+                            while job["status"] in ("queued", "running"):
+                                if time.time() > deadline:
+                                    raise Exception(f"Video generation timed out after {JOB_POLL_TIMEOUT:g}s")
+                                time.sleep(JOB_POLL_INTERVAL)
+                                job = requests.get(f"{VIDEO_JOBS_ENDPOINT}/{job['job_id']}").json()["data"]
+                                progress_bar.progress(min(job["progress"], 1.0))
+                            if job["status"] != "completed":
+                                raise Exception(f"Video generation {job['status']}: {job['error']}")
+                            video_path = job["result"]["video_path"]
                             
                             # Save to session state
                             st.session_state.generated_video = video_path
@@ -128,9 +158,9 @@ with col2:
     
     # Display the generated video if available
     if st.session_state.generated_video and os.path.exists(st.session_state.generated_video):
-        # Convert server path to web path
-        video_filename = os.path.basename(st.session_state.generated_video)
-        video_url = f"/video-assets/{video_filename}"
+        # Served by the streaming endpoint, which supports seeking
+        video_id = os.path.splitext(os.path.basename(st.session_state.generated_video))[0]
+        video_url = f"/api/v1/video/stream/{video_id}"
         
         # Display video
         st.video(video_url)
@@ -146,8 +176,8 @@ else:
         with st.expander(f"Conversation {len(st.session_state.conversation_history) - i}", expanded=(i == 0)):
             st.markdown(f"**You said:** {entry['user_input']}")
             
-            # Convert server path to web path
-            video_filename = os.path.basename(entry['video_path'])
-            video_url = f"/video-assets/{video_filename}"
+            # Served by the streaming endpoint, which supports seeking
+            video_id = os.path.splitext(os.path.basename(entry['video_path']))[0]
+            video_url = f"/api/v1/video/stream/{video_id}"
             
             st.video(video_url)
\ No newline at end of file
@@ -1,4 +1,63 @@
 # gunicorn_config.py
+import os
+
+# Each worker writes its metrics to files here and /metrics merges them
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/avatar_metrics")
+# A preloaded app creates its metrics before on_starting runs
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
 bind = "0.0.0.0:8000"
 workers = 4
-worker_class = "uvicorn.workers.UvicornWorker"
\ No newline at end of file
+worker_class = "uvicorn.workers.UvicornWorker"
+# Import the app once in the master and fork workers from it, so they share its memory copy-on-write
+preload_app = os.getenv("GUNICORN_PRELOAD", "false").lower() == "true"
+
+def on_starting(server):
+    """Drop metric files left over from a previous run"""
+    import shutil
+
+    metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+def preload_models(server, config):
+    """Load the Silero models in the master so every worker inherits them"""
+    import gc
+    from com.mhire.app.services.audio_service.audio_service import audio_service
+
+    # ONNX Runtime's intra-op pool threads would not survive the fork; one thread means no pool
+    if config.onnx_intra_op_threads != 1:
+        server.log.warning("Not preloading Silero models: ONNX_INTRA_OP_THREADS is not 1")
+    elif config.warmup_enabled:
+        try:
+            audio_service.preload_models()
+        except Exception as e:
+            server.log.warning(f"Not preloading Silero models: {e}")
+    # Keep the garbage collector from writing to (and so copying) every inherited object
+    gc.freeze()
+
+def when_ready(server):
+    """Runs in the master before the first fork: preloaded models and the shared SadTalker server"""
+    from com.mhire.app.config.config import Config
+    from com.mhire.app.services.video_service.inference_server import build_supervisor
+
+    config = Config()
+    if server.cfg.preload_app:
+        preload_models(server, config)
+    # With remote dispatch this node only queues jobs; render workers run their own servers
+    if config.sadtalker_backend == "server" and config.render_dispatch == "local":
+        server.sadtalker_supervisor = build_supervisor(config)
+        server.sadtalker_supervisor.start()
+        # Workers inherit this and skip starting their own server
+        os.environ["SADTALKER_SERVER_SUPERVISED"] = "1"
+
+def on_exit(server):
+    supervisor = getattr(server, "sadtalker_supervisor", None)
+    if supervisor is not None:
+        supervisor.stop()
+
+def child_exit(server, worker):
+    """Stop counting a dead worker's in-flight gauges"""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)